@@ -25,6 +25,8 @@ export class CredFormComponent implements OnInit, OnDestroy, AfterViewInit {
   private _loader = new Fetch.ModelLoader(Model.CredentialFormatted);
   private _verify = new Fetch.ModelLoader(Model.CredentialVerifyResult);
   private _idSub: Subscription;
+  private _verifySub: Subscription;
+  private _verifyTimer: any;
 
   constructor(
     private _config: AppConfigService,
@@ -49,9 +51,18 @@ export class CredFormComponent implements OnInit, OnDestroy, AfterViewInit {
         if(verify === undefined || (verify && verify !== "false"))
           this.verifyCred();
     });
+    // verification runs in the background: poll the job until it has completed
+    this._verifySub = this._verify.ready.subscribe(result => {
+      if(result.data && result.data.pending) {
+        let extPath = `verify/${result.data.job_id}`;
+        this._verifyTimer = setTimeout(() => this._dataService.loadRecord(this._verify, this.id, {extPath}), 2000);
+      }
+    });
   }
 
   ngOnDestroy() {
+    clearTimeout(this._verifyTimer);
+    if(this._verifySub) this._verifySub.unsubscribe();
     this._idSub.unsubscribe();
     this._loader.complete();
     this._verify.complete();
@@ -230,6 +230,8 @@ export namespace Model {
   }
 
   export class CredentialVerifyResult extends BaseModel {
+    job_id: number;
+    pending: boolean;
     success: boolean;
     result: any;
 
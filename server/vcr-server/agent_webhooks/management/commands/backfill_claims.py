@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from api.v2.models.Credential import Credential
+from agent_webhooks.utils.credential import CredentialManager
+
+
+class Command(BaseCommand):
+    help = "Populates the JSONB claims column of credentials from the claim table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of credentials updated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        pending = Credential.objects.filter(
+            Q(claim_values__isnull=True) | Q(claims_hash__isnull=True)
+        ).order_by("id")
+        total = pending.count()
+        self.stdout.write("Backfilling claims for {} credentials".format(total))
+
+        start_time = time.perf_counter()
+        last_id = 0
+        updated = 0
+        while True:
+            with transaction.atomic():
+                credentials = list(pending.filter(id__gt=last_id)[:chunk_size])
+                if not credentials:
+                    break
+                updated += CredentialManager.update_claim_columns(credentials)
+            last_id = credentials[-1].id
+            self.stdout.write("Updated {} of {} credentials".format(updated, total))
+
+        self.stdout.write(
+            "Backfilled {} credentials in {:.1f}s".format(
+                updated, time.perf_counter() - start_time
+            )
+        )
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import loader
+
+from api.v2.search.document import DOCUMENT_TEMPLATE, credential_document
+from api.v2.search_indexes import CredentialIndex
+
+
+class Command(BaseCommand):
+    help = "Compares the time taken to build credential search documents with the template and the document builder"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=1000,
+            help="Number of credentials to build documents for",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=3,
+            help="Number of times each document is built",
+        )
+
+    def handle(self, *args, **options):
+        rounds = options["rounds"]
+        credentials = list(CredentialIndex().index_queryset()[: options["count"]])
+        if not credentials:
+            raise CommandError("No credentials found")
+
+        template = loader.get_template(DOCUMENT_TEMPLATE)
+        mismatched = sum(
+            credential_document(cred) != template.render({"object": cred})
+            for cred in credentials
+        )
+        if mismatched:
+            self.stderr.write(
+                "{} documents differ from the template output".format(mismatched)
+            )
+
+        timings = {}
+        for label, build in (
+            ("template", lambda cred: template.render({"object": cred})),
+            ("builder", credential_document),
+        ):
+            start_time = time.perf_counter()
+            for _ in range(rounds):
+                for cred in credentials:
+                    build(cred)
+            timings[label] = time.perf_counter() - start_time
+            self.stdout.write(
+                "{}: {:.3f}s for {} documents ({:.0f} docs/s)".format(
+                    label,
+                    timings[label],
+                    len(credentials) * rounds,
+                    len(credentials) * rounds / timings[label],
+                )
+            )
+        self.stdout.write(
+            "Speedup: {:.1f}x".format(timings["template"] / timings["builder"])
+        )
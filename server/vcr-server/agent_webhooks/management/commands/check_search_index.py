@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from haystack import connections
+
+from vcr_server.utils.index_check import IndexChecker
+from vcr_server.utils.solrqueue import SolrQueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the search indexes with the database and queues updates "
+        "for the missing or stale documents"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--using", default="default", help="The search connection to check"
+        )
+        parser.add_argument("--start-id", type=int, help="First id to check")
+        parser.add_argument("--end-id", type=int, help="Last id to check")
+        parser.add_argument(
+            "--chunk-size", type=int, help="Number of ids compared per Solr query"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the differences without queueing updates",
+        )
+
+    def handle(self, *args, **options):
+        using = options["using"]
+        backend = connections[using].get_backend()
+        if not hasattr(backend, "conn"):
+            raise CommandError("A Solr search backend is required")
+        backend.silently_fail = False
+
+        queue = None if options["dry_run"] else SolrQueue()
+        if queue is None or queue.transactional:
+            self.check_indexes(backend, using, queue, options)
+        else:
+            # the in-memory queue is processed before the command exits
+            with queue:
+                self.check_indexes(backend, using, queue, options)
+
+    def check_indexes(self, backend, using, queue, options):
+        unified_index = connections[using].get_unified_index()
+        for index in unified_index.get_indexes().values():
+            checker = IndexChecker(index, backend, using, options["chunk_size"])
+            totals = checker.check(
+                options["start_id"], options["end_id"], queue, log=self.stdout.write
+            )
+            self.stdout.write(
+                "{}: checked {checked} ids, {missing} missing, {stale} stale, "
+                "{extra} extra{}".format(
+                    checker.model_ct,
+                    "" if queue is None else "; queued for indexing",
+                    **totals
+                )
+            )
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from haystack import connections
+
+from api.v2.models.IndexWatermark import IndexWatermark
+from vcr_server.utils.indexer import IndexPipeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Updates the search indexes for the rows changed since the last "
+        "successful update, or rebuilds them with --full"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Clear the indexes and index every row, ignoring the watermarks",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.SOLR_INDEX_WORKERS,
+            help="Number of threads building search documents",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.SOLR_INDEX_CHUNK_SIZE,
+            help="Number of documents posted to Solr at a time",
+        )
+        parser.add_argument(
+            "--commit-size",
+            type=int,
+            default=10000,
+            help="Number of rows indexed between commits",
+        )
+        parser.add_argument(
+            "--max-retries",
+            type=int,
+            default=5,
+            help="Number of times a failed commit chunk is retried",
+        )
+
+    def handle(self, *args, **options):
+        pipeline = IndexPipeline(options["workers"], options["batch_size"])
+        try:
+            for using in connections.connections_info:
+                unified_index = connections[using].get_unified_index()
+                for index in unified_index.get_indexes().values():
+                    self.update_index(
+                        index,
+                        using,
+                        pipeline,
+                        options["full"],
+                        options["commit_size"],
+                        options["max_retries"],
+                    )
+        finally:
+            pipeline.shutdown()
+
+    def update_index(
+        self, index, using, pipeline, full: bool, commit_size: int, max_retries: int
+    ):
+        """
+        Index the rows updated since the watermark, then move the watermark
+        """
+        index_path = "{}.{}".format(type(index).__module__, type(index).__name__)
+        started = timezone.now()
+        backend = index.get_backend(using)
+        backend.silently_fail = False
+
+        watermark = IndexWatermark.objects.filter(index=index_path, using=using).first()
+        since = None
+        if full:
+            self.stdout.write("Rebuilding {}".format(index_path))
+            backend.clear(models=[index.get_model()])
+        elif watermark:
+            since = watermark.indexed_until
+            self.stdout.write("Updating {} since {}".format(index_path, since))
+        else:
+            self.stdout.write(
+                "No watermark for {}, updating every row".format(index_path)
+            )
+
+        rows = index.build_queryset(using=using, start_date=since)
+        indexed = pipeline.update_rows(
+            index,
+            backend,
+            using,
+            rows,
+            commit_size,
+            log=self.stdout.write,
+            max_retries=max_retries,
+        )
+
+        # rows committed after the scan began may carry an earlier timestamp
+        indexed_until = started - timedelta(
+            seconds=settings.SOLR_INDEX_WATERMARK_MARGIN
+        )
+        if watermark and not full:
+            indexed_until = max(indexed_until, watermark.indexed_until)
+        IndexWatermark.objects.update_or_create(
+            index=index_path, using=using, defaults={"indexed_until": indexed_until}
+        )
+        self.stdout.write(
+            "Indexed {} rows for {} in {:.1f}s".format(
+                indexed, index_path, (timezone.now() - started).total_seconds()
+            )
+        )
@@ -1,40 +1,177 @@
+import time
+from datetime import timedelta
+from multiprocessing import Pool
+
 from django.core.management.base import BaseCommand
-from django.db import DEFAULT_DB_ALIAS
-from django.db.models import signals
+from django.db import connections
+from django.db.models import Max, Min, Sum
 
 from api.v2.models.Credential import Credential
+from agent_webhooks.models import ReprocessCheckpoint
 from agent_webhooks.utils.credential import CredentialManager
 from vcr_server.utils.solrqueue import SolrQueue
 
 
+def plan_ranges(min_id: int, max_id: int, range_size: int) -> list:
+    """
+    Split the credential ids into (start_id, end_id) ranges, inclusive
+    """
+    ranges = []
+    if min_id is None or max_id is None:
+        return ranges
+    start_id = min_id
+    while start_id <= max_id:
+        end_id = min(start_id + range_size - 1, max_id)
+        ranges.append((start_id, end_id))
+        start_id = end_id + 1
+    return ranges
+
+
+def reprocess_range(checkpoint_id: int, chunk_size: int) -> int:
+    """
+    Reprocess the credentials in one checkpointed range of ids
+
+    Returns:
+        int -- the number of credentials processed
+    """
+    checkpoint = ReprocessCheckpoint.objects.get(id=checkpoint_id)
+    last_id = checkpoint.last_id or checkpoint.start_id - 1
+    processed = 0
+    mgr = CredentialManager()
+    with SolrQueue():
+        while True:
+            credentials = list(
+                Credential.objects.filter(id__gt=last_id, id__lte=checkpoint.end_id)
+                .select_related("credential_type", "credential_set", "topic")
+                .order_by("id")[:chunk_size]
+            )
+            if not credentials:
+                break
+            # Remove and recreate search records, then reindex
+            mgr.reprocess_batch(credentials)
+            last_id = credentials[-1].id
+            processed += len(credentials)
+            ReprocessCheckpoint.objects.filter(id=checkpoint.id).update(
+                last_id=last_id, processed=checkpoint.processed + processed
+            )
+    ReprocessCheckpoint.objects.filter(id=checkpoint.id).update(completed=True)
+    return processed
+
+
+def _reprocess_task(args) -> int:
+    return reprocess_range(*args)
+
+
+def _init_worker():
+    # don't share the parent process' database connections
+    connections.close_all()
+
+
 class Command(BaseCommand):
     help = "Reprocesses all credentials to populate search database"
 
-    def handle(self, *args, **options):
-        queue = SolrQueue()
-        with queue:
-            self.reprocess(queue, *args, **options)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Number of worker processes",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of credentials processed per transaction",
+        )
+        parser.add_argument(
+            "--range-size",
+            type=int,
+            default=50000,
+            help="Number of credential ids assigned to a worker at a time",
+        )
+        parser.add_argument(
+            "--run-name",
+            default="reprocess_credentials",
+            help="Name of the checkpointed run, used to resume it",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Discard the checkpoints of a previous run",
+        )
 
-    def reprocess(self, queue, *args, **options):
+    def handle(self, *args, **options):
         self.stdout.write("Starting...")
+        run_name = options["run_name"]
+        workers = max(options["workers"], 1)
+        chunk_size = options["chunk_size"]
 
-        cred_count = Credential.objects.count()
-        self.stdout.write("Reprocessing {} credentials".format(cred_count))
+        checkpoints = self.load_checkpoints(
+            run_name, options["range_size"], options["restart"]
+        )
+        pending = checkpoints.filter(completed=False)
 
-        current_cred = 0
-        mgr = CredentialManager()
-        for credential in Credential.objects.all().iterator():
-            current_cred += 1
+        cred_count = Credential.objects.count()
+        done = checkpoints.aggregate(done=Sum("processed"))["done"] or 0
+        if done:
             self.stdout.write(
-                "Processing credential id: {} ({} of {})".format(
-                    credential.id, current_cred, cred_count
+                "Resuming run '{}': {} credentials already processed".format(
+                    run_name, done
                 )
             )
+        self.stdout.write(
+            "Reprocessing {} credentials in {} range(s) using {} worker(s)".format(
+                cred_count - done, pending.count(), workers
+            )
+        )
+
+        tasks = [
+            (checkpoint_id, chunk_size)
+            for checkpoint_id in pending.values_list("id", flat=True)
+        ]
+        start_time = time.perf_counter()
+        processed = 0
 
-            # Remove and recreate search records
-            mgr.reprocess(credential)
+        if workers == 1:
+            results = map(_reprocess_task, tasks)
+            pool = None
+        else:
+            connections.close_all()
+            pool = Pool(workers, initializer=_init_worker)
+            results = pool.imap_unordered(_reprocess_task, tasks)
+        try:
+            for count in results:
+                processed += count
+                self.report_progress(processed, cred_count - done, start_time)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        self.stdout.write(
+            "Reprocessed {} credentials in {:.1f}s".format(
+                processed, time.perf_counter() - start_time
+            )
+        )
+
+    def load_checkpoints(self, run_name: str, range_size: int, restart: bool):
+        checkpoints = ReprocessCheckpoint.objects.filter(run_name=run_name)
+        if restart:
+            checkpoints.delete()
+        if not checkpoints.exists():
+            bounds = Credential.objects.aggregate(min_id=Min("id"), max_id=Max("id"))
+            ReprocessCheckpoint.objects.bulk_create(
+                ReprocessCheckpoint(run_name=run_name, start_id=start_id, end_id=end_id)
+                for (start_id, end_id) in plan_ranges(
+                    bounds["min_id"], bounds["max_id"], range_size
+                )
+            )
+        return checkpoints
 
-            # Now reindex
-            signals.post_save.send(
-                sender=Credential, instance=credential, using=DEFAULT_DB_ALIAS
+    def report_progress(self, processed: int, total: int, start_time: float):
+        elapsed = time.perf_counter() - start_time
+        rate = processed / elapsed if elapsed else 0
+        remaining = max(total - processed, 0)
+        eta = str(timedelta(seconds=int(remaining / rate))) if rate else "-"
+        self.stdout.write(
+            "Processed {} of {} credentials ({:.1f}/s, ETA {})".format(
+                processed, total, rate, eta
             )
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from vcr_server.utils.solrqueue import SolrQueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues the search index updates which were given up on again, "
+        "for example once the cause of the failures has been fixed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--index", help="Dotted path of the search index, by default every index",
+        )
+        parser.add_argument(
+            "--using", help="The search connection, by default every connection"
+        )
+
+    def handle(self, *args, **options):
+        count = SolrQueue.requeue_dead(options["index"], options["using"])
+        self.stdout.write("Requeued {} dead index update(s)".format(count))
@@ -0,0 +1,54 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from vcr_server.utils.solrqueue import SolrQueue
+
+
+class Command(BaseCommand):
+    help = "Runs a search indexer service, processing the durable Solr queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of queued index updates claimed at a time",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between checks of the queue",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.SOLR_QUEUE_DURABLE:
+            raise CommandError("The indexer service requires SOLR_QUEUE_DURABLE")
+
+        stop = threading.Event()
+
+        def shutdown(signum, _frame):
+            self.stdout.write("Received signal {}, stopping ...".format(signum))
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        queue = SolrQueue(
+            durable=True,
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+        )
+        queue.start()
+        self.stdout.write("Indexer started")
+        try:
+            while not stop.wait(1):
+                pass
+        finally:
+            # drains the queue before exiting; if interrupted, the batch in
+            # progress is rolled back and stays queued
+            queue.stop()
+        self.stdout.write("Indexer stopped")
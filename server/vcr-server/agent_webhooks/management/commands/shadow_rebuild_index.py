@@ -0,0 +1,177 @@
+import copy
+from datetime import timedelta
+
+import pysolr
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from haystack import connections
+from haystack.utils import get_model_ct
+
+from api.v2.models.IndexWatermark import IndexWatermark
+from vcr_server.utils.index_check import IndexChecker
+from vcr_server.utils.indexer import IndexPipeline
+from vcr_server.utils.solr_cores import SolrCoreAdmin
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the search indexes in a shadow Solr core, then swaps it with "
+        "the live core once its document counts match the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--using", default="default", help="The search connection to rebuild"
+        )
+        parser.add_argument(
+            "--shadow-core",
+            help="Name of the shadow core, by default the live core name with a _shadow suffix",
+        )
+        parser.add_argument(
+            "--config-set",
+            default=settings.SOLR_SHADOW_CONFIG_SET,
+            help="Config set used to create the shadow core, by default the configuration of the live core",
+        )
+        parser.add_argument(
+            "--unload-old",
+            action="store_true",
+            help="Unload the previous live core after the swap, instead of keeping it as the shadow core",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.SOLR_INDEX_WORKERS,
+            help="Number of threads building search documents",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.SOLR_INDEX_CHUNK_SIZE,
+            help="Number of documents posted to Solr at a time",
+        )
+        parser.add_argument(
+            "--commit-size",
+            type=int,
+            default=10000,
+            help="Number of rows indexed between commits",
+        )
+
+    def handle(self, *args, **options):
+        using = options["using"]
+        indexes = list(connections[using].get_unified_index().get_indexes().values())
+        backend = connections[using].get_backend()
+        if not hasattr(backend, "conn"):
+            raise CommandError("A Solr search backend is required")
+        backend.silently_fail = False
+
+        base_url, core = SolrCoreAdmin.split_url(backend.conn.url)
+        shadow = options["shadow_core"] or core + "_shadow"
+        admin = SolrCoreAdmin(base_url, session=backend.conn.session)
+        if not admin.exists(shadow):
+            # without a config set, share the configuration of the live core
+            admin.create(shadow, options["config_set"] or admin.instance_dir(core))
+        shadow_backend = copy.copy(backend)
+        shadow_backend.conn = pysolr.Solr(
+            "{}/{}".format(base_url, shadow),
+            timeout=backend.conn.timeout,
+            session=backend.conn.session,
+        )
+        self.stdout.write("Clearing shadow core {}".format(shadow))
+        shadow_backend.conn.delete(q="*:*", commit=True)
+
+        margin = timedelta(seconds=settings.SOLR_INDEX_WATERMARK_MARGIN)
+        commit_size = options["commit_size"]
+        pipeline = IndexPipeline(options["workers"], options["batch_size"])
+        try:
+            started = timezone.now()
+            self.update(pipeline, indexes, shadow_backend, using, None, commit_size)
+            # rows updated while rebuilding were only indexed in the live core
+            caught_up = timezone.now()
+            self.update(
+                pipeline, indexes, shadow_backend, using, started - margin, commit_size
+            )
+            # rows deleted while rebuilding were only removed from the live core
+            self.remove_extra(indexes, shadow_backend, using)
+            # rows created since the catch up began may not have been indexed
+            self.verify(
+                indexes,
+                shadow_backend.conn,
+                using,
+                (caught_up - margin).replace(microsecond=0),
+            )
+
+            admin.swap(core, shadow)
+            self.stdout.write("Swapped cores {} and {}".format(core, shadow))
+            # rows updated or deleted during the catch up were only indexed in
+            # the old core
+            self.update(
+                pipeline, indexes, backend, using, caught_up - margin, commit_size
+            )
+            self.remove_extra(indexes, backend, using)
+        finally:
+            pipeline.shutdown()
+
+        for index in indexes:
+            IndexWatermark.objects.update_or_create(
+                index="{}.{}".format(type(index).__module__, type(index).__name__),
+                using=using,
+                defaults={"indexed_until": caught_up - margin},
+            )
+        if options["unload_old"]:
+            admin.unload(shadow)
+
+    def update(self, pipeline, indexes, backend, using, since, commit_size: int):
+        for index in indexes:
+            rows = index.build_queryset(using=using, start_date=since)
+            indexed = pipeline.update_rows(
+                index, backend, using, rows, commit_size, log=self.stdout.write
+            )
+            self.stdout.write(
+                "Indexed {} {} rows{}".format(
+                    indexed,
+                    get_model_ct(index.get_model()),
+                    " updated since {}".format(since) if since else "",
+                )
+            )
+
+    def remove_extra(self, indexes, backend, using):
+        for index in indexes:
+            removed = IndexChecker(index, backend, using).remove_extra()
+            self.stdout.write(
+                "Removed {} {} documents without a row".format(
+                    removed, get_model_ct(index.get_model())
+                )
+            )
+
+    def verify(self, indexes, conn, using, created_until):
+        """
+        Compare the document counts of the shadow core with the database, for
+        the rows created until the given time
+        """
+        solr_date = created_until.astimezone(timezone.utc).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        for index in indexes:
+            model_ct = get_model_ct(index.get_model())
+            expected = (
+                index.index_queryset(using)
+                .filter(create_timestamp__lte=created_until)
+                .count()
+            )
+            found = conn.search(
+                "*:*",
+                fq=[
+                    "django_ct:{}".format(model_ct),
+                    "create_timestamp:[* TO {}]".format(solr_date),
+                ],
+                rows=0,
+            ).hits
+            if found != expected:
+                raise CommandError(
+                    "The shadow core has {} {} documents, expected {}; "
+                    "the live core has not been changed".format(
+                        found, model_ct, expected
+                    )
+                )
+            self.stdout.write("Verified {} {} documents".format(found, model_ct))
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('name', models.TextField(primary_key=True, serialize=False)),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'cache_generation',
+            },
+        ),
+    ]
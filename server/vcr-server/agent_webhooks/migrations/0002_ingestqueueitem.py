@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:32
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent_webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestQueueItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_timestamp', models.DateTimeField(auto_now_add=True, null=True)),
+                ('update_timestamp', models.DateTimeField(auto_now=True, null=True)),
+                ('topic', models.TextField()),
+                ('state', models.TextField(null=True)),
+                ('credential_exchange_id', models.TextField(db_index=True, null=True)),
+                ('message', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('status', models.TextField(db_index=True, default='pending')),
+                ('attempts', models.IntegerField(default=0)),
+                ('credential_id', models.TextField(null=True)),
+                ('error', models.TextField(null=True)),
+            ],
+            options={
+                'db_table': 'ingest_queue',
+                'ordering': ('id',),
+            },
+        ),
+    ]
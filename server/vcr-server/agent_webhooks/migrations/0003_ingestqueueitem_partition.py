@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent_webhooks', '0002_ingestqueueitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestqueueitem',
+            name='partition',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent_webhooks', '0003_ingestqueueitem_partition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReprocessCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_timestamp', models.DateTimeField(auto_now_add=True, null=True)),
+                ('update_timestamp', models.DateTimeField(auto_now=True, null=True)),
+                ('run_name', models.TextField()),
+                ('start_id', models.BigIntegerField()),
+                ('end_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField(null=True)),
+                ('processed', models.IntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'reprocess_checkpoint',
+                'ordering': ('id',),
+                'unique_together': {('run_name', 'start_id')},
+            },
+        ),
+    ]
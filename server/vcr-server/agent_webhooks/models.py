@@ -1,3 +1,62 @@
+from django.contrib.postgres import fields as contrib
 from django.db import models
 
-# Create your models here.
+from api.v2.models.Auditable import Auditable
+
+
+class CacheGeneration(models.Model):
+    """
+    Generation counter for a process-wide cache.
+
+    Bumping the generation invalidates the cache in every worker process.
+    """
+
+    name = models.TextField(primary_key=True)
+    generation = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "cache_generation"
+
+
+class IngestQueueItem(Auditable):
+    """
+    A webhook message waiting to be processed by the ingest workers.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_STORED = "stored"
+    STATUS_FAILED = "failed"
+
+    topic = models.TextField()
+    state = models.TextField(null=True)
+    credential_exchange_id = models.TextField(db_index=True, null=True)
+    # hash of the topic source_id, used to assign the message to an ingest lane
+    partition = models.IntegerField(db_index=True, default=0)
+    message = contrib.JSONField()
+    status = models.TextField(db_index=True, default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    credential_id = models.TextField(null=True)
+    error = models.TextField(null=True)
+
+    class Meta:
+        db_table = "ingest_queue"
+        ordering = ("id",)
+
+
+class ReprocessCheckpoint(Auditable):
+    """
+    Progress of a credential reprocessing run over one range of credential ids.
+    """
+
+    run_name = models.TextField()
+    start_id = models.BigIntegerField()
+    end_id = models.BigIntegerField()
+    last_id = models.BigIntegerField(null=True)
+    processed = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = "reprocess_checkpoint"
+        ordering = ("id",)
+        unique_together = (("run_name", "start_id"),)
@@ -0,0 +1,28 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from agent_webhooks.management.commands.reprocess_credentials import plan_ranges
+from agent_webhooks.models import ReprocessCheckpoint
+
+
+class ReprocessCredentials_TestCase(TestCase):
+    def test_plan_ranges(self):
+        self.assertEqual(plan_ranges(None, None, 10), [])
+        self.assertEqual(plan_ranges(1, 25, 10), [(1, 10), (11, 20), (21, 25)])
+        self.assertEqual(plan_ranges(5, 5, 10), [(5, 5)])
+
+    def test_resume(self):
+        ReprocessCheckpoint.objects.create(
+            run_name="test", start_id=1, end_id=10, processed=10, completed=True
+        )
+        out = StringIO()
+        call_command("reprocess_credentials", "--run-name", "test", stdout=out)
+        self.assertIn("10 credentials already processed", out.getvalue())
+        self.assertEqual(ReprocessCheckpoint.objects.filter(run_name="test").count(), 1)
+
+        call_command(
+            "reprocess_credentials", "--run-name", "test", "--restart", stdout=out
+        )
+        self.assertFalse(ReprocessCheckpoint.objects.filter(run_name="test").exists())
@@ -0,0 +1,129 @@
+from unittest.mock import patch
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from agent_webhooks.utils.credential import CredentialBatchResult
+
+
+def _credential_message(exchange_id, corp_num):
+    return {
+        "credential_exchange_id": exchange_id,
+        "state": "credential_received",
+        "thread_id": "thread-" + exchange_id,
+        "raw_credential": {
+            "schema_id": "schema-origin-did:2:schema-name:schema-version",
+            "cred_def_id": "origin-did:3:CL:25:tag",
+            "rev_reg_id": None,
+            "values": {"corp_num": {"raw": corp_num, "encoded": "1"}},
+        },
+    }
+
+
+class AgentBatchCallback_TestCase(APITestCase):
+    @patch("agent_webhooks.utils.ingest.send_problem_report", autospec=True)
+    @patch("agent_webhooks.utils.ingest.store_credential", autospec=True)
+    @patch(
+        "agent_webhooks.utils.ingest.CredentialManager.process_batch", autospec=True,
+    )
+    def test_batch_results(
+        self, mock_process_batch, mock_store_credential, mock_problem_report
+    ):
+        def process_batch(_mgr, credentials):
+            results = []
+            for credential in credentials:
+                if credential.corp_num == "BAD":
+                    results.append(
+                        CredentialBatchResult(credential, error="Invalid credential")
+                    )
+                else:
+                    db_credential = type(
+                        "DbCredential", (), {"credential_id": credential.thread_id}
+                    )
+                    results.append(CredentialBatchResult(credential, db_credential))
+            return results
+
+        mock_process_batch.side_effect = process_batch
+
+        messages = [
+            _credential_message("1", "BC0001"),
+            _credential_message("2", "BAD"),
+            {"credential_exchange_id": "3", "state": "offer_received"},
+        ]
+        client = APIClient()
+        response = client.post(
+            "/agentcb/topic/credentials/batch/", messages, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            results[0],
+            {
+                "success": True,
+                "credential_id": "thread-1",
+                "credential_exchange_id": "1",
+            },
+        )
+        self.assertEqual(
+            results[1],
+            {
+                "success": False,
+                "error": "Invalid credential",
+                "credential_exchange_id": "2",
+            },
+        )
+        self.assertFalse(results[2]["success"])
+        mock_store_credential.assert_called_once_with("1", "thread-1")
+        mock_problem_report.assert_called_once_with("2", "Invalid credential")
+
+    @patch("agent_webhooks.utils.ingest.store_credential", autospec=True)
+    @patch(
+        "agent_webhooks.utils.ingest.CredentialManager.process_batch", autospec=True,
+    )
+    def test_batch_malformed_message(self, mock_process_batch, mock_store_credential):
+        mock_process_batch.side_effect = lambda _mgr, credentials: [
+            CredentialBatchResult(
+                credential,
+                type("DbCredential", (), {"credential_id": credential.thread_id}),
+            )
+            for credential in credentials
+        ]
+        client = APIClient()
+        response = client.post(
+            "/agentcb/topic/credentials/batch/",
+            [1, _credential_message("1", "BC0001")],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertFalse(results[0]["success"])
+        self.assertIsNone(results[0]["credential_exchange_id"])
+        self.assertTrue(results[1]["success"])
+        mock_store_credential.assert_called_once_with("1", "thread-1")
+
+    def test_batch_requires_list(self):
+        client = APIClient()
+        response = client.post(
+            "/agentcb/topic/credentials/batch/",
+            {"state": "credential_received"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AgentCallbackQueue_TestCase(APITestCase):
+    @patch("agent_webhooks.views.IngestQueue.enqueue", autospec=True)
+    def test_credential_queued(self, mock_enqueue):
+        mock_enqueue.return_value = type("QueueItem", (), {"id": 7})
+        message = _credential_message("1", "BC0001")
+        client = APIClient()
+        with self.settings(ASYNC_CREDENTIAL_INGEST=True):
+            response = client.post(
+                "/agentcb/topic/credentials/", message, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["queue_id"], 7)
+        mock_enqueue.assert_called_once_with("credentials", message)
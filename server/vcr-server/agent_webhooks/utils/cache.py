@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from agent_webhooks.models import CacheGeneration
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_generation(name: str) -> int:
+    """
+    Fetch the current generation of a named cache
+    """
+    return (
+        CacheGeneration.objects.filter(name=name)
+        .values_list("generation", flat=True)
+        .first()
+        or 0
+    )
+
+
+def bump_generation(name: str) -> int:
+    """
+    Increment the generation of a named cache, invalidating it in all processes
+    """
+    with transaction.atomic():
+        _, created = CacheGeneration.objects.get_or_create(
+            name=name, defaults={"generation": 1}
+        )
+        if not created:
+            CacheGeneration.objects.filter(name=name).update(
+                generation=F("generation") + 1
+            )
+    return get_generation(name)
+
+
+class GenerationCache:
+    """
+    A thread-safe, process-wide cache which is cleared when its generation
+    counter in the database changes.
+
+    The generation is checked at most once every `check_interval` seconds, so
+    that cache hits do not cost a database round trip.
+    """
+
+    def __init__(self, name: str, check_interval: float = None):
+        self.name = name
+        if check_interval is None:
+            check_interval = settings.CACHE_GENERATION_CHECK_INTERVAL
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._values = {}
+        self._epoch = 0
+        self._generation = None
+        self._checked = None
+
+    def get(self, key, loader):
+        """
+        Fetch a cached value, calling `loader` to produce it when not present
+        """
+        self.check_generation()
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        epoch = self._epoch
+        value = loader()
+        with self._lock:
+            # don't store a value loaded before the cache was cleared
+            if epoch == self._epoch:
+                self._values[key] = value
+        return value
+
+    def clear(self):
+        """
+        Clear the cache in this process only
+        """
+        with self._lock:
+            self._values = {}
+            self._epoch += 1
+
+    def invalidate(self):
+        """
+        Clear the cache and bump its generation, clearing it in all processes
+        """
+        generation = bump_generation(self.name)
+        with self._lock:
+            self._values = {}
+            self._epoch += 1
+            self._generation = generation
+            self._checked = time.monotonic()
+        LOGGER.info("Invalidated cache '%s', generation %d", self.name, generation)
+
+    def check_generation(self):
+        """
+        Clear the cache if its generation has been bumped by another process
+        """
+        now = time.monotonic()
+        checked = self._checked
+        if checked is not None and now - checked < self.check_interval:
+            return
+        generation = get_generation(self.name)
+        with self._lock:
+            if generation != self._generation:
+                if self._generation is not None:
+                    LOGGER.info(
+                        "Cache '%s' updated to generation %d", self.name, generation
+                    )
+                self._values = {}
+                self._epoch += 1
+                self._generation = generation
+            self._checked = now
@@ -2,16 +2,21 @@ import base64
 import hashlib
 import json as _json
 import logging
+import random
 import re
+import threading
 import time
 import uuid
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from datetime import datetime
 from importlib import import_module
+from typing import Sequence
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import DEFAULT_DB_ALIAS, transaction
-from django.db.utils import IntegrityError
+from django.db.models import signals
+from django.db.utils import DatabaseError, IntegrityError
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 from subscriptions.models.HookableCredential import HookableCredential
@@ -20,6 +25,7 @@ from api.v2.models.Address import Address
 from api.v2.models.Attribute import Attribute
 from api.v2.models.Claim import Claim
 from api.v2.models.Credential import Credential as CredentialModel
+from api.v2.models.Credential import claims_fingerprint
 from api.v2.models.CredentialSet import CredentialSet
 from api.v2.models.CredentialType import CredentialType
 from api.v2.models.Issuer import Issuer
@@ -27,6 +33,9 @@ from api.v2.models.Name import Name
 from api.v2.models.Schema import Schema
 from api.v2.models.Topic import Topic
 from api.v2.models.TopicRelationship import TopicRelationship
+from agent_webhooks.utils.cache import GenerationCache
+from agent_webhooks.utils.idempotency import credential_guard
+from agent_webhooks.utils.issue_date import last_issue_dates
 
 LOGGER = logging.getLogger(__name__)
 
@@ -41,6 +50,14 @@ SUPPORTED_MODELS_MAPPING = {
 
 SchemaKey = namedtuple("SchemaKey", "origin_did name version")
 
+# Postgres error codes for deadlock_detected and serialization_failure
+DEADLOCK_ERROR_CODES = ("40P01", "40001")
+
+# the columns changed when credentials are superseded in bulk
+STATUS_UPDATE_FIELDS = frozenset(
+    ("latest", "revoked", "revoked_by", "revoked_date", "update_timestamp")
+)
+
 
 def schema_key(s_id: str) -> SchemaKey:
     """
@@ -60,6 +77,14 @@ class CredentialException(Exception):
     pass
 
 
+class DuplicateCredentialException(CredentialException):
+    """Raised for a credential which has already been stored"""
+
+    def __init__(self, credential_id: str):
+        super().__init__("Credential {} has already been stored".format(credential_id))
+        self.credential_id = credential_id
+
+
 class Credential(object):
     """A python-idiomatic representation of an indy credential
 
@@ -211,19 +236,42 @@ class Credential(object):
 
 
 class CredentialClaims:
+    PRELOAD_CHUNK_SIZE = 1000
+
     def __init__(self, cred: CredentialModel):
         self._cred = cred
         self._claims = {}
         self._load_claims()
 
+    @classmethod
+    def preload(cls, credentials: Sequence[CredentialModel]):
+        """
+        Load the claims for a batch of credentials with one query per chunk,
+        for credentials without stored claim values
+        """
+        pending = [
+            cred
+            for cred in credentials
+            if cred.claim_values is None and "claims" not in (cred._cache or {})
+        ]
+        for idx in range(0, len(pending), cls.PRELOAD_CHUNK_SIZE):
+            chunk = {
+                cred.id: {} for cred in pending[idx : idx + cls.PRELOAD_CHUNK_SIZE]
+            }
+            for (cred_id, name, value) in Claim.objects.filter(
+                credential_id__in=list(chunk)
+            ).values_list("credential_id", "name", "value"):
+                chunk[cred_id][name] = value
+            for cred in pending[idx : idx + cls.PRELOAD_CHUNK_SIZE]:
+                cred._cached("claims", chunk[cred.id])
+
     def _load_claims(self):
-        claims = getattr(self._cred, "_claims_cache", None)
-        if claims is None:
-            claims = {}
-            for claim in self._cred.claims.all():
-                claims[claim.name] = claim.value
-            setattr(self._cred, "_claims_cache", claims)
-        self._claims = claims
+        self._claims = self._cred.all_claims
+
+    @property
+    def values(self) -> dict:
+        """Accessor for the claim values by name"""
+        return self._claims
 
     def __getattr__(self, name: str):
         """Make claim values accessible on class instance"""
@@ -235,104 +283,260 @@ class CredentialClaims:
             )
 
 
-class CredentialManager(object):
+def resolve_processor(function_path_with_name: str):
     """
-    Handles processing of incoming credentials. Populates application
-    database based on rules provided by issuer are registration.
+    Resolve a processor function from its dot notation path.
+
+    The last token is the function name and all preceeding dots denote
+    the path of the module starting from `PROCESSOR_FUNCTION_BASE_PATH`.
     """
+    function_path, function_name = function_path_with_name.rsplit(".", 1)
 
-    def __init__(self) -> None:
-        self._cred_type_cache = {}
+    # Does the file exist?
+    try:
+        function_module = import_module(
+            "{}.{}".format(PROCESSOR_FUNCTION_BASE_PATH, function_path)
+        )
+    except ModuleNotFoundError:
+        raise CredentialException(
+            "No processor module named '{}'".format(function_path)
+        )
 
-    @classmethod
-    def get_claims(cls, credential):
-        if isinstance(credential, Credential):
-            return credential
-        elif isinstance(credential, CredentialModel):
-            return CredentialClaims(credential)
+    # Does the function exist?
+    try:
+        return getattr(function_module, function_name)
+    except AttributeError:
+        raise CredentialException(
+            "Module '{}' has no function '{}'.".format(function_path, function_name)
+        )
 
-    @classmethod
-    def process_mapping(cls, rules, credential):
-        """
-        Takes our mapping rules and returns a value from credential
-        """
-        if not rules:
-            return None
 
-        # Get required values from config
-        try:
-            _input = rules["input"]
-            _from = rules["from"]
-        except KeyError:
-            raise CredentialException(
-                "Every mapping must specify 'input' and 'from' values."
-            )
+def compile_mapping(rules):
+    """
+    Compile mapping rules into a function returning the mapped value
+    for a set of credential claims.
+
+    Returns None when there are no rules.
+    """
+    if not rules:
+        return None
 
-        # Processor is optional
-        processor = rules.get("processor")
+    # Get required values from config
+    try:
+        _input = rules["input"]
+        _from = rules["from"]
+    except KeyError:
+        raise CredentialException(
+            "Every mapping must specify 'input' and 'from' values."
+        )
 
-        claims = cls.get_claims(credential)
+    # Get model field value from string literal or claim value
+    if _from == "value":
 
-        # Get model field value from string literal or claim value
-        if _from == "value":
-            mapped_value = _input
-        elif _from == "claim":
+        def get_value(claims):
+            return _input
+
+    elif _from == "claim":
+
+        def get_value(claims):
             try:
-                mapped_value = getattr(claims, _input)
+                return getattr(claims, _input)
             except AttributeError:
                 raise CredentialException(
                     "Credential does not contain the configured claim '{}'".format(
                         _input
                     )
                 )
+
+    else:
+        raise CredentialException(
+            "Supported field from values are 'value' and 'claim'"
+            + " but received '{}'".format(_from)
+        )
+
+    # If we have a processor config, build pipeline of functions
+    # and run field value through pipeline. Processor is optional
+    pipeline = tuple(resolve_processor(path) for path in rules.get("processor") or ())
+    if not pipeline:
+        return get_value
+
+    def mapping(claims):
+        mapped_value = get_value(claims)
+        for function in pipeline:
+            mapped_value = function(mapped_value)
+        return mapped_value
+
+    return mapping
+
+
+class ProcessorPlan:
+    """
+    The processor config of a credential type compiled into mapping functions,
+    so that credentials can be processed without re-parsing the config.
+    """
+
+    TOPIC_FIELDS = (
+        "related_name",
+        "related_source_id",
+        "related_type",
+        "name",
+        "source_id",
+        "type",
+    )
+    CREDENTIAL_FIELDS = ("effective_date", "revoked_date", "inactive")
+
+    def __init__(self, processor_config: dict):
+        self.processor_config = processor_config
+        processor_config = processor_config or {}
+
+        self.cardinality_fields = tuple(
+            processor_config.get("cardinality_fields") or ()
+        )
+
+        # We accept object or array for topic def
+        topic_defs = processor_config.get("topic") or []
+        if type(topic_defs) is dict:
+            topic_defs = [topic_defs]
+        self.topics = [
+            {
+                field: compile_mapping(topic_def.get(field))
+                for field in self.TOPIC_FIELDS
+            }
+            for topic_def in topic_defs
+        ]
+
+        credential_def = processor_config.get("credential")
+        self.credential = (
+            {
+                field: compile_mapping(credential_def.get(field))
+                for field in self.CREDENTIAL_FIELDS
+            }
+            if credential_def
+            else None
+        )
+
+        self.models = []
+        for model_mapper in processor_config.get("mapping") or []:
+            fields = [
+                (field, compile_mapping(field_mapper))
+                for field, field_mapper in model_mapper["fields"].items()
+            ]
+            self.models.append((model_mapper["model"], fields))
+
+    @classmethod
+    def compile(cls, processor_config) -> "ProcessorPlan":
+        """
+        Return a plan for a processor config, which may already be compiled
+        """
+        if isinstance(processor_config, ProcessorPlan):
+            return processor_config
+        return cls(processor_config)
+
+
+# Credential types by id and by cred_def_id, shared across threads and
+# invalidated in all workers when an issuer is registered
+credential_type_cache = GenerationCache("credential_type")
+
+_processor_plans = {}
+_processor_plans_lock = threading.Lock()
+
+
+def get_processor_plan(credential_type: CredentialType) -> ProcessorPlan:
+    """
+    Fetch the compiled processor plan for a credential type from the
+    process-wide cache, compiling it if necessary.
+    """
+    processor_config = credential_type.processor_config
+    plan = _processor_plans.get(credential_type.id)
+    if plan is None or (
+        plan.processor_config is not processor_config
+        and plan.processor_config != processor_config
+    ):
+        plan = ProcessorPlan(processor_config)
+        if credential_type.id:
+            with _processor_plans_lock:
+                _processor_plans[credential_type.id] = plan
+    return plan
+
+
+def invalidate_processor_plans(credential_type_ids: Sequence[int] = None):
+    """
+    Remove compiled processor plans from the cache, for example when
+    the credential types are re-registered.
+    """
+    with _processor_plans_lock:
+        if credential_type_ids is None:
+            _processor_plans.clear()
         else:
-            raise CredentialException(
-                "Supported field from values are 'value' and 'claim'"
-                + " but received '{}'".format(_from)
-            )
+            for type_id in credential_type_ids:
+                _processor_plans.pop(type_id, None)
 
-        # If we have a processor config, build pipeline of functions
-        # and run field value through pipeline
-        if processor is not None:
-            pipeline = []
-            # Construct pipeline by dot notation. Last token is the
-            # function name and all preceeding dots denote path of
-            # module starting from `PROCESSOR_FUNCTION_BASE_PATH``
-            for function_path_with_name in processor:
-                function_path, function_name = function_path_with_name.rsplit(".", 1)
-
-                # Does the file exist?
-                try:
-                    function_module = import_module(
-                        "{}.{}".format(PROCESSOR_FUNCTION_BASE_PATH, function_path)
-                    )
-                except ModuleNotFoundError:
-                    raise CredentialException(
-                        "No processor module named '{}'".format(function_path)
-                    )
 
-                # Does the function exist?
-                try:
-                    function = getattr(function_module, function_name)
-                except AttributeError:
-                    raise CredentialException(
-                        "Module '{}' has no function '{}'.".format(
-                            function_path, function_name
-                        )
-                    )
+def is_deadlock_error(error: Exception) -> bool:
+    """
+    Check whether a database error was caused by a deadlock between transactions
+    """
+    if not isinstance(error, DatabaseError):
+        return False
+    cause = error.__cause__ or error
+    return getattr(cause, "pgcode", None) in DEADLOCK_ERROR_CODES
 
-                # Build up a list of functions to call
-                pipeline.append(function)
 
-            # We want to run the pipeline in logical order
-            pipeline.reverse()
+def retry_on_deadlock(func, *args, **kwargs):
+    """
+    Run a transaction, retrying it with exponential backoff and random jitter
+    when the database reports a deadlock.
+
+    A transaction can only be retried as a whole, so errors are not retried
+    when already inside an atomic block.
+    """
+    retries = settings.INGEST_DEADLOCK_RETRIES
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except DatabaseError as e:
+            if (
+                attempt >= retries
+                or not is_deadlock_error(e)
+                or transaction.get_connection().in_atomic_block
+            ):
+                raise
+            delay = random.uniform(
+                0, settings.INGEST_DEADLOCK_RETRY_DELAY * 2 ** attempt
+            )
+            attempt += 1
+            LOGGER.warning(
+                "Deadlock detected, retrying transaction in %.3fs (attempt %d of %d)",
+                delay,
+                attempt,
+                retries,
+            )
+            time.sleep(delay)
 
-            # Run pipeline
-            while len(pipeline) > 0:
-                function = pipeline.pop()
-                mapped_value = function(mapped_value)
 
-        return mapped_value
+class CredentialManager(object):
+    """
+    Handles processing of incoming credentials. Populates application
+    database based on rules provided by issuer are registration.
+    """
+
+    @classmethod
+    def get_claims(cls, credential):
+        if isinstance(credential, Credential):
+            return credential
+        elif isinstance(credential, CredentialModel):
+            return CredentialClaims(credential)
+
+    @classmethod
+    def process_mapping(cls, rules, credential):
+        """
+        Takes our mapping rules and returns a value from credential
+        """
+        mapping = compile_mapping(rules)
+        if not mapping:
+            return None
+        return mapping(cls.get_claims(credential))
 
     def get_credential_type(self, credential: (Credential, CredentialModel)):
         """
@@ -341,42 +545,23 @@ class CredentialManager(object):
         LOGGER.debug(">>> get credential context")
         start_time = time.perf_counter()
         result = None
-        type_id = getattr(credential, "credential_type_id", None)
+        # claims of an incoming credential share its attribute namespace,
+        # so only a stored credential is resolved through its foreign key
+        type_id = None
+        if isinstance(credential, CredentialModel):
+            type_id = credential.credential_type_id
         if type_id:
-            result = self._cred_type_cache.get(type_id)
-            if not result:
-                result = CredentialType.objects.get(pk=type_id)
-                self._cred_type_cache[type_id] = result
+            result = credential_type_cache.get(
+                ("id", type_id),
+                lambda: CredentialType.objects.select_related("issuer", "schema").get(
+                    pk=type_id
+                ),
+            )
         elif isinstance(credential, Credential):
-            cache_key = (credential.cred_def_id,)
-            result = self._cred_type_cache.get(cache_key)
-            if not result:
-                try:
-                    issuer = Issuer.objects.get(did=credential.origin_did)
-                    schema = Schema.objects.get(
-                        origin_did=credential.schema_origin_did,
-                        name=credential.schema_name,
-                        version=credential.schema_version,
-                    )
-                except Issuer.DoesNotExist:
-                    raise CredentialException(
-                        "Issuer with did '{}' does not exist.".format(
-                            credential.origin_did
-                        )
-                    )
-                except Schema.DoesNotExist:
-                    raise CredentialException(
-                        "Schema with origin_did"
-                        + " '{}', name '{}', and version '{}' ".format(
-                            credential.schema_origin_did,
-                            credential.schema_name,
-                            credential.schema_version,
-                        )
-                        + " does not exist."
-                    )
-
-                result = CredentialType.objects.get(schema=schema, issuer=issuer)
-                self._cred_type_cache[cache_key] = result
+            result = credential_type_cache.get(
+                ("cred_def_id", credential.cred_def_id),
+                lambda: self.load_credential_type(credential),
+            )
         LOGGER.debug(
             "<<< get credential context: " + str(time.perf_counter() - start_time)
         )
@@ -384,6 +569,56 @@ class CredentialManager(object):
             raise CredentialException("Credential type not found")
         return result
 
+    @classmethod
+    def load_credential_type(cls, credential: Credential) -> CredentialType:
+        """
+        Load the credential type for an incoming credential from the database
+        """
+        try:
+            issuer = Issuer.objects.get(did=credential.origin_did)
+            schema = Schema.objects.get(
+                origin_did=credential.schema_origin_did,
+                name=credential.schema_name,
+                version=credential.schema_version,
+            )
+        except Issuer.DoesNotExist:
+            raise CredentialException(
+                "Issuer with did '{}' does not exist.".format(credential.origin_did)
+            )
+        except Schema.DoesNotExist:
+            raise CredentialException(
+                "Schema with origin_did"
+                + " '{}', name '{}', and version '{}' ".format(
+                    credential.schema_origin_did,
+                    credential.schema_name,
+                    credential.schema_version,
+                )
+                + " does not exist."
+            )
+
+        try:
+            return CredentialType.objects.select_related("issuer", "schema").get(
+                schema=schema, issuer=issuer
+            )
+        except CredentialType.DoesNotExist:
+            raise CredentialException("Credential type not found")
+
+    def partition_key(self, credential: Credential) -> str:
+        """
+        Determine the topic source_id for an incoming credential without
+        touching the topic tables, used to assign credentials to ingest lanes.
+        """
+        credential_type = self.get_credential_type(credential)
+        plan = get_processor_plan(credential_type)
+        claims = self.get_claims(credential)
+        for topic_def in plan.topics:
+            for field in ("source_id", "name"):
+                mapping = topic_def[field]
+                value = mapping(claims) if mapping else None
+                if value:
+                    return str(value)
+        return None
+
     def process(
         self, credential: Credential, check_from_did: str = None
     ) -> CredentialModel:
@@ -404,20 +639,141 @@ class CredentialManager(object):
 
         return self.populate_application_database(credential_type, credential)
 
+    @classmethod
+    def check_duplicate(cls, credential: Credential, stored_ids: set = None):
+        """
+        Reject a credential with the same thread_id as a stored credential
+
+        Called once before the topics are resolved, to reject a retried
+        webhook cheaply, and again while holding the topic locks, so it
+        cannot race the original one. When `stored_ids` is provided it holds
+        the stored credential ids among a batch, looked up at once, otherwise
+        the credential_id index is queried.
+        """
+        credential_id = credential.thread_id
+        if stored_ids is not None:
+            duplicate = credential_id in stored_ids
+        else:
+            duplicate = credential_guard.exists(credential_id)
+        if duplicate:
+            credential_guard.record_suppressed(credential_id)
+            raise DuplicateCredentialException(credential_id)
+
     def reprocess(self, credential: CredentialModel):
         """
         Reprocesses an existing credential in order to update the related search models
         """
         credential_type = self.get_credential_type(credential)
-        processor_config = credential_type.processor_config
+        processor_config = get_processor_plan(credential_type)
+        CredentialClaims.preload([credential])
 
         with transaction.atomic():
+            self.update_claim_columns([credential])
             if not credential.credential_set:
                 cardinality = self.credential_cardinality(credential, processor_config)
                 self.update_credential_set(credential_type, credential, cardinality)
             self.remove_search_models(credential)
             self.create_search_models(credential, processor_config)
 
+    @classmethod
+    def find_credentials_by_claims(cls, claims_list: Sequence[dict]) -> list:
+        """
+        Find the current credential matching each set of claims
+
+        Credentials are matched by the fingerprint of their claims using a
+        single query. Credentials stored before the fingerprint and the JSONB
+        claim values were added, and not yet backfilled, are matched through
+        the claim table instead.
+
+        Returns:
+            list -- the credential_id for each set of claims, in order
+        """
+        active = CredentialModel.objects.filter(
+            revoked=False, inactive=False, latest=True
+        )
+        hashes = [claims_fingerprint(claims) for claims in claims_list]
+        found = {}
+        for (claims_hash, credential_id) in active.filter(
+            claims_hash__in=set(hashes)
+        ).values_list("claims_hash", "credential_id"):
+            found.setdefault(claims_hash, []).append(credential_id)
+
+        result = []
+        for claims, claims_hash in zip(claims_list, hashes):
+            matches = found.get(claims_hash)
+            if not matches:
+                credential_query = active.filter(claims_hash__isnull=True)
+                for attr in claims:
+                    credential_query = credential_query.filter(
+                        claims__name=attr, claims__value=claims[attr]
+                    )
+                matches = list(credential_query.values_list("credential_id", flat=True))
+            # If we don't have exactly 1 result, we can't construct a presentation
+            # deterministically
+            if len(matches) != 1:
+                raise CredentialException(
+                    "Number of credentials matching claims {} was not 1, it was {}".format(
+                        claims, len(matches)
+                    )
+                )
+            result.append(matches[0])
+        return result
+
+    @classmethod
+    def update_claim_columns(cls, credentials: Sequence[CredentialModel]) -> int:
+        """
+        Store the claim values and claims fingerprint of credentials ingested
+        before they were added
+
+        Returns:
+            int -- the number of credentials updated
+        """
+        CredentialClaims.preload(credentials)
+        missing = [
+            cred
+            for cred in credentials
+            if cred.claim_values is None or not cred.claims_hash
+        ]
+        for cred in missing:
+            cred.claim_values = cred.all_claims
+            cred.claims_hash = claims_fingerprint(cred.claim_values)
+        if missing:
+            CredentialModel.objects.bulk_update(
+                missing, ["claim_values", "claims_hash"]
+            )
+        return len(missing)
+
+    def reprocess_batch(self, credentials: Sequence[CredentialModel]):
+        """
+        Reprocesses a batch of existing credentials in a single transaction
+
+        Search models are replaced using bulk deletes and inserts, and the
+        credentials are reindexed when the transaction commits.
+        """
+        CredentialClaims.preload(credentials)
+        rows = CredentialRows()
+        with transaction.atomic():
+            self.update_claim_columns(credentials)
+            for credential in credentials:
+                credential_type = self.get_credential_type(credential)
+                processor_config = get_processor_plan(credential_type)
+                if not credential.credential_set:
+                    cardinality = self.credential_cardinality(
+                        credential, processor_config
+                    )
+                    self.update_credential_set(
+                        credential_type, credential, cardinality, rows
+                    )
+                rows.search_models.extend(
+                    self.create_search_models(credential, processor_config, save=False)
+                )
+            self.remove_search_models(credentials)
+            rows.save()
+            for credential in credentials:
+                signals.post_save.send(
+                    sender=CredentialModel, instance=credential, using=DEFAULT_DB_ALIAS
+                )
+
     @classmethod
     def find_or_create_topic(cls, topic_spec: dict, retry=True):
         """
@@ -445,36 +801,29 @@ class CredentialManager(object):
         """
         Resolve the related topic(s) for a credential based on the processor config
         """
-        topic_defs = processor_config["topic"]
-        # We accept object or array for topic def
-        if type(topic_defs) is dict:
-            topic_defs = [topic_defs]
+        plan = ProcessorPlan.compile(processor_config)
+        claims = cls.get_claims(credential)
 
         topic_created = False
         related_topic_created = False
         result = (None, None, topic_created, related_topic_created)
 
+        def map_value(mapping):
+            return mapping(claims) if mapping else None
+
         # Issuer can register multiple topic selectors to fall back on
         # We use the first valid topic and related parent if applicable
-        for topic_def in topic_defs:
+        for topic_def in plan.topics:
             related_topic = None
             topic = None
 
-            related_topic_name = cls.process_mapping(
-                topic_def.get("related_name"), credential
-            )
-            related_topic_source_id = cls.process_mapping(
-                topic_def.get("related_source_id"), credential
-            )
-            related_topic_type = cls.process_mapping(
-                topic_def.get("related_type"), credential
-            )
+            related_topic_name = map_value(topic_def["related_name"])
+            related_topic_source_id = map_value(topic_def["related_source_id"])
+            related_topic_type = map_value(topic_def["related_type"])
 
-            topic_name = cls.process_mapping(topic_def.get("name"), credential)
-            topic_source_id = cls.process_mapping(
-                topic_def.get("source_id"), credential
-            )
-            topic_type = cls.process_mapping(topic_def.get("type"), credential)
+            topic_name = map_value(topic_def["name"])
+            topic_source_id = map_value(topic_def["source_id"])
+            topic_type = map_value(topic_def["type"])
 
             # Get parent topic if possible
             if related_topic_name:
@@ -523,7 +872,7 @@ class CredentialManager(object):
         """
         Extract the credential cardinality values and hash
         """
-        fields = processor_config.get("cardinality_fields") or []
+        fields = ProcessorPlan.compile(processor_config).cardinality_fields
         values = {}
         if fields:
             claims = cls.get_claims(credential)
@@ -548,6 +897,10 @@ class CredentialManager(object):
     @classmethod
     def process_config_date(cls, config, credential, field_name):
         date_value = cls.process_mapping(config.get(field_name), credential)
+        return cls.parse_config_date(date_value, field_name)
+
+    @classmethod
+    def parse_config_date(cls, date_value, field_name):
         date_result = None
         if date_value:
             try:
@@ -584,16 +937,24 @@ class CredentialManager(object):
         """
         Generate a dictionary of additional credential properties from the processor config
         """
-        config = processor_config.get("credential")
+        config = ProcessorPlan.compile(processor_config).credential
         args = {}
         if config:
-            effective_date = cls.process_config_date(
-                config, credential, "effective_date"
+            claims = cls.get_claims(credential)
+
+            def map_value(field_name):
+                mapping = config[field_name]
+                return mapping(claims) if mapping else None
+
+            effective_date = cls.parse_config_date(
+                map_value("effective_date"), "effective_date"
             )
             if effective_date:
                 args["effective_date"] = effective_date
 
-            revoked_date = cls.process_config_date(config, credential, "revoked_date")
+            revoked_date = cls.parse_config_date(
+                map_value("revoked_date"), "revoked_date"
+            )
             if revoked_date:
                 if revoked_date > datetime.utcnow().replace(tzinfo=timezone.utc):
                     raise CredentialException(
@@ -604,7 +965,7 @@ class CredentialManager(object):
                 args["revoked_date"] = revoked_date
                 args["revoked"] = True
 
-            inactive = cls.process_mapping(config.get("inactive"), credential)
+            inactive = map_value("inactive")
             if inactive:
                 args["inactive"] = bool(inactive)
         return args
@@ -622,14 +983,13 @@ class CredentialManager(object):
 
         Returns: a list of the unsaved model instances
         """
-        mapping = processor_config.get("mapping") or []
+        plan = ProcessorPlan.compile(processor_config)
         if search_model_map is None:
             search_model_map = SUPPORTED_MODELS_MAPPING
+        claims = cls.get_claims(credential)
         result = []
 
-        for model_mapper in mapping:
-            model_name = model_mapper["model"]
-
+        for model_name, fields in plan.models:
             try:
                 Model = search_model_map[model_name]
                 model = Model()
@@ -638,8 +998,8 @@ class CredentialManager(object):
                     "Unsupported model type '{}'".format(model_name)
                 )
 
-            for field, field_mapper in model_mapper["fields"].items():
-                setattr(model, field, cls.process_mapping(field_mapper, credential))
+            for field, mapping in fields:
+                setattr(model, field, mapping(claims) if mapping else None)
             if model_name == "category":
                 model.format = "category"
 
@@ -659,17 +1019,24 @@ class CredentialManager(object):
 
     @classmethod
     def remove_search_models(
-        cls, credential: CredentialModel, search_model_map=None, raw_delete=True
+        cls,
+        credential: (CredentialModel, Sequence[CredentialModel]),
+        search_model_map=None,
+        raw_delete=True,
     ):
         """
-        Delete any existing search model instances
+        Delete any existing search model instances for one or more credentials
         """
         if search_model_map is None:
             search_model_map = SUPPORTED_MODELS_MAPPING
+        if isinstance(credential, CredentialModel):
+            query = {"credential": credential}
+        else:
+            query = {"credential__in": [cred.id for cred in credential]}
         for model_key, model_cls in search_model_map.items():
             if model_key == "category":
                 continue
-            rows = model_cls.objects.filter(credential=credential)
+            rows = model_cls.objects.filter(**query)
             if raw_delete:
                 # Don't trigger search reindex (yet)
                 rows._raw_delete(using=DEFAULT_DB_ALIAS)
@@ -682,7 +1049,15 @@ class CredentialManager(object):
         credential_type: CredentialType,
         credential: CredentialModel,
         cardinality=None,
+        rows: "CredentialRows" = None,
     ) -> CredentialSet:
+        """
+        Assign a new credential to its credential set, superseding any earlier
+        credentials in the set
+
+        Superseded credentials are updated in bulk. If `rows` is provided, they
+        are reindexed when the rows are saved, otherwise immediately.
+        """
         if credential.credential_set:
             return credential.credential_set
         existing_set_query = {
@@ -692,49 +1067,6 @@ class CredentialManager(object):
         }
         try:
             cred_set = CredentialSet.objects.get(**existing_set_query)
-            latest_cred = credential
-
-            for prev_cred in cred_set.credentials.filter(revoked=False).order_by(
-                "effective_date"
-            ):
-                if prev_cred.effective_date <= credential.effective_date:
-                    prev_cred.latest = False
-                    prev_cred.revoked = True
-                    prev_cred.revoked_by = credential
-                    prev_cred.revoked_date = credential.effective_date
-                    prev_cred.save()
-                else:
-                    latest_cred = prev_cred
-                    if not credential.revoked:
-                        credential.revoked = True
-                        credential.revoked_by = prev_cred
-                        credential.revoked_date = prev_cred.effective_date
-
-            cred_set.latest_credential = latest_cred
-            cred_set.first_effective_date = (
-                credential.effective_date
-                if cred_set.first_effective_date is None
-                else min(cred_set.first_effective_date, credential.effective_date)
-            )
-
-            if latest_cred.revoked:
-                cred_set.last_effective_date = (
-                    latest_cred.revoked_date
-                    if cred_set.last_effective_date is None
-                    else max(cred_set.last_effective_date, latest_cred.revoked_date)
-                )
-            else:
-                cred_set.last_effective_date = None
-
-            cred_set.save()
-            credential.credential_set = cred_set
-            credential.latest = latest_cred == credential
-            credential.save()
-
-            if latest_cred != credential and not latest_cred.latest:
-                latest_cred.latest = True
-                latest_cred.save()
-
         except CredentialSet.DoesNotExist:
             updates = existing_set_query.copy()
             updates["first_effective_date"] = credential.effective_date
@@ -746,15 +1078,251 @@ class CredentialManager(object):
             credential.credential_set = cred_set
             credential.latest = True
             credential.save()
+            return cred_set
+
+        # Normally only the current latest credential in the set is not revoked
+        active_creds = cred_set.credentials.filter(revoked=False).order_by(
+            "effective_date"
+        )
+        superseded_ids = []
+        later_creds = []
+        for (cred_id, effective_date, latest) in active_creds.values_list(
+            "id", "effective_date", "latest"
+        ):
+            if effective_date <= credential.effective_date:
+                superseded_ids.append(cred_id)
+            else:
+                later_creds.append((cred_id, effective_date, latest))
+
+        reindex_ids = superseded_ids
+        now = timezone.now()
+        if superseded_ids:
+            CredentialModel.objects.filter(id__in=superseded_ids).update(
+                latest=False,
+                revoked=True,
+                revoked_by=credential,
+                revoked_date=credential.effective_date,
+                update_timestamp=now,
+            )
+
+        if later_creds:
+            # A later credential was already received, which supersedes this one
+            if not credential.revoked:
+                credential.revoked = True
+                credential.revoked_by_id = later_creds[0][0]
+                credential.revoked_date = later_creds[0][1]
+            (latest_id, _effective_date, latest) = later_creds[-1]
+            if not latest:
+                CredentialModel.objects.filter(id=latest_id).update(
+                    latest=True, update_timestamp=now
+                )
+                reindex_ids = reindex_ids + [latest_id]
+            cred_set.latest_credential_id = latest_id
+            cred_set.last_effective_date = None
+        else:
+            cred_set.latest_credential = credential
+            if credential.revoked:
+                cred_set.last_effective_date = (
+                    credential.revoked_date
+                    if cred_set.last_effective_date is None
+                    else max(cred_set.last_effective_date, credential.revoked_date)
+                )
+            else:
+                cred_set.last_effective_date = None
+
+        cred_set.first_effective_date = (
+            credential.effective_date
+            if cred_set.first_effective_date is None
+            else min(cred_set.first_effective_date, credential.effective_date)
+        )
+        cred_set.save()
+
+        credential.credential_set = cred_set
+        credential.latest = not later_creds
+        credential.save()
+
+        if rows is not None:
+            rows.reindex_credential_ids.extend(reindex_ids)
+        else:
+            cls.reindex_credentials(reindex_ids)
         return cred_set
 
+    @classmethod
+    def reindex_credentials(cls, credential_ids: Sequence[int]):
+        """
+        Send post_save for credentials modified by bulk updates, so that
+        the search index is updated
+
+        Only the status of the credentials is changed, so the search index
+        applies an atomic update of the status fields.
+        """
+        if not credential_ids:
+            return
+        for db_credential in CredentialModel.objects.filter(id__in=set(credential_ids)):
+            signals.post_save.send(
+                sender=CredentialModel,
+                instance=db_credential,
+                created=False,
+                raw=False,
+                using=DEFAULT_DB_ALIAS,
+                update_fields=STATUS_UPDATE_FIELDS,
+            )
+
+    @classmethod
+    def build_hookable_credential(
+        cls,
+        credential_type: CredentialType,
+        credential: Credential,
+        topic: Topic,
+        topic_created: bool,
+        cred_claims: dict,
+        new_hook_corp_nums: set = None,
+    ) -> HookableCredential:
+        """
+        Create an (unsaved) hookable credential for a newly stored credential
+
+        When `new_hook_corp_nums` is provided it holds the topics known to have a
+        "New" hook already, otherwise the database is queried.
+        """
+        if new_hook_corp_nums is None:
+            new_hook_exists = HookableCredential.objects.filter(
+                corp_num=topic.source_id, topic_status="New",
+            ).exists()
+        else:
+            new_hook_exists = topic.source_id in new_hook_corp_nums
+
+        if topic_created or not new_hook_exists:
+            topic_status = "New"
+            if new_hook_corp_nums is not None:
+                new_hook_corp_nums.add(topic.source_id)
+        else:
+            topic_status = "Stream"
+        hookable_cred_data = {
+            "cred_def_id": credential.cred_def_id,
+            "schema_name": credential.schema_name,
+            "attributes": cred_claims,
+        }
+        return HookableCredential(
+            topic_status=topic_status,
+            corp_num=topic.source_id,
+            credential_type=credential_type.schema.name,
+            credential_json=hookable_cred_data,
+        )
+
+    @classmethod
+    def store_credential(
+        cls,
+        credential_type: CredentialType,
+        credential: Credential,
+        topic: Topic,
+        related_topic: Topic,
+        topic_created: bool,
+        rows: "CredentialRows",
+        new_hook_corp_nums: set = None,
+        stored_ids: set = None,
+    ) -> CredentialModel:
+        """
+        Create the credential model and its credential set assignment
+
+        Must be called within a transaction holding locks on the related topics.
+        Claims, search models and the hookable credential are added to `rows`
+        to be saved with bulk inserts. `stored_ids` may hold the stored ids
+        of a batch of credentials, see `check_duplicate`.
+        """
+        processor_config = get_processor_plan(credential_type)
+
+        cardinality = cls.credential_cardinality(credential, processor_config)
+
+        # We always create a new credential model to represent the current credential
+        # The issuer may specify an effective date from a claim. Otherwise, defaults to now.
+
+        # use thread_id as credential_id (should be unique and will be known to the issuer)
+        credential_id = credential.thread_id
+        cls.check_duplicate(credential, stored_ids)
+        cred_claims = {
+            claim_attribute: getattr(credential, claim_attribute)
+            for claim_attribute in credential.claim_attributes
+        }
+        credential_args = {
+            "cardinality_hash": cardinality["hash"] if cardinality else None,
+            "claims_hash": claims_fingerprint(cred_claims),
+            "claim_values": cred_claims,
+            "credential_def_id": credential.cred_def_id,
+            "credential_type": credential_type,
+            "credential_id": credential_id,
+        }
+        credential_args.update(
+            cls.process_credential_properties(credential, processor_config)
+        )
+
+        db_credential = topic.credentials.create(**credential_args)
+
+        # Create and associate claims for this credential
+        for claim_attribute, claim_value in cred_claims.items():
+            rows.claims.append(
+                Claim(credential=db_credential, name=claim_attribute, value=claim_value)
+            )
+
+        # Create topic relationship if needed
+        if related_topic is not None:
+            try:
+                TopicRelationship.objects.create(
+                    credential=db_credential, topic=topic, related_topic=related_topic,
+                )
+            except IntegrityError:
+                raise CredentialException(
+                    "Relationship between topics '{}' and '{}' already exist.".format(
+                        topic.id, related_topic.id
+                    )
+                )
+
+        # Assign to credential set
+        cls.update_credential_set(credential_type, db_credential, cardinality, rows)
+
+        # Search models are saved in bulk by the caller
+        rows.search_models.extend(
+            cls.create_search_models(db_credential, processor_config, save=False)
+        )
+
+        # add to the set of "hookable credentials"
+        # TODO make this a configurable step of the process
+        rows.hookable_creds.append(
+            cls.build_hookable_credential(
+                credential_type,
+                credential,
+                topic,
+                topic_created,
+                cred_claims,
+                new_hook_corp_nums,
+            )
+        )
+
+        return db_credential
+
+    @classmethod
+    def lock_topics(cls, topics):
+        """
+        Acquire row locks on the given topics to block competing credentials
+
+        Locks are taken in primary key order and released when the transaction ends.
+        """
+        topic_ids = sorted({topic.id for topic in topics if topic is not None})
+        list(
+            Topic.objects.select_for_update()
+            .filter(pk__in=topic_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
     @classmethod
     def populate_application_database(
         cls, credential_type: CredentialType, credential: Credential
     ) -> CredentialModel:
         LOGGER.warn(">>> store cred in local database")
         start_time = time.perf_counter()
-        processor_config = credential_type.processor_config
+        # Reject a duplicate before any topics are created or locked
+        cls.check_duplicate(credential)
+        processor_config = get_processor_plan(credential_type)
 
         (
             topic,
@@ -771,96 +1339,266 @@ class CredentialManager(object):
                 "OR topic type and topic source_id"
             )
 
-        with transaction.atomic():
-            # Acquire a lock on the topic to block competing credentials
-            # This lock is released when the transaction ends
-            topic_ids = []
-            topic_ids.append(topic.id)
-            if related_topic is not None:
-                topic_ids.append(related_topic.id)
-            topic_ids.sort()
-            for topic_id in topic_ids:
-                Topic.objects.select_for_update().get(pk=topic_id)
-
-            cardinality = cls.credential_cardinality(credential, processor_config)
-
-            # We always create a new credential model to represent the current credential
-            # The issuer may specify an effective date from a claim. Otherwise, defaults to now.
-
-            # use thread_id as credential_id (should be unique and will be known to the issuer)
-            credential_id = credential.thread_id
-            credential_args = {
-                "cardinality_hash": cardinality["hash"] if cardinality else None,
-                "credential_def_id": credential.cred_def_id,
-                "credential_type": credential_type,
-                "credential_id": credential_id,
-            }
-            credential_args.update(
-                cls.process_credential_properties(credential, processor_config)
-            )
+        def store():
+            with transaction.atomic():
+                # Acquire a lock on the topic to block competing credentials
+                # This lock is released when the transaction ends
+                cls.lock_topics((topic, related_topic))
+
+                rows = CredentialRows()
+                db_credential = cls.store_credential(
+                    credential_type,
+                    credential,
+                    topic,
+                    related_topic,
+                    topic_created,
+                    rows,
+                )
+                rows.save()
 
-            db_credential = topic.credentials.create(**credential_args)
+                # Update last issue date for credential type
+                last_issue_dates.record_on_commit((credential_type.id,))
+            return db_credential
 
-            # Create and associate claims for this credential
-            cred_claims = {}
-            for claim_attribute in credential.claim_attributes:
-                claim_value = getattr(credential, claim_attribute)
-                cred_claims[claim_attribute] = claim_value
-                Claim.objects.create(
-                    credential=db_credential, name=claim_attribute, value=claim_value
-                )
+        db_credential = retry_on_deadlock(store)
 
-            # Create topic relationship if needed
-            if related_topic is not None:
-                try:
-                    TopicRelationship.objects.create(
-                        credential=db_credential,
-                        topic=topic,
-                        related_topic=related_topic,
-                    )
-                except IntegrityError:
+        LOGGER.warn(
+            "<<< store cred in local database: " + str(time.perf_counter() - start_time)
+        )
+
+        return db_credential
+
+    def process_batch(
+        self, credentials: Sequence[Credential], check_from_did: str = None
+    ) -> Sequence["CredentialBatchResult"]:
+        """
+        Processes a batch of incoming credentials
+
+        All credentials are stored in a single transaction, and the dependent
+        rows (claims, search models, hookable credentials) are written using bulk
+        inserts. A credential which fails to process does not affect the others.
+
+        Returns:
+            list -- a CredentialBatchResult for each credential, in order
+        """
+        LOGGER.debug(">>> store cred batch in local database: %d", len(credentials))
+        start_time = time.perf_counter()
+        results = [CredentialBatchResult(credential) for credential in credentials]
+
+        # Resolve credential types and topics ahead of the transaction,
+        # rejecting duplicates before any topics are created or locked
+        known_ids = credential_guard.stored_ids(
+            result.credential.thread_id for result in results
+        )
+        pending = []
+        for result in results:
+            credential = result.credential
+            try:
+                if check_from_did and check_from_did != credential.origin_did:
                     raise CredentialException(
-                        "Relationship between topics '{}' and '{}' already exist.".format(
-                            topic.id, related_topic.id
+                        "Credential origin DID '{}' does not match request origin DID '{}'".format(
+                            credential.origin_did, check_from_did
                         )
                     )
+                self.check_duplicate(credential, known_ids)
+                credential_type = self.get_credential_type(credential)
+                (
+                    topic,
+                    related_topic,
+                    topic_created,
+                    _related_topic_created,
+                ) = self.resolve_credential_topics(
+                    credential, get_processor_plan(credential_type)
+                )
+                if not topic:
+                    raise CredentialException(
+                        "Issuer registration 'topic' must specify at least one valid "
+                        "topic name OR topic type and topic source_id"
+                    )
+            except DuplicateCredentialException:
+                result.duplicate = True
+                continue
+            except Exception as e:
+                LOGGER.error("Error resolving credential in batch: %s", e)
+                result.error = str(e)
+                continue
+            pending.append(
+                (result, credential_type, topic, related_topic, topic_created)
+            )
 
-            # Assign to credential set
-            cls.update_credential_set(credential_type, db_credential, cardinality)
+        if not pending:
+            return results
 
-            # Save search models
-            cls.create_search_models(db_credential, processor_config)
+        try:
+            retry_on_deadlock(self.store_batch, pending)
+        except Exception:
+            LOGGER.exception(
+                "Error saving credential batch, falling back to individual processing"
+            )
+            for (result, credential_type, _t, _rt, _tc) in pending:
+                result.db_credential = None
+                result.error = None
+                result.duplicate = False
+                try:
+                    result.db_credential = self.populate_application_database(
+                        credential_type, result.credential
+                    )
+                except DuplicateCredentialException:
+                    result.duplicate = True
+                except Exception as e:
+                    LOGGER.error("Error storing credential: %s", e)
+                    result.error = str(e)
 
-            # Update last issue date for credential type
-            credential_type.last_issue_date = datetime.now(timezone.utc)
-            credential_type.save()
+        LOGGER.debug(
+            "<<< store cred batch in local database: %s",
+            time.perf_counter() - start_time,
+        )
+        return results
 
-            # add to the set of "hookable credentials"
-            # TODO make this a configurable step of the process
-            new_hook_exists = HookableCredential.objects.filter(
-                corp_num=topic.source_id,
-                topic_status="New",
-            ).count()
+    def store_batch(self, pending):
+        """
+        Store a batch of resolved credentials in a single transaction
+        """
+        for (result, _ct, _t, _rt, _tc) in pending:
+            result.db_credential = None
+            result.error = None
+            result.duplicate = False
 
-            if topic_created or new_hook_exists == 0:
-                topic_status = "New"
-            else:
-                topic_status = "Stream"
-            hookable_cred_data = {
-                "cred_def_id": credential.cred_def_id,
-                "schema_name": credential.schema_name,
-                "attributes": cred_claims,
-            }
-            hookable_cred = HookableCredential(
-                topic_status=topic_status,
-                corp_num=topic.source_id,
-                credential_type=credential_type.schema.name,
-                credential_json=hookable_cred_data,
+        with transaction.atomic():
+            topics = []
+            for (_r, _ct, topic, related_topic, _tc) in pending:
+                topics.extend((topic, related_topic))
+            self.lock_topics(topics)
+
+            corp_nums = {topic.source_id for (_r, _ct, topic, _rt, _tc) in pending}
+            new_hook_corp_nums = set(
+                HookableCredential.objects.filter(
+                    corp_num__in=corp_nums, topic_status="New"
+                ).values_list("corp_num", flat=True)
+            )
+            stored_ids = credential_guard.stored_ids(
+                result.credential.thread_id for (result, _ct, _t, _rt, _tc) in pending
             )
-            hookable_cred.save()
 
-        LOGGER.warn(
-            "<<< store cred in local database: " + str(time.perf_counter() - start_time)
-        )
+            batch_rows = CredentialRows()
+            issued_types = set()
+            for (
+                result,
+                credential_type,
+                topic,
+                related_topic,
+                topic_created,
+            ) in pending:
+                rows = CredentialRows()
+                try:
+                    # Savepoint, so one failure does not abort the batch
+                    with transaction.atomic():
+                        result.db_credential = self.store_credential(
+                            credential_type,
+                            result.credential,
+                            topic,
+                            related_topic,
+                            topic_created,
+                            rows,
+                            new_hook_corp_nums,
+                            stored_ids,
+                        )
+                except DuplicateCredentialException:
+                    result.duplicate = True
+                    continue
+                except Exception as e:
+                    if is_deadlock_error(e):
+                        raise
+                    LOGGER.error("Error storing credential in batch: %s", e)
+                    result.error = str(e)
+                    continue
+                batch_rows.extend(rows)
+                issued_types.add(credential_type.id)
+                # a webhook repeated within the batch is a duplicate too
+                stored_ids.add(result.credential.thread_id)
 
-        return db_credential
+            batch_rows.save()
+
+            # Update last issue date for credential types
+            last_issue_dates.record_on_commit(issued_types)
+
+
+class CredentialRows:
+    """
+    Accumulates the rows which depend on stored credentials, to be
+    saved using bulk inserts.
+    """
+
+    def __init__(self):
+        self.claims = []
+        self.search_models = []
+        self.hookable_creds = []
+        self.reindex_credential_ids = []
+
+    def extend(self, other: "CredentialRows"):
+        self.claims.extend(other.claims)
+        self.search_models.extend(other.search_models)
+        self.hookable_creds.extend(other.hookable_creds)
+        self.reindex_credential_ids.extend(other.reindex_credential_ids)
+
+    def save(self):
+        """
+        Save the accumulated rows
+        """
+        if self.claims:
+            Claim.objects.bulk_create(self.claims)
+
+        by_model = OrderedDict()
+        for model in self.search_models:
+            by_model.setdefault(model.__class__, []).append(model)
+        for model_cls, models in by_model.items():
+            model_cls.objects.bulk_create(models)
+
+        if self.hookable_creds:
+            HookableCredential.objects.bulk_create(self.hookable_creds)
+            # bulk_create does not send post_save, which fires the web hooks
+            for hookable_cred in self.hookable_creds:
+                signals.post_save.send(
+                    sender=HookableCredential,
+                    instance=hookable_cred,
+                    created=True,
+                    raw=False,
+                    using=DEFAULT_DB_ALIAS,
+                    update_fields=None,
+                )
+
+        # Credentials superseded within their credential sets
+        CredentialManager.reindex_credentials(self.reindex_credential_ids)
+
+
+class CredentialBatchResult:
+    """Model to represent the result of processing one credential in a batch."""
+
+    def __init__(
+        self,
+        credential: Credential,
+        db_credential: CredentialModel = None,
+        error: str = None,
+    ):
+        """Initialize the credential batch result instance."""
+        self.credential = credential
+        self.db_credential = db_credential
+        self.error = error
+        # set when the credential had already been stored
+        self.duplicate = False
+
+    @property
+    def success(self) -> bool:
+        return (self.db_credential is not None or self.duplicate) and not self.error
+
+    def serialize(self) -> dict:
+        """Serialize to JSON-compatible dict format."""
+        if self.duplicate:
+            return {
+                "success": True,
+                "duplicate": True,
+                "credential_id": self.credential.thread_id,
+            }
+        if self.success:
+            return {"success": True, "credential_id": self.db_credential.credential_id}
+        return {"success": False, "error": self.error}
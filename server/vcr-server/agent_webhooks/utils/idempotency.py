@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+from typing import Iterable
+
+from api.v2.models.Credential import Credential as CredentialModel
+from api.v2.utils import log_timing_method
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CredentialGuard:
+    """
+    Idempotency guard for incoming credentials, keyed on the credential
+    exchange thread_id (stored as `Credential.credential_id`).
+
+    Credentials are checked against the credential_id index while the topic
+    locks are held, so a retried webhook cannot race the original one, and a
+    batch of credentials is checked with a single query.
+    """
+
+    METRIC = "credential_ingest.duplicates_suppressed"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    @staticmethod
+    def exists(credential_id: str) -> bool:
+        """
+        Check whether a credential has been stored, using the credential_id index
+        """
+        return CredentialModel.objects.filter(credential_id=credential_id).exists()
+
+    @staticmethod
+    def stored_ids(credential_ids: Iterable[str]) -> set:
+        """
+        Find which of the credential ids have been stored, in one indexed query
+        """
+        credential_ids = {
+            credential_id for credential_id in credential_ids if credential_id
+        }
+        if not credential_ids:
+            return set()
+        return set(
+            CredentialModel.objects.filter(
+                credential_id__in=credential_ids
+            ).values_list("credential_id", flat=True)
+        )
+
+    def record_suppressed(self, credential_id: str):
+        """
+        Count a duplicate credential which has been rejected
+        """
+        LOGGER.info("Suppressed duplicate credential: %s", credential_id)
+        with self._lock:
+            self.suppressed += 1
+        now = time.perf_counter()
+        log_timing_method(self.METRIC, now, now, True)
+
+
+credential_guard = CredentialGuard()
@@ -0,0 +1,408 @@
+import logging
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django.db
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from api.v2.utils import log_timing_method
+from agent_webhooks.models import IngestQueueItem
+from agent_webhooks.utils.credential import Credential, CredentialManager
+from vcr_server.utils.agent_admin import agent_admin_client
+
+LOGGER = logging.getLogger(__name__)
+
+# advisory lock namespace for ingest lanes
+INGEST_LANE_LOCK = 0x494E47
+
+
+def credential_from_message(message) -> Credential:
+    """
+    Build a credential from a "credential_received" webhook message
+    """
+    raw_credential = message["raw_credential"]
+
+    credential_data = {
+        "thread_id": message["thread_id"],
+        "schema_id": raw_credential["schema_id"],
+        "cred_def_id": raw_credential["cred_def_id"],
+        "rev_reg_id": raw_credential["rev_reg_id"],
+        "attrs": {},
+    }
+
+    for attr in raw_credential["values"]:
+        credential_data["attrs"][attr] = raw_credential["values"][attr]["raw"]
+
+    return Credential(credential_data)
+
+
+def ingest_partition(message) -> int:
+    """
+    Hash a credential message by its topic source_id, so that all
+    credentials for a topic are assigned to the same ingest lane
+    """
+    key = None
+    try:
+        credential = credential_from_message(message)
+        key = CredentialManager().partition_key(credential)
+    except Exception as e:
+        LOGGER.debug("Could not determine topic for ingest partition: %s", e)
+    if not key:
+        key = message.get("credential_exchange_id") or ""
+    return zlib.crc32(key.encode("utf-8")) & 0x7FFFFFFF
+
+
+@contextmanager
+def lane_lock(lane: int):
+    """
+    Hold an advisory lock on an ingest lane, so that a lane is processed by
+    one worker at a time across all server processes
+
+    Yields:
+        bool -- True if the lock was acquired
+    """
+    connection = django.db.connection
+    if connection.vendor != "postgresql":
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", [INGEST_LANE_LOCK, lane])
+        locked = cursor.fetchone()[0]
+    try:
+        yield locked
+    finally:
+        if locked:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(%s, %s)", [INGEST_LANE_LOCK, lane]
+                )
+
+
+def store_credential(credential_exchange_id, credential_id):
+    """
+    Instruct the agent to store the credential in its wallet
+    """
+    resp = agent_admin_client().post(
+        "/credential_exchange/{}/store",
+        credential_exchange_id,
+        json={"credential_id": credential_id},
+    )
+    resp.raise_for_status()
+
+
+def send_problem_report(credential_exchange_id, explain):
+    """
+    Send a problem report to the agent for a failed credential exchange
+    """
+    resp = agent_admin_client().post(
+        "/credential_exchange/{}/problem_report",
+        credential_exchange_id,
+        json={"explain_ltxt": explain},
+    )
+    resp.raise_for_status()
+
+
+def handle_credential_batch(messages):
+    """
+    Processes a batch of "credential_received" messages using
+    `CredentialManager.process_batch`, then notifies the agent for each
+    credential exchange.
+    """
+    results = [None] * len(messages)
+    credentials = []
+    positions = []
+    for idx, message in enumerate(messages):
+        credential_exchange_id = None
+        try:
+            if not isinstance(message, dict):
+                raise Exception("Expected a credential message: {}".format(message))
+            credential_exchange_id = message.get("credential_exchange_id")
+            if message.get("state") != "credential_received":
+                raise Exception(
+                    "Unexpected credential state: {}".format(message.get("state"))
+                )
+            credentials.append(credential_from_message(message))
+            positions.append(idx)
+        except Exception as e:
+            LOGGER.error(str(e))
+            results[idx] = {
+                "credential_exchange_id": credential_exchange_id,
+                "success": False,
+                "error": str(e),
+            }
+
+    credential_manager = CredentialManager()
+    batch_results = credential_manager.process_batch(credentials)
+
+    for idx, batch_result in zip(positions, batch_results):
+        credential_exchange_id = messages[idx]["credential_exchange_id"]
+        result = batch_result.serialize()
+        try:
+            if batch_result.duplicate:
+                # the agent was notified when the credential was first stored
+                pass
+            elif batch_result.success:
+                store_credential(
+                    credential_exchange_id, batch_result.db_credential.credential_id
+                )
+            else:
+                send_problem_report(credential_exchange_id, batch_result.error)
+        except Exception as e:
+            LOGGER.error(str(e))
+            result = {"success": False, "error": str(e)}
+        result["credential_exchange_id"] = credential_exchange_id
+        results[idx] = result
+
+    return results
+
+
+class IngestQueue:
+    """
+    Durable queue of credential webhooks, processed after the webhook has
+    been acknowledged by a pool of ingest worker threads.
+
+    Messages are stored in the `ingest_queue` table and hashed by topic
+    source_id into one lane per worker. Each worker claims a batch of pending
+    messages from its lane, stores the credentials using
+    `CredentialManager.process_batch` and then notifies the agent. Credentials
+    for the same topic are therefore stored in order, while different topics
+    are processed concurrently without contending for topic row locks.
+    """
+
+    _active = None
+
+    def __init__(self, workers: int = None, batch_size: int = None):
+        LOGGER.info("Initializing ingest queue ...")
+        self._workers = workers or settings.CREDENTIAL_INGEST_WORKERS
+        self._batch_size = batch_size or settings.CREDENTIAL_INGEST_BATCH_SIZE
+        self._poll_interval = settings.CREDENTIAL_INGEST_POLL_INTERVAL
+        self._retry_delay = timedelta(seconds=settings.CREDENTIAL_INGEST_RETRY_DELAY)
+        self._max_attempts = settings.CREDENTIAL_INGEST_MAX_ATTEMPTS
+        self._stop = threading.Event()
+        self._trigger = threading.Event()
+        self._threads = []
+
+    @classmethod
+    def enqueue(cls, topic, message) -> IngestQueueItem:
+        """
+        Store a webhook message for processing by the ingest workers
+        """
+        item = IngestQueueItem.objects.create(
+            topic=topic,
+            state=message.get("state"),
+            credential_exchange_id=message.get("credential_exchange_id"),
+            partition=ingest_partition(message),
+            message=message,
+        )
+        active = cls._active
+        if active:
+            transaction.on_commit(active.trigger)
+        return item
+
+    def setup(self, app=None):
+        LOGGER.info("Setting up ingest queue ...")
+        if app is not None:
+            app["ingestqueue"] = self
+            app.on_startup.append(self.app_start)
+            app.on_cleanup.append(self.app_stop)
+        IngestQueue._active = self
+
+    async def app_start(self, _app=None):
+        self.start()
+
+    async def app_stop(self, _app=None):
+        self.stop()
+
+    def start(self):
+        LOGGER.info("Starting %d ingest worker(s) ...", self._workers)
+        self._stop.clear()
+        for lane in range(self._workers):
+            thread = threading.Thread(target=self._run, args=(lane,))
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, join=True):
+        LOGGER.info("Stopping ingest workers ...")
+        self._stop.set()
+        self._trigger.set()
+        if join:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+        if IngestQueue._active is self:
+            IngestQueue._active = None
+
+    def trigger(self):
+        self._trigger.set()
+
+    def _run(self, lane: int):
+        try:
+            while not self._stop.is_set():
+                self._trigger.wait(self._poll_interval)
+                self._trigger.clear()
+                try:
+                    while not self._stop.is_set() and self.process_next(lane):
+                        pass
+                except Exception:
+                    LOGGER.exception("Error processing the ingest queue")
+        finally:
+            django.db.connection.close()
+
+    def process_next(self, lane: int = None) -> bool:
+        """
+        Process one batch of queued messages
+
+        Returns:
+            bool -- True if any messages were processed
+        """
+        items = None
+        if lane is None:
+            items = self.claim(self._batch_size)
+            if items:
+                self.ingest(items)
+        else:
+            with lane_lock(lane) as locked:
+                if locked:
+                    items = self.claim(self._batch_size, lane)
+                    if items:
+                        self.ingest(items)
+        retries = self.claim_stored(self._batch_size)
+        if retries:
+            self.notify(retries)
+        return bool(items or retries)
+
+    def claim(self, limit, lane: int = None) -> list:
+        """
+        Claim pending messages (or those abandoned by a failed worker)
+        """
+        now = timezone.now()
+        queryset = IngestQueueItem.objects.all()
+        if lane is not None:
+            queryset = queryset.annotate(lane=Mod("partition", self._workers)).filter(
+                lane=lane
+            )
+        with transaction.atomic():
+            items = list(
+                queryset.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=IngestQueueItem.STATUS_PENDING)
+                    | Q(
+                        status=IngestQueueItem.STATUS_PROCESSING,
+                        update_timestamp__lt=now - self._retry_delay,
+                    )
+                )
+                .order_by("id")[:limit]
+            )
+            if items:
+                IngestQueueItem.objects.filter(
+                    id__in=[item.id for item in items]
+                ).update(
+                    status=IngestQueueItem.STATUS_PROCESSING,
+                    attempts=F("attempts") + 1,
+                    update_timestamp=now,
+                )
+        return items
+
+    def claim_stored(self, limit) -> list:
+        """
+        Claim stored credentials for which notifying the agent has failed
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            items = list(
+                IngestQueueItem.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=IngestQueueItem.STATUS_STORED,
+                    update_timestamp__lt=now - self._retry_delay,
+                )
+                .order_by("id")[:limit]
+            )
+            if items:
+                IngestQueueItem.objects.filter(
+                    id__in=[item.id for item in items]
+                ).update(update_timestamp=now)
+        return items
+
+    def ingest(self, items):
+        """
+        Store the credentials for a batch of claimed messages
+        """
+        start_time = time.perf_counter()
+        credentials = []
+        pending = []
+        for item in items:
+            if item.attempts >= self._max_attempts:
+                self.fail(item, "Exceeded maximum ingest attempts")
+                continue
+            try:
+                credentials.append(credential_from_message(item.message))
+                pending.append(item)
+            except Exception as e:
+                self.fail(item, str(e))
+
+        credential_manager = CredentialManager()
+        results = credential_manager.process_batch(credentials)
+
+        stored = []
+        for item, result in zip(pending, results):
+            if result.duplicate:
+                item.delete()
+            elif result.success:
+                item.status = IngestQueueItem.STATUS_STORED
+                item.credential_id = result.db_credential.credential_id
+                item.save(update_fields=("status", "credential_id", "update_timestamp"))
+                stored.append(item)
+            else:
+                self.fail(item, result.error)
+
+        log_timing_method(
+            "ingest_queue.credentials",
+            start_time,
+            time.perf_counter(),
+            True,
+            data={"batch_size": len(items), "stored": len(stored)},
+        )
+
+        self.notify(stored)
+
+    def notify(self, items):
+        """
+        Instruct the agent to store the credentials, then drop them from the queue
+        """
+        for item in items:
+            try:
+                store_credential(item.credential_exchange_id, item.credential_id)
+            except Exception as e:
+                LOGGER.error(
+                    "Error notifying agent of stored credential %s: %s",
+                    item.credential_id,
+                    e,
+                )
+                item.error = str(e)
+                item.save(update_fields=("error", "update_timestamp"))
+                continue
+            item.delete()
+
+    def fail(self, item, error):
+        """
+        Mark a message as failed and report the problem to the agent
+        """
+        LOGGER.error(
+            "Error ingesting credential exchange %s: %s",
+            item.credential_exchange_id,
+            error,
+        )
+        item.status = IngestQueueItem.STATUS_FAILED
+        item.error = error
+        item.save(update_fields=("status", "error", "update_timestamp"))
+        try:
+            send_problem_report(item.credential_exchange_id, error)
+        except Exception as e:
+            LOGGER.error("Error sending problem report: %s", e)
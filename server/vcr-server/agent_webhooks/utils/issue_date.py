@@ -0,0 +1,114 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Iterable
+
+import django.db
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from api.v2.models.CredentialType import CredentialType
+
+LOGGER = logging.getLogger(__name__)
+
+
+class IssueDateBuffer:
+    """
+    Write-behind buffer for `CredentialType.last_issue_date`.
+
+    Issue dates are recorded in memory when the credential transaction
+    commits, and flushed every `flush_interval` seconds with one UPDATE per
+    credential type, so ingest does not contend on the credential type rows.
+    A single background thread performs the flushes, reusing its database
+    connection, and dates which fail to be written are kept for the next one.
+    The update uses GREATEST so that a flush never moves the date backwards,
+    and does not send model signals.
+    """
+
+    def __init__(self, flush_interval: float = None):
+        if flush_interval is None:
+            flush_interval = settings.LAST_ISSUE_DATE_FLUSH_INTERVAL
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, credential_type_ids: Iterable[int], issue_date: datetime = None):
+        """
+        Record the issue date for credential types, to be written on the next flush
+        """
+        if issue_date is None:
+            issue_date = timezone.now()
+        with self._lock:
+            for type_id in credential_type_ids:
+                self._add(type_id, issue_date)
+            if self._pending and not self._thread:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _add(self, type_id: int, issue_date: datetime):
+        current = self._pending.get(type_id)
+        if current is None or current < issue_date:
+            self._pending[type_id] = issue_date
+
+    def record_on_commit(
+        self, credential_type_ids: Iterable[int], issue_date: datetime = None
+    ):
+        """
+        Record the issue date once the current transaction has committed
+        """
+        if issue_date is None:
+            issue_date = timezone.now()
+        type_ids = list(credential_type_ids)
+        transaction.on_commit(lambda: self.record(type_ids, issue_date))
+
+    def flush(self):
+        """
+        Write the pending issue dates to the database
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        for type_id, issue_date in pending.items():
+            try:
+                CredentialType.objects.filter(id=type_id).update(
+                    last_issue_date=Greatest(
+                        Coalesce("last_issue_date", Value(issue_date)),
+                        Value(issue_date),
+                    )
+                )
+            except Exception:
+                LOGGER.exception(
+                    "Error updating last issue date for credential type %s", type_id
+                )
+                with self._lock:
+                    self._add(type_id, issue_date)
+
+    def stop(self, join: bool = True):
+        """
+        Stop the flusher thread, after a final flush
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread and join:
+            thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.flush_interval):
+                self.flush()
+            self.flush()
+        finally:
+            django.db.connection.close()
+            with self._lock:
+                self._thread = None
+
+
+last_issue_dates = IssueDateBuffer()
+atexit.register(last_issue_dates.flush)
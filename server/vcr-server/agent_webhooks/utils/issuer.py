@@ -10,6 +10,10 @@ from api.v2.serializers.rest import (
     IssuerSerializer,
     SchemaSerializer,
 )
+from agent_webhooks.utils.credential import (
+    credential_type_cache,
+    invalidate_processor_plans,
+)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -61,6 +65,8 @@ class IssuerManager:
         schemas, credential_types = self.update_schemas_and_ctypes(
             issuer, issuer_registration.get("credential_types", [])
         )
+        # Cached credential types are stale in every worker process
+        credential_type_cache.invalidate()
         return IssuerRegistrationResult(issuer, schemas, credential_types)
 
     def update_user(self, issuer_def):
@@ -155,4 +161,7 @@ class IssuerManager:
             credential_type.save()
             credential_types.append(credential_type)
 
+        # Processor configs may have changed, drop the compiled versions
+        invalidate_processor_plans([ctype.id for ctype in credential_types])
+
         return schemas, credential_types
@@ -0,0 +1,35 @@
+from unittest.mock import Mock
+
+from django.test import TestCase
+
+from agent_webhooks.utils import cache
+
+
+class GenerationCache_TestCase(TestCase):
+    def test_get(self):
+        test_cache = cache.GenerationCache("test", check_interval=60)
+        loader = Mock(return_value="value")
+        assert test_cache.get("key", loader) == "value"
+        assert test_cache.get("key", loader) == "value"
+        assert loader.call_count == 1
+
+    def test_invalidate(self):
+        test_cache = cache.GenerationCache("test", check_interval=60)
+        loader = Mock(return_value="value")
+        test_cache.get("key", loader)
+        test_cache.invalidate()
+        assert cache.get_generation("test") == 1
+        test_cache.get("key", loader)
+        assert loader.call_count == 2
+
+    def test_other_process_invalidate(self):
+        test_cache = cache.GenerationCache("test", check_interval=0)
+        loader = Mock(return_value="value")
+        test_cache.get("key", loader)
+        test_cache.get("key", loader)
+        assert loader.call_count == 1
+
+        # bumped by another worker
+        cache.bump_generation("test")
+        test_cache.get("key", loader)
+        assert loader.call_count == 2
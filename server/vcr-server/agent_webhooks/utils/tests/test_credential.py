@@ -1,10 +1,21 @@
 from datetime import datetime, timezone
 import json
 
-from django.test import TestCase
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
 from unittest.mock import patch
 
 from agent_webhooks.utils import credential
+from api.v2.models.Claim import Claim
+from api.v2.models.Credential import Credential as CredentialModel
+from api.v2.models.CredentialSet import CredentialSet
+from api.v2.models.CredentialType import CredentialType
+from api.v2.tests.fixtures import (
+    create_credential_type,
+    create_credentials,
+    create_issuer,
+    create_topic,
+)
 
 
 class Credential_TestCase(TestCase):
@@ -165,3 +176,286 @@ class CredentialManager_TestCase(TestCase):
             "revoked_date": datetime(2001, 1, 1, 12, 0, 0, 0, timezone.utc),
             "revoked": True,
         }
+
+    def test_get_credential_type(self):
+        issuer = create_issuer("Vb2HSNWnk4y1vTPJcxfMt5")
+        cred_type = create_credential_type(issuer, "schema-name")
+        other_type = create_credential_type(issuer, "other-schema")
+        # a claim must not be mistaken for the credential type id
+        test_cred = credential.Credential(
+            {
+                "thread_id": "thread-12345-67890",
+                "schema_id": "Vb2HSNWnk4y1vTPJcxfMt5:2:schema-name:0.0.1",
+                "cred_def_id": "Vb2HSNWnk4y1vTPJcxfMt5:3:CL:25:tag",
+                "rev_reg_id": None,
+                "attrs": {"credential_type_id": str(other_type.id)},
+            },
+            None,
+        )
+        credential.credential_type_cache.clear()
+        mgr = credential.CredentialManager()
+        self.assertEqual(mgr.get_credential_type(test_cred), cred_type)
+
+        db_credential = create_topic().credentials.create(
+            credential_type=other_type, credential_id="1"
+        )
+        self.assertEqual(mgr.get_credential_type(db_credential), other_type)
+
+    @patch(
+        "agent_webhooks.utils.credential.CredentialManager.get_credential_type",
+        autospec=True,
+    )
+    def test_process_batch_unresolved(self, mock_get_credential_type):
+        mock_get_credential_type.side_effect = credential.CredentialException(
+            "Credential type not found"
+        )
+        test_cred = credential.Credential(
+            {
+                "thread_id": "thread-12345-67890",
+                "schema_id": "schema-origin-did:2:schema-name:schema-version",
+                "cred_def_id": "not:a:did:987654",
+                "rev_reg_id": "rev reg id",
+                "attrs": {"attr": "attr-value"},
+            },
+            None,
+        )
+
+        mgr = credential.CredentialManager()
+        results = mgr.process_batch([test_cred])
+        assert len(results) == 1
+        assert not results[0].success
+        assert results[0].serialize() == {
+            "success": False,
+            "error": "Credential type not found",
+        }
+
+
+class ProcessorPlan_TestCase(TestCase):
+    def test_compile(self):
+        pconfig = {
+            "cardinality_fields": ["topic_id"],
+            "topic": {
+                "source_id": {"input": "topic_id", "from": "claim"},
+                "type": {"input": "topic-type", "from": "value"},
+            },
+            "mapping": [
+                {
+                    "model": "name",
+                    "fields": {
+                        "text": {
+                            "input": "name",
+                            "from": "claim",
+                            "processor": ["string_helpers.uppercase"],
+                        },
+                        "type": {"input": "legal_name", "from": "value"},
+                    },
+                }
+            ],
+        }
+        test_cred = credential.Credential(
+            {
+                "thread_id": "thread-12345-67890",
+                "schema_id": "schema id",
+                "cred_def_id": "not:a:did:987654",
+                "rev_reg_id": "rev reg id",
+                "attrs": {"topic_id": "topic-source-id", "name": "a name"},
+            },
+            None,
+        )
+
+        plan = credential.ProcessorPlan(pconfig)
+        assert plan.cardinality_fields == ("topic_id",)
+        assert len(plan.topics) == 1
+        assert plan.topics[0]["name"] is None
+        assert plan.topics[0]["source_id"](test_cred) == "topic-source-id"
+        assert plan.credential is None
+
+        (model_name, fields) = plan.models[0]
+        assert model_name == "name"
+        assert [(field, mapping(test_cred)) for field, mapping in fields] == [
+            ("text", "A NAME"),
+            ("type", "legal_name"),
+        ]
+
+    def test_compile_errors(self):
+        with self.assertRaises(credential.CredentialException):
+            credential.compile_mapping({"input": "attr"})
+        with self.assertRaises(credential.CredentialException):
+            credential.compile_mapping({"input": "attr", "from": "other"})
+        with self.assertRaises(credential.CredentialException):
+            credential.compile_mapping(
+                {"input": "attr", "from": "claim", "processor": ["missing.function"]}
+            )
+
+    def test_plan_cache(self):
+        ctype = CredentialType(id=1001, processor_config={"cardinality_fields": ["a"]})
+        plan = credential.get_processor_plan(ctype)
+        assert credential.get_processor_plan(ctype) is plan
+
+        # recompiled when the config changes
+        ctype.processor_config = {"cardinality_fields": ["b"]}
+        plan = credential.get_processor_plan(ctype)
+        assert plan.cardinality_fields == ("b",)
+
+        credential.invalidate_processor_plans([ctype.id])
+        assert credential.get_processor_plan(ctype) is not plan
+
+
+class DeadlockError(Exception):
+    pgcode = "40P01"
+
+
+@override_settings(INGEST_DEADLOCK_RETRIES=2, INGEST_DEADLOCK_RETRY_DELAY=0)
+class RetryOnDeadlock_TestCase(SimpleTestCase):
+    def _deadlock(self):
+        error = OperationalError("deadlock detected")
+        error.__cause__ = DeadlockError()
+        return error
+
+    def test_retry(self):
+        calls = []
+
+        def store():
+            calls.append(1)
+            if len(calls) < 3:
+                raise self._deadlock()
+            return "stored"
+
+        self.assertEqual(credential.retry_on_deadlock(store), "stored")
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_exhausted(self):
+        calls = []
+
+        def store():
+            calls.append(1)
+            raise self._deadlock()
+
+        with self.assertRaises(OperationalError):
+            credential.retry_on_deadlock(store)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors(self):
+        calls = []
+
+        def store():
+            calls.append(1)
+            raise OperationalError("connection lost")
+
+        with self.assertRaises(OperationalError):
+            credential.retry_on_deadlock(store)
+        self.assertEqual(len(calls), 1)
+
+
+class CredentialSet_TestCase(TestCase):
+    def setUp(self):
+        self.cred_type = create_credential_type()
+        self.topic = create_topic()
+
+    def _add_credential(self, credential_id, effective_date, rows=None):
+        db_credential = self.topic.credentials.create(
+            credential_type=self.cred_type,
+            credential_id=credential_id,
+            effective_date=effective_date,
+        )
+        credential.CredentialManager.update_credential_set(
+            self.cred_type, db_credential, None, rows
+        )
+        return db_credential
+
+    def test_supersede(self):
+        first = self._add_credential("1", datetime(2019, 1, 1, tzinfo=timezone.utc))
+        rows = credential.CredentialRows()
+        third = self._add_credential(
+            "3", datetime(2019, 3, 1, tzinfo=timezone.utc), rows
+        )
+        self.assertEqual(rows.reindex_credential_ids, [first.id])
+
+        first.refresh_from_db()
+        self.assertTrue(first.revoked)
+        self.assertFalse(first.latest)
+        self.assertEqual(first.revoked_by_id, third.id)
+        self.assertTrue(third.latest)
+
+        # a credential received out of order is superseded by the later one
+        second = self._add_credential("2", datetime(2019, 2, 1, tzinfo=timezone.utc))
+        second.refresh_from_db()
+        third.refresh_from_db()
+        self.assertTrue(second.revoked)
+        self.assertFalse(second.latest)
+        self.assertEqual(second.revoked_by_id, third.id)
+        self.assertTrue(third.latest)
+        self.assertFalse(third.revoked)
+
+        cred_set = CredentialSet.objects.get(topic=self.topic)
+        self.assertEqual(cred_set.latest_credential_id, third.id)
+        self.assertEqual(
+            cred_set.first_effective_date, datetime(2019, 1, 1, tzinfo=timezone.utc)
+        )
+        self.assertIsNone(cred_set.last_effective_date)
+
+
+class CredentialClaims_TestCase(TestCase):
+    def setUp(self):
+        self.creds = create_credentials(create_topic(), create_credential_type(), 3)
+        for idx, db_credential in enumerate(self.creds[1:], 1):
+            Claim.objects.create(
+                credential=db_credential, name="corp_num", value="BC000" + str(idx)
+            )
+
+    def test_preload(self):
+        creds = list(CredentialModel.objects.order_by("id"))
+        with self.assertNumQueries(1):
+            credential.CredentialClaims.preload(creds)
+            self.assertEqual(
+                [
+                    credential.CredentialManager.process_mapping(
+                        {"input": "corp_num", "from": "claim"}, cred
+                    )
+                    for cred in creds[1:]
+                ],
+                ["BC0001", "BC0002"],
+            )
+            with self.assertRaises(AttributeError):
+                credential.CredentialClaims(creds[0]).corp_num
+
+    def test_claim_values(self):
+        cred = CredentialModel.objects.get(credential_id="1")
+        cred.claim_values = {"corp_num": "BC0009"}
+        with self.assertNumQueries(0):
+            credential.CredentialClaims.preload([cred])
+            self.assertEqual(credential.CredentialClaims(cred).corp_num, "BC0009")
+
+    def test_update_claim_columns(self):
+        creds = list(CredentialModel.objects.order_by("id"))
+        creds[0].claim_values = {}
+        creds[0].claims_hash = credential.claims_fingerprint({})
+        with patch.object(CredentialModel.objects, "bulk_update") as bulk_update:
+            self.assertEqual(
+                credential.CredentialManager.update_claim_columns(creds), 2
+            )
+        bulk_update.assert_called_once_with(creds[1:], ["claim_values", "claims_hash"])
+        self.assertEqual(creds[2].claim_values, {"corp_num": "BC0002"})
+        self.assertEqual(
+            creds[2].claims_hash, credential.claims_fingerprint({"corp_num": "BC0002"})
+        )
+
+    def test_find_by_claims(self):
+        creds = list(CredentialModel.objects.order_by("id"))
+        CredentialModel.objects.update(latest=True)
+        # only the last one is fingerprinted, the others are matched by claim rows
+        CredentialModel.objects.filter(id=creds[2].id).update(
+            claims_hash=credential.claims_fingerprint({"corp_num": "BC0002"})
+        )
+
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                credential.CredentialManager.find_credentials_by_claims(
+                    [{"corp_num": "BC0001"}, {"corp_num": "BC0002"}]
+                ),
+                ["1", "2"],
+            )
+        with self.assertRaises(credential.CredentialException):
+            credential.CredentialManager.find_credentials_by_claims(
+                [{"corp_num": "BC0003"}]
+            )
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.test import TestCase
+
+from agent_webhooks.utils import credential
+from agent_webhooks.utils.idempotency import CredentialGuard
+from api.v2.models.Topic import Topic
+from api.v2.tests.fixtures import create_credential_type, create_topic
+
+
+def _credential(thread_id):
+    return credential.Credential(
+        {
+            "thread_id": thread_id,
+            "schema_id": "schema-origin-did:2:schema-name:schema-version",
+            "cred_def_id": "origin-did:3:CL:25:tag",
+            "rev_reg_id": None,
+            "attrs": {},
+        }
+    )
+
+
+class CredentialGuard_TestCase(TestCase):
+    def setUp(self):
+        self.credential_type = create_credential_type()
+        create_topic().credentials.create(
+            credential_type=self.credential_type, credential_id="thread-1"
+        )
+
+    def test_stored_ids(self):
+        guard = CredentialGuard()
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                guard.stored_ids(["thread-1", "thread-2", None]), {"thread-1"}
+            )
+        with self.assertNumQueries(0):
+            self.assertEqual(guard.stored_ids([None]), set())
+        guard.record_suppressed("thread-1")
+        self.assertEqual(guard.suppressed, 1)
+
+    def test_check_duplicate(self):
+        stored = _credential("thread-1")
+        new = _credential("thread-2")
+        with self.assertRaises(credential.DuplicateCredentialException):
+            credential.CredentialManager.check_duplicate(stored)
+        credential.CredentialManager.check_duplicate(new)
+
+        # the stored ids of a batch are checked without a query
+        with self.assertNumQueries(0):
+            with self.assertRaises(credential.DuplicateCredentialException):
+                credential.CredentialManager.check_duplicate(new, {"thread-2"})
+            credential.CredentialManager.check_duplicate(stored, set())
+
+    @mock.patch.object(QuerySet, "select_for_update")
+    def test_duplicate_rejected_before_locks(self, select_for_update):
+        manager = credential.CredentialManager()
+        with mock.patch.object(
+            manager, "resolve_credential_topics"
+        ) as resolve_credential_topics:
+            with self.assertRaises(credential.DuplicateCredentialException):
+                manager.populate_application_database(
+                    self.credential_type, _credential("thread-1")
+                )
+
+            results = manager.process_batch(
+                [_credential("thread-1"), _credential("thread-1")]
+            )
+            self.assertTrue(all(result.duplicate for result in results))
+            self.assertTrue(all(result.error is None for result in results))
+
+        resolve_credential_topics.assert_not_called()
+        select_for_update.assert_not_called()
+        self.assertEqual(Topic.objects.count(), 1)
@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from agent_webhooks.models import IngestQueueItem
+from agent_webhooks.utils.credential import CredentialBatchResult
+from agent_webhooks.utils.ingest import IngestQueue, ingest_partition
+
+
+def _queue_item(exchange_id, corp_num, attempts=1):
+    return IngestQueueItem(
+        id=int(exchange_id),
+        topic="credentials",
+        state="credential_received",
+        credential_exchange_id=exchange_id,
+        status=IngestQueueItem.STATUS_PROCESSING,
+        attempts=attempts,
+        message={
+            "credential_exchange_id": exchange_id,
+            "state": "credential_received",
+            "thread_id": "thread-" + exchange_id,
+            "raw_credential": {
+                "schema_id": "schema-origin-did:2:schema-name:schema-version",
+                "cred_def_id": "origin-did:3:CL:25:tag",
+                "rev_reg_id": None,
+                "values": {"corp_num": {"raw": corp_num, "encoded": "1"}},
+            },
+        },
+    )
+
+
+class IngestQueue_TestCase(TestCase):
+    @patch("agent_webhooks.utils.ingest.send_problem_report", autospec=True)
+    @patch("agent_webhooks.utils.ingest.store_credential", autospec=True)
+    @patch("agent_webhooks.utils.ingest.CredentialManager.process_batch", autospec=True)
+    @patch.object(IngestQueueItem, "delete", autospec=True)
+    @patch.object(IngestQueueItem, "save", autospec=True)
+    def test_ingest(
+        self,
+        mock_save,
+        mock_delete,
+        mock_process_batch,
+        mock_store_credential,
+        mock_problem_report,
+    ):
+        def process_batch(_mgr, credentials):
+            results = []
+            for credential in credentials:
+                if credential.corp_num == "BAD":
+                    results.append(
+                        CredentialBatchResult(credential, error="Invalid credential")
+                    )
+                elif credential.corp_num == "DUP":
+                    result = CredentialBatchResult(credential)
+                    result.duplicate = True
+                    results.append(result)
+                else:
+                    db_credential = type(
+                        "DbCredential", (), {"credential_id": credential.thread_id}
+                    )
+                    results.append(CredentialBatchResult(credential, db_credential))
+            return results
+
+        mock_process_batch.side_effect = process_batch
+
+        stored = _queue_item("1", "BC0001")
+        failed = _queue_item("2", "BAD")
+        exhausted = _queue_item("3", "BC0003", attempts=10)
+        duplicate = _queue_item("4", "DUP")
+
+        queue = IngestQueue(workers=1, batch_size=10)
+        queue.ingest([stored, failed, exhausted, duplicate])
+
+        self.assertEqual(stored.status, IngestQueueItem.STATUS_STORED)
+        self.assertEqual(stored.credential_id, "thread-1")
+        mock_store_credential.assert_called_once_with("1", "thread-1")
+        self.assertEqual(
+            [call[0][0] for call in mock_delete.call_args_list], [duplicate, stored]
+        )
+
+        self.assertEqual(failed.status, IngestQueueItem.STATUS_FAILED)
+        self.assertEqual(failed.error, "Invalid credential")
+        self.assertEqual(exhausted.status, IngestQueueItem.STATUS_FAILED)
+        self.assertEqual(mock_problem_report.call_count, 2)
+        self.assertEqual(len(mock_process_batch.call_args[0][1]), 3)
+
+    @patch("agent_webhooks.utils.ingest.CredentialManager.partition_key", autospec=True)
+    def test_partition(self, mock_partition_key):
+        mock_partition_key.side_effect = lambda _mgr, cred: cred.corp_num
+        first = ingest_partition(_queue_item("1", "BC0001").message)
+        second = ingest_partition(_queue_item("2", "BC0001").message)
+        other = ingest_partition(_queue_item("3", "BC0002").message)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertGreaterEqual(first, 0)
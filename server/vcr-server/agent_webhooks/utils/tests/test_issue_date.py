@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+from django.db import DatabaseError
+from django.test import TestCase
+from unittest.mock import patch
+
+from agent_webhooks.utils.issue_date import IssueDateBuffer
+from api.v2.models.CredentialType import CredentialType
+from api.v2.tests.fixtures import create_credential_type
+
+
+class IssueDateBuffer_TestCase(TestCase):
+    def setUp(self):
+        self.cred_type = create_credential_type()
+
+    def test_flush(self):
+        buffer = IssueDateBuffer(flush_interval=60)
+        first = datetime(2019, 1, 1, tzinfo=timezone.utc)
+        second = datetime(2019, 2, 1, tzinfo=timezone.utc)
+
+        buffer.record([self.cred_type.id], second)
+        buffer.record([self.cred_type.id], first)
+        self.cred_type.refresh_from_db()
+        self.assertIsNone(self.cred_type.last_issue_date)
+
+        buffer.flush()
+        self.cred_type.refresh_from_db()
+        self.assertEqual(self.cred_type.last_issue_date, second)
+
+        # an earlier issue date does not move the value backwards
+        buffer.record([self.cred_type.id], first)
+        buffer.flush()
+        self.cred_type.refresh_from_db()
+        self.assertEqual(self.cred_type.last_issue_date, second)
+
+    def test_flush_failure(self):
+        buffer = IssueDateBuffer(flush_interval=60)
+        issue_date = datetime(2019, 1, 1, tzinfo=timezone.utc)
+        buffer.record([self.cred_type.id], issue_date)
+
+        # a failed update is kept for the next flush
+        with patch.object(
+            CredentialType.objects, "filter", side_effect=DatabaseError("Locked")
+        ):
+            buffer.flush()
+        buffer.flush()
+        self.cred_type.refresh_from_db()
+        self.assertEqual(self.cred_type.last_issue_date, issue_date)
+
+    def test_flusher_thread(self):
+        buffer = IssueDateBuffer(flush_interval=60)
+        with patch.object(buffer, "flush") as flush:
+            buffer.record([self.cred_type.id])
+            thread = buffer._thread
+            buffer.record([self.cred_type.id])
+            self.assertIs(buffer._thread, thread)
+            buffer.stop()
+        flush.assert_called_once_with()
+        self.assertIsNone(buffer._thread)
@@ -2,17 +2,27 @@ import json
 import logging
 import time
 
-import requests
 from django.conf import settings
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
-from api.v2.models.Credential import Credential as CredentialModel
 from api.v2.utils import log_timing_method
-from agent_webhooks.utils.credential import Credential, CredentialManager
+from api.v2.verification import complete_verification
+from agent_webhooks.utils.credential import (
+    CredentialManager,
+    DuplicateCredentialException,
+)
+from agent_webhooks.utils.ingest import (
+    IngestQueue,
+    credential_from_message,
+    handle_credential_batch,
+    send_problem_report,
+    store_credential,
+)
 from agent_webhooks.utils.issuer import IssuerManager
+from vcr_server.utils.agent_admin import agent_admin_client
 
 LOGGER = logging.getLogger(__name__)
 
@@ -49,7 +59,10 @@ def agent_callback(request, topic):
         response = Response("")
 
     elif topic == TOPIC_CREDENTIALS:
-        response = handle_credentials(state, message)
+        if settings.ASYNC_CREDENTIAL_INGEST and state == "credential_received":
+            response = queue_credential(topic, message)
+        else:
+            response = handle_credentials(state, message)
 
     elif topic == TOPIC_PRESENTATIONS or topic == TOPIC_PRESENT_PROOF:
         response = handle_presentations(state, message)
@@ -140,34 +153,15 @@ def handle_credentials(state, message):
             }
 
         elif state == "credential_received":
-            raw_credential = message["raw_credential"]
-
             # You can include this exception to test error reporting
             # raise Exception("Depliberate error to test problem reporting")
 
-            credential_data = {
-                "thread_id": message["thread_id"],
-                "schema_id": raw_credential["schema_id"],
-                "cred_def_id": raw_credential["cred_def_id"],
-                "rev_reg_id": raw_credential["rev_reg_id"],
-                "attrs": {},
-            }
-
-            for attr in raw_credential["values"]:
-                credential_data["attrs"][attr] = raw_credential["values"][attr]["raw"]
-
-            credential = Credential(credential_data)
+            credential = credential_from_message(message)
             credential_manager = CredentialManager()
             credential = credential_manager.process(credential)
 
             # Instruct the agent to store the credential in wallet
-            resp = requests.post(
-                f"{settings.AGENT_ADMIN_URL}/credential_exchange"
-                + f"/{credential_exchange_id}/store",
-                json={"credential_id": credential.credential_id},
-                headers=settings.ADMIN_REQUEST_HEADERS,
-            )
-            resp.raise_for_status()
+            store_credential(credential_exchange_id, credential.credential_id)
 
             response_data = {
                 "success": True,
@@ -180,20 +174,70 @@ def handle_credentials(state, message):
             # print(message)
             response_data = {"success": True, "details": "Credential Stored"}
 
+    except DuplicateCredentialException as e:
+        # A retried webhook: the agent was notified when the credential was stored
+        response_data = {
+            "success": True,
+            "details": f"Duplicate credential with id {e.credential_id}",
+        }
+
     except Exception as e:
         LOGGER.error(str(e))
         # Send a problem report for the error
-        resp = requests.post(
-            f"{settings.AGENT_ADMIN_URL}/credential_exchange/{credential_exchange_id}/problem_report",
-            json={"explain_ltxt": str(e)},
-            headers=settings.ADMIN_REQUEST_HEADERS,
-        )
-        resp.raise_for_status()
+        send_problem_report(credential_exchange_id, str(e))
         return Response({"success": False, "error": str(e)})
 
     return Response(response_data)
 
 
+def queue_credential(topic, message):
+    """
+    Store a received credential in the ingest queue, to be processed by the
+    ingest workers once the webhook has been acknowledged.
+    """
+    credential_exchange_id = message["credential_exchange_id"]
+    item = IngestQueue.enqueue(topic, message)
+    return Response(
+        {
+            "success": True,
+            "details": f"Queued credential exchange {credential_exchange_id}",
+            "queue_id": item.id,
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@swagger_auto_schema(method="post", auto_schema=None)
+@api_view(["POST"])
+@permission_classes((permissions.AllowAny,))
+def agent_batch_callback(request):
+    """
+    Receives a batch of credential webhook messages in the "credential_received"
+    state, in the same format as the `credentials` topic of `agent_callback`.
+
+    The credentials are stored in a single transaction and the agent is then
+    instructed to store (or report a problem with) each credential exchange.
+    Returns the result for each message, in order.
+    """
+    messages = request.data
+    if not isinstance(messages, list):
+        return Response(
+            "Expected a list of credential messages", status=status.HTTP_400_BAD_REQUEST
+        )
+
+    start_time = time.perf_counter()
+    method = "agent_batch_callback." + TOPIC_CREDENTIALS
+
+    results = handle_credential_batch(messages)
+
+    end_time = time.perf_counter()
+    log_timing_method(
+        method, start_time, end_time, True, data={"batch_size": len(messages)}
+    )
+
+    return Response({"results": results})
+
+
 def handle_presentations(state, message):
     print("handle_presentations()", state)
 
@@ -214,11 +258,10 @@ def handle_presentations(state, message):
             requested_attribute_referents + requested_predicates_referents
         )
 
-        resp = requests.get(
-            f"{settings.AGENT_ADMIN_URL}/present-proof/records/"
-            + f"{message['presentation_exchange_id']}/credentials/"
-            + f"{referents}",
-            headers=settings.ADMIN_REQUEST_HEADERS,
+        resp = agent_admin_client().get(
+            "/present-proof/records/{}/credentials/{}",
+            presentation_exchange_id,
+            referents,
         )
 
         # All credentials from wallet that satisfy presentation request
@@ -237,29 +280,11 @@ def handle_presentations(state, message):
             credentials_for_presentation["requested_predicates"][referent] = {}
 
         # Now we need to provide a credential id for each requested_*
-        for credential in credentials:
-            # This query plus limiting by claim values below
-            # *should* return exactly one result
-            credential_query = CredentialModel.objects.filter(
-                revoked=False, inactive=False, latest=True
-            )
-            for attr in credential["cred_info"]["attrs"]:
-                credential_query = credential_query.filter(
-                    claims__name=attr,
-                    claims__value=credential["cred_info"]["attrs"][attr],
-                )
-
-            # If we don't have exactly 1 result, we can't construct a presentation
-            # deterministically
-            results_length = len(credential_query)
-            if results_length != 1:
-                raise Exception(
-                    "Number of credentials returned by query "
-                    + f"{credential_query.query} was not 1, it was {results_length}"
-                )
-
-            credential_result = credential_query.first()
-            credential_id = credential_result.credential_id
+        # Look up the stored credentials by the fingerprint of their claims
+        credential_ids = CredentialManager.find_credentials_by_claims(
+            [credential["cred_info"]["attrs"] for credential in credentials]
+        )
+        for credential, credential_id in zip(credentials, credential_ids):
 
             # Ensure that the credential_id we retrieved from the agent is in fact
             # in the set of credentials returned from the wallet in the first place.
@@ -315,15 +340,18 @@ def handle_presentations(state, message):
         # Finally, we should be able to send this payload to the agent for it
         # to finish the process and send the presentation back to the verifier
         # (to be verified)
-        resp = requests.post(
-            f"{settings.AGENT_ADMIN_URL}/present-proof/records/"
-            + f"{presentation_exchange_id}/send-presentation",
+        resp = agent_admin_client().post(
+            "/present-proof/records/{}/send-presentation",
+            presentation_exchange_id,
             json=credentials_for_presentation,
-            headers=settings.ADMIN_REQUEST_HEADERS,
         )
 
         resp.raise_for_status()
 
+    elif state == "verified":
+        # Completes a self-verification of a credential
+        complete_verification(message)
+
     return Response()
 
 
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:40
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0026_auto_20190923_0217'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificationJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_timestamp', models.DateTimeField(auto_now_add=True, null=True)),
+                ('update_timestamp', models.DateTimeField(auto_now=True, null=True)),
+                ('credential_timestamp', models.DateTimeField(null=True)),
+                ('presentation_exchange_id', models.TextField(db_index=True, null=True)),
+                ('status', models.TextField(default='pending')),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(null=True)),
+                ('error', models.TextField(null=True)),
+                ('credential', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='verification_jobs', to='api_v2.Credential')),
+            ],
+            options={
+                'db_table': 'verification_job',
+                'ordering': ('id',),
+            },
+        ),
+    ]
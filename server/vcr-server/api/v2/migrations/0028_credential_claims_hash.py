@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0027_verificationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='credential',
+            name='claims_hash',
+            field=models.TextField(db_index=True, null=True),
+        ),
+    ]
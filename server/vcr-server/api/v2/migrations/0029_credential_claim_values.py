@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:43
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+def create_claims_index(apps, schema_editor):
+    # GIN indexes are specific to Postgres
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS credential_claims_gin "
+            "ON credential USING gin (claims)"
+        )
+
+
+def drop_claims_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS credential_claims_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0028_credential_claims_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='credential',
+            name='claim_values',
+            field=django.contrib.postgres.fields.jsonb.JSONField(db_column='claims', null=True),
+        ),
+        migrations.RunPython(create_claims_index, drop_claims_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0029_credential_claim_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolrQueueItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_timestamp', models.DateTimeField(auto_now_add=True, null=True)),
+                ('update_timestamp', models.DateTimeField(auto_now=True, null=True)),
+                ('index', models.TextField()),
+                ('using', models.TextField(default='default')),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.TextField(default='update')),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(null=True)),
+            ],
+            options={
+                'db_table': 'solr_queue',
+                'ordering': ('id',),
+            },
+        ),
+    ]
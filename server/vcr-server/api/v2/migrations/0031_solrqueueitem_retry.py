@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0030_solrqueueitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solrqueueitem',
+            name='dead',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='solrqueueitem',
+            name='retry_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
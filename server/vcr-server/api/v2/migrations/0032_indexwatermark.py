@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_v2', '0031_solrqueueitem_retry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_timestamp', models.DateTimeField(auto_now_add=True, null=True)),
+                ('update_timestamp', models.DateTimeField(auto_now=True, null=True)),
+                ('index', models.TextField()),
+                ('using', models.TextField(default='default')),
+                ('indexed_until', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'index_watermark',
+                'unique_together': {('index', 'using')},
+            },
+        ),
+    ]
@@ -1,9 +1,41 @@
+import hashlib
+import json
+
+from django.contrib.postgres import fields as contrib
 from django.db import models
 from django.utils import timezone
 
 from .Auditable import Auditable
 
 
+def claims_fingerprint(claims: dict) -> str:
+    """
+    Hash the (name, value) pairs of a credential's claims
+    """
+    pairs = sorted((str(name), str(value)) for (name, value) in claims.items())
+    return hashlib.sha256(json.dumps(pairs).encode("utf-8")).hexdigest()
+
+
+class CredentialQuerySet(models.QuerySet):
+    def with_claims(self, claims: dict):
+        """
+        Filter credentials having all of the given claim values (JSONB @>)
+        """
+        return self.filter(claim_values__contains=claims)
+
+    def with_claim_names(self, *names: str):
+        """
+        Filter credentials having all of the given claims (JSONB ?&)
+        """
+        return self.filter(claim_values__has_keys=list(names))
+
+    def with_any_claim_names(self, *names: str):
+        """
+        Filter credentials having any of the given claims (JSONB ?|)
+        """
+        return self.filter(claim_values__has_any_keys=list(names))
+
+
 class Credential(Auditable):
     topic = models.ForeignKey(
         "Topic", related_name="credentials", on_delete=models.CASCADE
@@ -17,6 +49,10 @@ class Credential(Auditable):
     credential_id = models.TextField(db_index=True)
     credential_def_id = models.TextField(db_index=True, null=True)
     cardinality_hash = models.TextField(db_index=True, null=True)
+    # fingerprint of the claims, used to look up credentials by their claims
+    claims_hash = models.TextField(db_index=True, null=True)
+    # claim values by name, denormalized from the claim table
+    claim_values = contrib.JSONField(db_column="claims", null=True)
 
     effective_date = models.DateTimeField(default=timezone.now)
     inactive = models.BooleanField(db_index=True, default=False)
@@ -37,6 +73,8 @@ class Credential(Auditable):
         symmetrical=False,
     )
 
+    objects = CredentialQuerySet.as_manager()
+
     class Meta:
         db_table = "credential"
         ordering = ("id",)
@@ -78,9 +116,31 @@ class Credential(Auditable):
     def all_names(self):
         return self._cached("names", self.names.all())
 
+    @property
+    def all_claims(self) -> dict:
+        """
+        The claim values by name, read from the claim table if they have not
+        been stored on the credential yet
+        """
+        cache = self._cache
+        if cache is None or "claims" not in cache:
+            claims = self.claim_values
+            if claims is None:
+                claims = {claim.name: claim.value for claim in self.claims.all()}
+            return self._cached("claims", claims)
+        return cache["claims"]
+
+    @property
+    def all_addresses(self):
+        return self._cached("addresses", self.addresses.all())
+
     @property
     def all_categories(self):
-        return self._cached("categories", self.attributes.filter(format="category"))
+        # filtered in Python, to make use of prefetched attributes
+        return self._cached(
+            "categories",
+            [attr for attr in self.all_attributes if attr.format == "category"],
+        )
 
     @property
     def all_credential_type_ids(self):
@@ -0,0 +1,21 @@
+from django.db import models
+
+from .Auditable import Auditable
+
+
+class IndexWatermark(Auditable):
+    """
+    The time up to which a search index is known to be up to date.
+
+    Rows updated since the watermark are reindexed on startup, in place of
+    the whole index.
+    """
+
+    # dotted path of the search index class
+    index = models.TextField()
+    using = models.TextField(default="default")
+    indexed_until = models.DateTimeField()
+
+    class Meta:
+        db_table = "index_watermark"
+        unique_together = (("index", "using"),)
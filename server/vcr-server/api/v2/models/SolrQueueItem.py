@@ -0,0 +1,33 @@
+from django.db import models
+
+from .Auditable import Auditable
+
+
+class SolrQueueItem(Auditable):
+    """
+    A pending search index update or removal for one indexed object.
+
+    Items are written in the same transaction as the indexed rows, and
+    removed by the Solr queue once the index has been updated.
+    """
+
+    ACTION_UPDATE = "update"
+    ACTION_DELETE = "delete"
+    # atomic update of the status fields of an indexed document
+    ACTION_STATUS = "status"
+
+    # dotted path of the search index class
+    index = models.TextField()
+    using = models.TextField(default="default")
+    object_id = models.BigIntegerField()
+    action = models.TextField(default=ACTION_UPDATE)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(null=True)
+    # a failed item is not retried before this time
+    retry_at = models.DateTimeField(null=True)
+    # set once the item has failed too many times to be retried
+    dead = models.BooleanField(db_index=True, default=False)
+
+    class Meta:
+        db_table = "solr_queue"
+        ordering = ("id",)
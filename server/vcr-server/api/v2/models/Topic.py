@@ -58,6 +58,11 @@ class Topic(Auditable):
         return self._active_cred_ids
 
     def get_active_credential_type_ids(self):
+        if self._active_cred_type_ids is None and hasattr(self, "active_credentials"):
+            # prefetched for a batch of credentials, see CredentialIndex
+            self._active_cred_type_ids = set(
+                cred.credential_type_id for cred in self.active_credentials
+            )
         if self._active_cred_type_ids is None:
             self._active_cred_type_ids = set(
                 self.credentials.filter(latest=True, revoked=False)
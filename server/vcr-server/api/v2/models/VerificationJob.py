@@ -0,0 +1,44 @@
+from django.contrib.postgres import fields as contrib
+from django.db import models
+
+from .Auditable import Auditable
+
+
+class VerificationJob(Auditable):
+    """
+    A self-verification of a credential using a proof request to the agent.
+
+    The job is completed by the present_proof webhook. A verified job is
+    reused as the verification result until the credential is updated.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_VERIFIED = "verified"
+    STATUS_FAILED = "failed"
+
+    credential = models.ForeignKey(
+        "Credential", related_name="verification_jobs", on_delete=models.CASCADE
+    )
+    # update_timestamp of the credential when it was verified
+    credential_timestamp = models.DateTimeField(null=True)
+    presentation_exchange_id = models.TextField(db_index=True, null=True)
+    status = models.TextField(default=STATUS_PENDING)
+    result = contrib.JSONField(null=True)
+    error = models.TextField(null=True)
+
+    class Meta:
+        db_table = "verification_job"
+        ordering = ("id",)
+
+    @property
+    def success(self) -> bool:
+        return self.status == self.STATUS_VERIFIED
+
+    def serialize(self) -> dict:
+        return {
+            "job_id": self.id,
+            "state": self.status,
+            "pending": self.status == self.STATUS_PENDING,
+            "success": self.success,
+            "result": self.result if self.success else self.error,
+        }
@@ -9,3 +9,6 @@ from .Schema import Schema
 from .Topic import Topic
 from .TopicRelationship import TopicRelationship
 from .User import User
+from .VerificationJob import VerificationJob
+from .SolrQueueItem import SolrQueueItem
+from .IndexWatermark import IndexWatermark
@@ -2,12 +2,28 @@ import logging
 
 from django.db import transaction
 from haystack import indexes
+from haystack.constants import ID
+from haystack.utils import get_identifier
 
 LOGGER = logging.getLogger(__name__)
 
 
 class TxnAwareSearchIndex(indexes.SearchIndex):
     _backend_queue = None
+    # indexed fields which can be changed with an atomic update, without
+    # rebuilding the whole document
+    status_fields = ()
+    # model fields which may be saved along with the status fields
+    status_ignored_fields = ()
+
+    @classmethod
+    def _queue_in_transaction(cls, conn) -> bool:
+        # a durable queue stores updates as part of the current transaction
+        return (
+            conn.in_atomic_block
+            and cls._backend_queue is not None
+            and getattr(cls._backend_queue, "transactional", False)
+        )
 
     def __init__(self, *args, **kwargs):
         LOGGER.debug("Initializing TxnAwareSearchIndex ...")
@@ -25,7 +41,10 @@ class TxnAwareSearchIndex(indexes.SearchIndex):
     def update_object(self, instance, using=None, **kwargs):
         LOGGER.debug("Updating object; %s ...", instance.id)
         conn = transaction.get_connection()
-        if conn.in_atomic_block:
+        if self._queue_in_transaction(conn):
+            if self.should_update(instance, **kwargs):
+                self._backend_queue.add(self.__class__, using, [instance])
+        elif conn.in_atomic_block:
             if self._transaction_savepts != conn.savepoint_ids:
                 self._transaction_savepts = conn.savepoint_ids
                 conn.on_commit(self.transaction_committed)
@@ -49,7 +68,9 @@ class TxnAwareSearchIndex(indexes.SearchIndex):
     def remove_object(self, instance, using=None, **kwargs):
         LOGGER.debug("Removing object; %s ...", instance.id)
         conn = transaction.get_connection()
-        if conn.in_atomic_block:
+        if self._queue_in_transaction(conn):
+            self._backend_queue.delete(self.__class__, using, [instance])
+        elif conn.in_atomic_block:
             if self._transaction_savepts != conn.savepoint_ids:
                 self._transaction_savepts = conn.savepoint_ids
                 conn.on_commit(self.transaction_committed)
@@ -69,6 +90,45 @@ class TxnAwareSearchIndex(indexes.SearchIndex):
                     instance, using, **kwargs
                 )
 
+    def is_status_update(self, update_fields) -> bool:
+        """
+        Check whether saving the given model fields only changes status fields
+        """
+        if not self.status_fields or not update_fields:
+            return False
+        allowed = set(self.status_fields).union(self.status_ignored_fields)
+        return set(update_fields) <= allowed
+
+    def update_object_status(self, instance, using=None, **kwargs):
+        LOGGER.debug("Updating object status; %s ...", instance.id)
+        if self._backend_queue:
+            self._backend_queue.set_status(self.__class__, using, [instance])
+        else:
+            self.update_object(instance, using, **kwargs)
+
+    def prepare_status(self, ids, using=None) -> list:
+        """
+        Fetch the status fields for a set of ids, as partial documents
+        """
+        columns = [self.fields[name].model_attr or name for name in self.status_fields]
+        rows = (
+            self.index_queryset(using)
+            .select_related(None)
+            .prefetch_related(None)
+            .filter(id__in=ids)
+            .values_list("id", *columns)
+        )
+        model = self.get_model()
+        docs = []
+        for row in rows:
+            doc = {ID: get_identifier("{}.{}".format(model._meta.label_lower, row[0]))}
+            # only update documents which have already been indexed
+            doc["_version_"] = 1
+            for name, value in zip(self.status_fields, row[1:]):
+                doc[name] = self.fields[name].convert(value)
+            docs.append(doc)
+        return docs
+
     def transaction_committed(self):
         LOGGER.debug("Committing transaction(s) ...")
         conn = transaction.get_connection()
@@ -3,16 +3,18 @@
 
 import logging
 
+from django.db.models import Prefetch
 from haystack import indexes
 
 from api.v2.models.Credential import Credential as CredentialModel
+from api.v2.search.document import credential_document
 from api.v2.search.index import TxnAwareSearchIndex
 
 LOGGER = logging.getLogger(__name__)
 
 
 class CredentialIndex(TxnAwareSearchIndex, indexes.Indexable):
-    document = indexes.CharField(document=True, use_template=True)
+    document = indexes.CharField(document=True)
 
     name = indexes.MultiValueField()
     location = indexes.MultiValueField()
@@ -24,6 +26,7 @@ class CredentialIndex(TxnAwareSearchIndex, indexes.Indexable):
     revoked = indexes.BooleanField(model_attr="revoked")
     latest = indexes.BooleanField(model_attr="latest")
     create_timestamp = indexes.DateTimeField(model_attr="create_timestamp")
+    update_timestamp = indexes.DateTimeField(model_attr="update_timestamp")
     effective_date = indexes.DateTimeField(model_attr="effective_date")
     revoked_date = indexes.DateTimeField(model_attr="revoked_date", null=True)
     credential_set_id = indexes.IntegerField(model_attr="credential_set_id", null=True)
@@ -34,6 +37,16 @@ class CredentialIndex(TxnAwareSearchIndex, indexes.Indexable):
     schema_version = indexes.CharField(model_attr="credential_type__schema__version")
     credential_id = indexes.CharField(model_attr="credential_id")
 
+    # changed when a credential is superseded by a new credential in its set;
+    # the update timestamp in the document text is refreshed by the next full
+    # update of the credential
+    status_fields = ("latest", "revoked", "revoked_date", "update_timestamp")
+    status_ignored_fields = ("revoked_by",)
+
+    @staticmethod
+    def prepare_document(obj):
+        return credential_document(obj)
+
     @staticmethod
     def prepare_name(obj):
         return [name.text for name in obj.all_names]
@@ -49,7 +62,7 @@ class CredentialIndex(TxnAwareSearchIndex, indexes.Indexable):
     @staticmethod
     def prepare_location(obj):
         locations = []
-        for address in obj.addresses.all():
+        for address in obj.all_addresses:
             loc = " ".join(
                 filter(
                     None,
@@ -71,7 +84,20 @@ class CredentialIndex(TxnAwareSearchIndex, indexes.Indexable):
         return CredentialModel
 
     def index_queryset(self, using=None):
-        prefetch = ("addresses", "attributes", "names")
+        prefetch = (
+            "addresses",
+            "attributes",
+            "names",
+            # active credential types of the topics in the batch, shared by
+            # the credentials of the same topic
+            Prefetch(
+                "topic__credentials",
+                queryset=CredentialModel.objects.filter(
+                    latest=True, revoked=False
+                ).only("id", "topic_id", "credential_type_id"),
+                to_attr="active_credentials",
+            ),
+        )
         select = (
             "credential_set",
             "credential_type",
@@ -1,5 +1,6 @@
 from rest_framework.serializers import (
     BooleanField,
+    DictField,
     ModelSerializer,
     SerializerMethodField,
 )
@@ -241,6 +242,7 @@ class ExpandedCredentialSetSerializer(CredentialSetSerializer):
 
 class ExpandedCredentialSerializer(CredentialExtSerializer):
     credential_set = ExpandedCredentialSetSerializer()
+    claims = DictField(source="all_claims", read_only=True)
 
     class Meta(CredentialExtSerializer.Meta):
-        fields = CredentialExtSerializer.Meta.fields + ("credential_set",)
+        fields = CredentialExtSerializer.Meta.fields + ("credential_set", "claims")
@@ -1,6 +1,54 @@
+import threading
+
+from django.db import transaction
+from haystack.exceptions import NotHandled
 from haystack.signals import RealtimeSignalProcessor
 from api.v2.models.CredentialSet import CredentialSet
 
+
+class TransactionState:
+    """
+    Signal handling state for one savepoint of the current transaction: the
+    instances which have been handled, and the credential sets of each topic
+    by id.
+
+    The state is registered as an on_commit hook with the savepoint ids in
+    effect, so it is discarded along with the durable queue rows when that
+    savepoint is rolled back, and cleared when the transaction commits.
+    Lookups also consult the states of the enclosing and released savepoints,
+    given by `registered`, most recent first.
+    """
+
+    def __init__(self, sids: tuple = (), registered=None):
+        self.sids = sids
+        self.saved = set()
+        self.topic_sets = {}
+        self._registered = registered or (lambda: [self])
+
+    def __call__(self):
+        self.saved.clear()
+        self.topic_sets.clear()
+
+    def is_saved(self, key) -> bool:
+        return any(key in state.saved for state in self._registered())
+
+    def discard(self, key):
+        for state in self._registered():
+            state.saved.discard(key)
+
+    def get_topic_sets(self, topic_id) -> dict:
+        """
+        Fetch the credential sets of a topic, copied into this savepoint so
+        that changes are discarded if it is rolled back
+        """
+        if topic_id not in self.topic_sets:
+            for state in self._registered():
+                if topic_id in state.topic_sets:
+                    self.topic_sets[topic_id] = dict(state.topic_sets[topic_id])
+                    break
+        return self.topic_sets.get(topic_id)
+
+
 class RelatedRealtimeSignalProcessor(RealtimeSignalProcessor):
     reindex_related = True
 
@@ -12,28 +60,123 @@ class RelatedRealtimeSignalProcessor(RealtimeSignalProcessor):
     Models must define a reindex_related list which defines which relationships
     to traverse during indexing
 
+    Within a transaction each instance is handled once, unless the savepoint
+    it was handled in is rolled back: the index queue reads the rows back by
+    id after the commit, so later saves of the same instance (and of the
+    related instances it cascades to) would only queue it again. Saves which only change the status fields of an index are
+    sent as atomic updates of those fields.
+
     adapted from:
     https://stackoverflow.com/questions/27635340/update-django-haystack-search-index-for-prepared-field#27753826
     """
 
-    def check_if_reindex(self, instance):
+    def __init__(self, *args, **kwargs):
+        self._local = threading.local()
+        super(RelatedRealtimeSignalProcessor, self).__init__(*args, **kwargs)
+
+    def transaction_state(self):
+        """
+        Fetch the state for the current savepoint of the transaction, or None
+        in autocommit mode
+        """
+        conn = transaction.get_connection()
+        if not conn.in_atomic_block:
+            return None
+        sids = tuple(conn.savepoint_ids)
+        for state in self.registered_states(conn):
+            if state.sids == sids:
+                return state
+        state = TransactionState(sids, lambda: self.registered_states(conn))
+        conn.on_commit(state)
+        self._local.states.append(state)
+        return state
+
+    def registered_states(self, conn) -> list:
+        """
+        Fetch the states which are still registered with the transaction,
+        most recent first: the states of rolled back savepoints are dropped
+        """
+        registered = {id(func) for _, func in conn.run_on_commit}
+        states = [
+            state
+            for state in getattr(self._local, "states", ())
+            if id(state) in registered
+        ]
+        self._local.states = states
+        return states[::-1]
+
+    def topic_credential_sets(self, instance, state=None) -> dict:
+        """
+        Fetch the credential type ids of the credential sets of a topic by
+        set id, once per transaction
+        """
+        topic_sets = state.get_topic_sets(instance.topic_id) if state else None
+        if topic_sets is None:
+            topic_sets = dict(
+                instance.topic.credential_sets.values_list("id", "credential_type_id")
+            )
+            if state:
+                state.topic_sets[instance.topic_id] = topic_sets
+        topic_sets[instance.id] = instance.credential_type_id
+        return topic_sets
+
+    def check_if_reindex(self, instance, state=None):
         if type(instance) is CredentialSet:
             # don't re-index if it's a "foundational" type
             if instance.topic.type == instance.credential_type.description:
                 return False
 
             # don't re-index if we already have this cred type on our topic
-            topic_credential_sets = instance.topic.credential_sets.all()
-            for topic_credential_set in topic_credential_sets:
-                if topic_credential_set.id != instance.id and topic_credential_set.credential_type == instance.credential_type:
+            topic_sets = self.topic_credential_sets(instance, state)
+            for set_id, cred_type_id in topic_sets.items():
+                if set_id != instance.id and cred_type_id == instance.credential_type_id:
                     return False
 
         # default return True
         return True
 
+    def handle_status_save(self, sender, instance, update_fields, state=None) -> bool:
+        """
+        Queue atomic status updates for a save which only changed status fields
+
+        Returns:
+            bool -- False if the save needs a full update
+        """
+        if not update_fields or hasattr(instance, "reindex_related"):
+            return False
+        indexes = []
+        for using in self.connection_router.for_write(instance=instance):
+            try:
+                index = self.connections[using].get_unified_index().get_index(sender)
+            except NotHandled:
+                continue
+            if not getattr(index, "is_status_update", lambda _fields: False)(update_fields):
+                return False
+            indexes.append((using, index))
+        if not indexes:
+            return False
+        if state is not None:
+            key = (instance.__class__, instance.pk)
+            if state.is_saved(key) or state.is_saved(("status",) + key):
+                # the pending update already covers this change
+                return True
+            state.saved.add(("status",) + key)
+        for using, index in indexes:
+            index.update_object_status(instance, using=using)
+        return True
+
     def handle_save(self, sender, instance, **kwargs):
+        state = self.transaction_state()
+        if self.handle_status_save(sender, instance, kwargs.get("update_fields"), state):
+            return
+        if state is not None:
+            key = (instance.__class__, instance.pk)
+            if state.is_saved(key):
+                return
+            state.saved.add(key)
+
         if self.reindex_related and hasattr(instance, "reindex_related"):
-            if self.check_if_reindex(instance):
+            if self.check_if_reindex(instance, state):
                 for related in instance.reindex_related:
                     related_obj = getattr(instance, related)
                     related_objs = None
@@ -48,13 +191,21 @@ class RelatedRealtimeSignalProcessor(RealtimeSignalProcessor):
                     if related_objs:
                         for related_obj in related_objs:
                             self.handle_save(related_obj.__class__, related_obj)
-                    else:
+                    elif related_objs is None and related_obj is not None:
                         self.handle_save(related_obj.__class__, related_obj)
         return super(RelatedRealtimeSignalProcessor, self).handle_save(
             sender, instance, **kwargs
         )
 
     def handle_delete(self, sender, instance, **kwargs):
+        state = self.transaction_state()
+        if state is not None:
+            state.discard((instance.__class__, instance.pk))
+            if type(instance) is CredentialSet:
+                topic_sets = state.get_topic_sets(instance.topic_id)
+                if topic_sets:
+                    topic_sets.pop(instance.id, None)
+
         if self.reindex_related and hasattr(instance, "reindex_related"):
             for related in instance.reindex_related:
                 related_obj = getattr(instance, related)
@@ -67,7 +218,7 @@ class RelatedRealtimeSignalProcessor(RealtimeSignalProcessor):
                 if related_objs:
                     for related_obj in related_objs:
                         self.handle_delete(related_obj.__class__, related_obj)
-                else:
+                elif related_objs is None and related_obj is not None:
                     self.handle_delete(related_obj.__class__, related_obj)
         return super(RelatedRealtimeSignalProcessor, self).handle_delete(
             sender, instance, **kwargs
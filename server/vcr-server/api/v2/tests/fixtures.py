@@ -0,0 +1,49 @@
+"""
+Database records shared by the credential, indexing and search tests
+"""
+
+from api.v2.models.CredentialType import CredentialType
+from api.v2.models.Issuer import Issuer
+from api.v2.models.Schema import Schema
+from api.v2.models.Topic import Topic
+
+TEST_ISSUER_DID = "not:a:did:456"
+
+
+def create_issuer(did: str = TEST_ISSUER_DID) -> Issuer:
+    return Issuer.objects.create(did=did, name="Test Issuer", abbreviation="TI")
+
+
+def create_credential_type(
+    issuer: Issuer = None,
+    schema_name: str = "test-schema",
+    credential_def_id: str = "123456",
+    **kwargs
+) -> CredentialType:
+    """
+    Create a credential type and its schema, and the issuer if none is given
+    """
+    if issuer is None:
+        issuer = create_issuer()
+    schema = Schema.objects.create(
+        name=schema_name, version="0.0.1", origin_did=issuer.did
+    )
+    return CredentialType.objects.create(
+        schema=schema, issuer=issuer, credential_def_id=credential_def_id, **kwargs
+    )
+
+
+def create_topic(source_id: str = "BC0001", topic_type: str = "registration"):
+    return Topic.objects.create(source_id=source_id, type=topic_type)
+
+
+def create_credentials(topic: Topic, credential_type: CredentialType, count: int):
+    """
+    Create `count` credentials for the topic, with ids "0", "1", ...
+    """
+    return [
+        topic.credentials.create(
+            credential_type=credential_type, credential_id=str(idx)
+        )
+        for idx in range(count)
+    ]
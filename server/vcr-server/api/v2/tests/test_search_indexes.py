@@ -0,0 +1,72 @@
+from django.template import loader
+from django.test import TestCase
+
+from api.v2.models.Address import Address
+from api.v2.models.Attribute import Attribute
+from api.v2.models.Name import Name
+from api.v2.search.document import DOCUMENT_TEMPLATE, credential_document
+from api.v2.search_indexes import CredentialIndex
+from api.v2.tests.fixtures import create_credential_type, create_issuer, create_topic
+
+
+class CredentialIndex_TestCase(TestCase):
+    def setUp(self):
+        issuer = create_issuer()
+        cred_types = [
+            create_credential_type(issuer, "schema-" + str(idx), "cred-def-" + str(idx))
+            for idx in range(3)
+        ]
+        topic = self.topic = create_topic()
+        for idx, cred_type in enumerate(cred_types):
+            credential = topic.credentials.create(
+                credential_type=cred_type,
+                credential_id=str(idx),
+                # the last credential has been replaced
+                latest=idx < 2,
+            )
+            Address.objects.create(credential=credential, city="Victoria", country="CA")
+            Attribute.objects.create(
+                credential=credential,
+                type="entity_status",
+                format="category",
+                value="ACT",
+            )
+            Name.objects.create(credential=credential, text="Smith & Sons <Ltd>")
+            Name.objects.create(credential=credential, text="O'Brien")
+        self.cred_type_ids = {cred_types[0].id, cred_types[1].id}
+
+    def test_prepare_batch(self):
+        index = CredentialIndex()
+        # credentials, addresses, attributes, names and topic credential types
+        with self.assertNumQueries(5):
+            credentials = list(index.index_queryset())
+        with self.assertNumQueries(0):
+            docs = [index.full_prepare(credential) for credential in credentials]
+        for doc in docs:
+            self.assertEqual(set(doc["topic_credential_type_id"]), self.cred_type_ids)
+            self.assertEqual(doc["location"], ["Victoria CA"])
+            self.assertEqual(doc["category"], ["entity_status::ACT"])
+
+    def test_document_parity(self):
+        for credential in CredentialIndex().index_queryset():
+            self.assertEqual(
+                credential_document(credential),
+                loader.render_to_string(DOCUMENT_TEMPLATE, {"object": credential}),
+            )
+
+    def test_prepare_status(self):
+        credential = self.topic.credentials.get(latest=False)
+        docs = CredentialIndex().prepare_status([credential.id])
+        self.assertEqual(
+            docs,
+            [
+                {
+                    "id": "api_v2.credential.{}".format(credential.id),
+                    "_version_": 1,
+                    "latest": False,
+                    "revoked": False,
+                    "revoked_date": None,
+                    "update_timestamp": credential.update_timestamp,
+                }
+            ],
+        )
@@ -0,0 +1,155 @@
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TestCase
+from haystack import connection_router, connections
+from haystack.signals import RealtimeSignalProcessor
+
+from agent_webhooks.utils.credential import STATUS_UPDATE_FIELDS
+from api.v2.models.CredentialSet import CredentialSet
+from api.v2.models.Name import Name
+from api.v2.search_indexes import CredentialIndex
+from api.v2.signals import RelatedRealtimeSignalProcessor, TransactionState
+from api.v2.tests.fixtures import create_credential_type, create_issuer, create_topic
+
+
+class RelatedRealtimeSignalProcessor_TestCase(TestCase):
+    def setUp(self):
+        issuer = create_issuer()
+        self.cred_types = [
+            create_credential_type(
+                issuer,
+                "schema-" + str(idx),
+                "cred-def-" + str(idx),
+                description="registration" if idx == 0 else "other",
+            )
+            for idx in range(3)
+        ]
+        self.topic = create_topic()
+        self.credential = self.topic.credentials.create(
+            credential_type=self.cred_types[0], credential_id="0"
+        )
+        self.processor = RelatedRealtimeSignalProcessor(connections, connection_router)
+
+    def tearDown(self):
+        self.processor.teardown()
+
+    def _credential_set(self, cred_type):
+        return CredentialSet.objects.create(
+            topic=self.topic,
+            credential_type=cred_type,
+            latest_credential=self.credential,
+        )
+
+    def test_handle_save_once_per_transaction(self):
+        with patch.object(RealtimeSignalProcessor, "handle_save") as handle_save:
+            with transaction.atomic():
+                names = [
+                    Name.objects.create(credential=self.credential, text=text)
+                    for text in ("one", "two")
+                ]
+                for name in names + names:
+                    self.processor.handle_save(Name, name)
+                self.processor.handle_save(type(self.credential), self.credential)
+        handled = [call[0][1] for call in handle_save.call_args_list]
+        self.assertEqual(handled, [self.credential, names[0], names[1]])
+
+    @patch.object(CredentialIndex, "update_object_status", autospec=True)
+    def test_handle_status_save(self, update_object_status):
+        credential = self.credential
+        with patch.object(RealtimeSignalProcessor, "handle_save") as handle_save:
+            with transaction.atomic():
+                for _ in range(2):
+                    self.processor.handle_save(
+                        type(credential), credential, update_fields=STATUS_UPDATE_FIELDS
+                    )
+                self.assertEqual(update_object_status.call_count, 1)
+                handle_save.assert_not_called()
+
+                # other fields need a full update, which covers later status saves
+                self.processor.handle_save(
+                    type(credential), credential, update_fields=["credential_id"]
+                )
+                self.processor.handle_save(
+                    type(credential), credential, update_fields=STATUS_UPDATE_FIELDS
+                )
+        self.assertEqual(update_object_status.call_count, 1)
+        self.assertEqual(handle_save.call_count, 1)
+
+    def test_handle_save_after_rollback(self):
+        with patch.object(RealtimeSignalProcessor, "handle_save") as handle_save:
+            try:
+                with transaction.atomic():
+                    self.processor.handle_save(type(self.credential), self.credential)
+                    raise ValueError()
+            except ValueError:
+                pass
+            with transaction.atomic():
+                self.processor.handle_save(type(self.credential), self.credential)
+        self.assertEqual(handle_save.call_count, 2)
+
+    def test_handle_save_after_savepoint_rollback(self):
+        credential = self.credential
+        with patch.object(RealtimeSignalProcessor, "handle_save") as handle_save:
+            with transaction.atomic():
+                self.processor.handle_save(type(self.topic), self.topic)
+                try:
+                    with transaction.atomic():
+                        self.processor.handle_save(type(credential), credential)
+                        raise ValueError()
+                except ValueError:
+                    pass
+                with transaction.atomic():
+                    # the update queued in the rolled back savepoint was lost
+                    self.processor.handle_save(type(credential), credential)
+                    self.processor.handle_save(type(self.topic), self.topic)
+                # a released savepoint keeps its updates
+                self.processor.handle_save(type(credential), credential)
+        handled = [call[0][1] for call in handle_save.call_args_list]
+        self.assertEqual(handled, [self.topic, credential, credential])
+
+    def test_check_if_reindex_after_savepoint_rollback(self):
+        with transaction.atomic():
+            state = self.processor.transaction_state()
+            self.assertTrue(
+                self.processor.check_if_reindex(
+                    self._credential_set(self.cred_types[1]), state
+                )
+            )
+            try:
+                with transaction.atomic():
+                    # not saved, so the id is not reused after the rollback
+                    rolled_back = CredentialSet(
+                        id=10 ** 6,
+                        topic=self.topic,
+                        credential_type=self.cred_types[2],
+                    )
+                    self.processor.check_if_reindex(
+                        rolled_back, self.processor.transaction_state()
+                    )
+                    raise ValueError()
+            except ValueError:
+                pass
+            # the set created in the rolled back savepoint is forgotten
+            self.assertTrue(
+                self.processor.check_if_reindex(
+                    self._credential_set(self.cred_types[2]),
+                    self.processor.transaction_state(),
+                )
+            )
+
+    def test_check_if_reindex(self):
+        self.processor.teardown()
+        foundational = self._credential_set(self.cred_types[0])
+        first = self._credential_set(self.cred_types[1])
+        state = TransactionState()
+        # the topic and credential types are loaded with the sets
+        self.assertFalse(self.processor.check_if_reindex(foundational, state))
+        # the credential sets of the topic are fetched once
+        with self.assertNumQueries(1):
+            self.assertTrue(self.processor.check_if_reindex(first, state))
+        second = self._credential_set(self.cred_types[1])
+        third = self._credential_set(self.cred_types[2])
+        with self.assertNumQueries(0):
+            self.assertFalse(self.processor.check_if_reindex(second, state))
+            self.assertTrue(self.processor.check_if_reindex(third, state))
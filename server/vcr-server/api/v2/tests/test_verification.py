@@ -0,0 +1,154 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.test import modify_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.v2 import verification
+from api.v2.models.VerificationJob import VerificationJob
+from api.v2.tests.fixtures import create_credential_type, create_topic
+
+
+def _response(data):
+    response = MagicMock()
+    response.json.return_value = data
+    return response
+
+
+@modify_settings(
+    MIDDLEWARE={"remove": "app.middleware.routing.HTTPHeaderRoutingMiddleware"}
+)
+@patch("api.v2.verification.get_self_connection_id", return_value="self-conn")
+@patch("api.v2.verification.agent_admin_client", autospec=True)
+class Verification_TestCase(APITestCase):
+    def setUp(self):
+        self.credential = create_topic().credentials.create(
+            credential_type=create_credential_type(), credential_id="cred-1"
+        )
+
+    def test_verify(self, mock_client, _mock_connection):
+        agent_admin = mock_client.return_value
+        agent_admin.get.return_value = _response({"attrs": {"corp_num": "BC0001"}})
+        agent_admin.post.return_value = _response(
+            {"presentation_exchange_id": "pres-1"}
+        )
+
+        url = "/api/v2/credential/{}/verify".format(self.credential.id)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        result = response.json()
+        self.assertTrue(result["pending"])
+        self.assertFalse(result["success"])
+        job = VerificationJob.objects.get(id=result["job_id"])
+        self.assertEqual(job.presentation_exchange_id, "pres-1")
+
+        proof_request = agent_admin.post.call_args[1]["json"]
+        self.assertEqual(proof_request["connection_id"], "self-conn")
+        self.assertEqual(
+            proof_request["proof_request"]["requested_attributes"]["self-verify-proof"][
+                "names"
+            ],
+            ["corp_num"],
+        )
+
+        # a pending job is reused rather than sending another proof request
+        response = self.client.get(url)
+        self.assertEqual(response.json()["job_id"], job.id)
+        self.assertEqual(agent_admin.post.call_count, 1)
+
+        response = self.client.get("{}/{}".format(url, job.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["pending"])
+
+    def test_verify_webhook_before_exchange_id(self, mock_client, _mock_connection):
+        record = {
+            "presentation_exchange_id": "pres-1",
+            "state": "verified",
+            "verified": "true",
+            "presentation_request": {"name": "self-verify"},
+            "presentation": {"requested_proof": {}},
+        }
+
+        def send_request(*args, **kwargs):
+            # the webhook finds no job with the exchange id yet
+            self.assertIsNone(verification.complete_verification(record))
+            return _response({"presentation_exchange_id": "pres-1"})
+
+        def get(path, *args, **kwargs):
+            if path.startswith("/present-proof/records/"):
+                return _response(record)
+            return _response({"attrs": {"corp_num": "BC0001"}})
+
+        agent_admin = mock_client.return_value
+        agent_admin.post.side_effect = send_request
+        agent_admin.get.side_effect = get
+
+        save = VerificationJob.save
+
+        def save_without_result(job, update_fields=None, **kwargs):
+            # the JSON result cannot be saved to sqlite
+            if update_fields:
+                update_fields = [field for field in update_fields if field != "result"]
+            save(job, update_fields=update_fields, **kwargs)
+
+        with patch.object(VerificationJob, "save", save_without_result):
+            job = verification.start_verification(self.credential)
+        self.assertTrue(job.success)
+        self.assertEqual(job.result["presentation"], {"requested_proof": {}})
+        job.refresh_from_db(fields=("status",))
+        self.assertEqual(job.status, VerificationJob.STATUS_VERIFIED)
+        agent_admin.get.assert_called_with("/present-proof/records/{}", "pres-1")
+
+    def test_verify_timeout(self, mock_client, _mock_connection):
+        job = VerificationJob.objects.create(
+            credential=self.credential,
+            credential_timestamp=self.credential.update_timestamp,
+            presentation_exchange_id="pres-1",
+        )
+        VerificationJob.objects.filter(id=job.id).update(
+            create_timestamp=timezone.now() - timedelta(hours=1)
+        )
+        url = "/api/v2/credential/{}/verify/{}".format(self.credential.id, job.id)
+        result = self.client.get(url).json()
+        self.assertFalse(result["pending"])
+        self.assertFalse(result["success"])
+        self.assertEqual(result["result"], "Presentation request timed out.")
+
+    def test_complete(self, _mock_client, _mock_connection):
+        job = VerificationJob.objects.create(
+            credential=self.credential,
+            credential_timestamp=self.credential.update_timestamp,
+            presentation_exchange_id="pres-1",
+        )
+        with patch.object(VerificationJob, "save", autospec=True):
+            completed = verification.complete_verification(
+                {
+                    "presentation_exchange_id": "pres-1",
+                    "state": "verified",
+                    "verified": "true",
+                    "presentation_request": {"name": "self-verify"},
+                    "presentation": {"requested_proof": {}},
+                }
+            )
+        self.assertEqual(completed.id, job.id)
+        self.assertTrue(completed.success)
+        self.assertEqual(completed.result["presentation"], {"requested_proof": {}})
+        self.assertIsNone(
+            verification.complete_verification({"presentation_exchange_id": "other"})
+        )
+
+    def test_complete_not_verified(self, _mock_client, _mock_connection):
+        for verified in (None, "false", "unknown"):
+            VerificationJob.objects.create(
+                credential=self.credential,
+                credential_timestamp=self.credential.update_timestamp,
+                presentation_exchange_id="pres-" + str(verified),
+            )
+            message = {"presentation_exchange_id": "pres-" + str(verified)}
+            if verified:
+                message["verified"] = verified
+            completed = verification.complete_verification(message)
+            self.assertFalse(completed.success)
+            self.assertEqual(completed.status, VerificationJob.STATUS_FAILED)
@@ -1,7 +1,10 @@
 from unittest.mock import patch
 
 from django.http import HttpRequest, JsonResponse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.v2.models.User import User
 
 from api.v2.views import misc
 
@@ -102,3 +105,53 @@ class Misc_Quickload_TestCase(TestCase):
             ).content,
             "The JsonResponse should match.",
         )
+
+
+@override_settings(SOLR_CHECK_REQUEST_LIMIT=100)
+@patch("api.v2.views.misc.IndexChecker", autospec=True)
+class Misc_CheckSearchIndex_TestCase(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create(
+            username="admin", DID="not:a:did:1", is_staff=True
+        )
+
+    def _post(self, data, user=None):
+        request = self.factory.post("/search/index/check", data, format="json")
+        force_authenticate(request, user=user or self.user)
+        return misc.check_search_index(request)
+
+    def test_check_range(self, mock_checker):
+        checker = mock_checker.return_value
+        checker.id_range.return_value = (1, 250)
+        checker.check.return_value = {"checked": 100}
+        response = self._post({"start_id": 1})
+        self.assertEqual(response.status_code, 200)
+        checker.check.assert_called_once_with(1, 100, None)
+        self.assertEqual(
+            response.content,
+            JsonResponse(
+                {
+                    "counts": {"checked": 100},
+                    "start_id": 1,
+                    "end_id": 100,
+                    "next_start_id": 101,
+                    "repaired": False,
+                }
+            ).content,
+        )
+
+    @patch("api.v2.views.misc.TxnAwareSearchIndex")
+    def test_repair(self, mock_index, mock_checker):
+        checker = mock_checker.return_value
+        checker.id_range.return_value = (1, 250)
+        checker.check.return_value = {}
+        response = self._post({"start_id": 201, "repair": True})
+        checker.check.assert_called_once_with(201, 250, mock_index._backend_queue)
+        self.assertEqual(response.status_code, 200)
+
+    def test_requires_admin(self, mock_checker):
+        user = User.objects.create(username="user", DID="not:a:did:2")
+        response = self._post({}, user=user)
+        self.assertEqual(response.status_code, 403)
+        mock_checker.return_value.check.assert_not_called()
@@ -49,6 +49,7 @@ router.register(
 miscPatterns = [
     path("feedback", misc.send_feedback), 
     path("quickload", misc.quickload),
+    path("search/index/check", misc.check_search_index),
     path("status/reset", clear_stats),
     path("status", get_stats),
 ]
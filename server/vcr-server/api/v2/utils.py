@@ -136,6 +136,15 @@ def clear_stats(request, *args, **kwargs):
 @permission_classes((permissions.AllowAny,))
 def get_stats(request, *args, **kwargs):
     global timings
+    from api.v2.search.index import TxnAwareSearchIndex
+
+    queue_stats = {}
+    solr_queue = TxnAwareSearchIndex._backend_queue
+    if solr_queue is not None:
+        try:
+            queue_stats["solr_queue"] = solr_queue.stats()
+        except Exception:
+            LOGGER.exception("Error fetching Solr queue stats")
     timing_lock.acquire()
     try:
         hook_worker_stats = {}
@@ -150,7 +159,7 @@ def get_stats(request, *args, **kwargs):
                     "retry_count": item.retry_count,
                     "retry_fail_count": item.retry_fail_count
                 }
-        return JsonResponse({**timings, **hook_worker_stats})
+        return JsonResponse({**timings, **hook_worker_stats, **queue_stats})
     finally:
         timing_lock.release()
 
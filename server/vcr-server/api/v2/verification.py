@@ -0,0 +1,173 @@
+"""
+Asynchronous self-verification of credentials
+
+A verification job sends a proof request for the credential to the agent's
+connection to itself. The job is completed by the present_proof webhook
+when the agent has verified the presentation.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.v2.models.Credential import Credential
+from api.v2.models.VerificationJob import VerificationJob
+from vcr_server.utils.agent_admin import agent_admin_client
+
+LOGGER = logging.getLogger(__name__)
+
+_self_connection_id = None
+_self_connection_lock = threading.Lock()
+
+
+def get_self_connection_id() -> str:
+    """
+    Fetch the id of the agent's connection to itself, cached for the process
+    """
+    global _self_connection_id
+    if _self_connection_id is None:
+        with _self_connection_lock:
+            if _self_connection_id is None:
+                response = agent_admin_client().get(
+                    "/connections",
+                    params={"alias": settings.AGENT_SELF_CONNECTION_ALIAS},
+                )
+                response.raise_for_status()
+                results = response.json()["results"]
+                if not results:
+                    raise Exception("Agent self connection not found")
+                _self_connection_id = results[0]["connection_id"]
+    return _self_connection_id
+
+
+def build_proof_request(credential: Credential, agent_credential: dict) -> dict:
+    """
+    Build a proof request for the credential's claims, restricted to the
+    values of the tagged attributes
+    """
+    restrictions = [{}]
+    for attr in credential.credential_type.get_tagged_attributes():
+        claim_val = agent_credential["attrs"][attr]
+        restrictions[0][f"attr::{attr}::value"] = claim_val
+
+    return {
+        "version": "1.0",
+        "name": "self-verify",
+        "requested_predicates": {},
+        "requested_attributes": {
+            "self-verify-proof": {
+                "names": [attr for attr in agent_credential["attrs"]],
+                "restrictions": restrictions,
+            }
+        },
+    }
+
+
+def expire_job(job: VerificationJob) -> VerificationJob:
+    """
+    Fail a pending job which has not been completed within the timeout
+    """
+    timeout = timedelta(seconds=settings.CREDENTIAL_VERIFY_TIMEOUT)
+    if (
+        job.status == VerificationJob.STATUS_PENDING
+        and job.create_timestamp < timezone.now() - timeout
+    ):
+        job.status = VerificationJob.STATUS_FAILED
+        job.error = "Presentation request timed out."
+        job.save(update_fields=("status", "error", "update_timestamp"))
+    return job
+
+
+def find_verification(credential: Credential) -> VerificationJob:
+    """
+    Find a verified or pending job for the current version of a credential
+    """
+    jobs = VerificationJob.objects.filter(
+        credential=credential,
+        credential_timestamp=credential.update_timestamp,
+        status__in=(VerificationJob.STATUS_VERIFIED, VerificationJob.STATUS_PENDING),
+    ).order_by("-id")
+    for job in jobs[:1]:
+        job = expire_job(job)
+        if job.status != VerificationJob.STATUS_FAILED:
+            return job
+    return None
+
+
+def start_verification(credential: Credential) -> VerificationJob:
+    """
+    Return the cached verification of a credential, or start a new job
+    """
+    job = find_verification(credential)
+    if job:
+        return job
+
+    job = VerificationJob.objects.create(
+        credential=credential, credential_timestamp=credential.update_timestamp
+    )
+    try:
+        agent_admin = agent_admin_client()
+        response = agent_admin.get("/credential/{}", credential.credential_id)
+        response.raise_for_status()
+        proof_request = build_proof_request(credential, response.json())
+
+        response = agent_admin.post(
+            "/present-proof/send-request",
+            json={
+                "connection_id": get_self_connection_id(),
+                "proof_request": proof_request,
+            },
+        )
+        response.raise_for_status()
+        job.presentation_exchange_id = response.json()["presentation_exchange_id"]
+        job.save(update_fields=("presentation_exchange_id", "update_timestamp"))
+    except Exception as e:
+        LOGGER.exception(
+            "Error requesting verification of credential %s", credential.id
+        )
+        job.status = VerificationJob.STATUS_FAILED
+        job.error = str(e)
+        job.save(update_fields=("status", "error", "update_timestamp"))
+        return job
+
+    # The presentation is sent over the agent's self connection, so the
+    # webhook may have arrived before the job had its exchange id
+    try:
+        response = agent_admin.get(
+            "/present-proof/records/{}", job.presentation_exchange_id
+        )
+        response.raise_for_status()
+        record = response.json()
+        if record.get("state") == "verified":
+            job = complete_verification(record) or job
+    except Exception:
+        LOGGER.exception(
+            "Error fetching presentation exchange %s", job.presentation_exchange_id
+        )
+    return job
+
+
+def complete_verification(message: dict) -> VerificationJob:
+    """
+    Complete a verification job from a present_proof webhook message, or
+    the presentation exchange record fetched from the agent
+    """
+    job = VerificationJob.objects.filter(
+        presentation_exchange_id=message["presentation_exchange_id"]
+    ).first()
+    if not job:
+        return None
+    if str(message.get("verified")).lower() == "true":
+        job.status = VerificationJob.STATUS_VERIFIED
+        job.result = {
+            "presentation_request": message.get("presentation_request"),
+            "presentation": message.get("presentation"),
+        }
+    else:
+        job.status = VerificationJob.STATUS_FAILED
+        job.error = "Presentation could not be verified."
+    job.save(update_fields=("status", "result", "error", "update_timestamp"))
+    return job
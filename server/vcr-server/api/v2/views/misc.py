@@ -20,7 +20,10 @@ from api.v2.models.Credential import Credential as CredentialModel
 from api.v2.models.CredentialType import CredentialType
 from api.v2.models.Issuer import Issuer
 from api.v2.models.Topic import Topic
+from api.v2.search.index import TxnAwareSearchIndex
+from api.v2.search_indexes import CredentialIndex
 from api.v2.utils import model_counts, record_count, solr_counts
+from vcr_server.utils.index_check import IndexChecker
 
 LOGGER = logging.getLogger(__name__)
 
@@ -99,3 +102,68 @@ def send_feedback(request, *args, **kwargs):
     comments = request.POST.get("comments")
     email_feedback(ip_addr, from_name, from_email, reason, comments)
     return JsonResponse({"status": "ok"})
+
+
+@swagger_auto_schema(
+    method="post",
+    manual_parameters=[
+        openapi.Parameter(
+            "start_id",
+            openapi.IN_FORM,
+            description="First credential id to check",
+            type=openapi.TYPE_INTEGER,
+        ),
+        openapi.Parameter(
+            "end_id",
+            openapi.IN_FORM,
+            description="Last credential id to check",
+            type=openapi.TYPE_INTEGER,
+        ),
+        openapi.Parameter(
+            "repair",
+            openapi.IN_FORM,
+            description="Queue updates for the missing or stale documents",
+            type=openapi.TYPE_BOOLEAN,
+        ),
+    ],
+)
+@api_view(["POST"])
+@permission_classes((permissions.IsAdminUser,))
+def check_search_index(request, *args, **kwargs):
+    """
+    Compare a range of credential ids with the search index
+
+    At most `SOLR_CHECK_REQUEST_LIMIT` ids are checked per request; the
+    response includes the id to continue from.
+    """
+    try:
+        start_id = request.data.get("start_id")
+        start_id = int(start_id) if start_id not in (None, "") else None
+        end_id = request.data.get("end_id")
+        end_id = int(end_id) if end_id not in (None, "") else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid id range"}, status=400)
+    repair = str(request.data.get("repair", "")).lower() in ("1", "true")
+    queue = TxnAwareSearchIndex._backend_queue
+    if repair and queue is None:
+        return JsonResponse({"error": "Search indexing is not enabled"}, status=503)
+
+    index = CredentialIndex()
+    checker = IndexChecker(index, index.get_backend())
+    min_id, max_id = checker.id_range()
+    if min_id is None:
+        return JsonResponse({"counts": {}, "next_start_id": None})
+    if start_id is None:
+        start_id = min_id
+    limit_id = start_id + settings.SOLR_CHECK_REQUEST_LIMIT - 1
+    end_id = min(limit_id if end_id is None else end_id, limit_id, max_id)
+    counts = checker.check(start_id, end_id, queue if repair else None)
+    return JsonResponse(
+        {
+            "counts": counts,
+            "start_id": start_id,
+            "end_id": end_id,
+            "next_start_id": end_id + 1 if end_id < max_id else None,
+            "repaired": repair,
+        }
+    )
@@ -1,15 +1,14 @@
 import base64
 import uuid
 from logging import getLogger
-from time import sleep
 
-import requests
 from django.conf import settings
 from django.db.models import Q
 from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as filters
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
@@ -21,6 +20,7 @@ from api.v2.models.Issuer import Issuer
 from api.v2.models.Schema import Schema
 from api.v2.models.Topic import Topic
 from api.v2.models.TopicRelationship import TopicRelationship
+from api.v2.models.VerificationJob import VerificationJob
 from api.v2.serializers.rest import (
     CredentialSerializer,
     CredentialTypeSerializer,
@@ -32,6 +32,7 @@ from api.v2.serializers.rest import (
     TopicSerializer,
 )
 from api.v2.serializers.search import CustomTopicSerializer
+from api.v2.verification import expire_job, start_verification
 
 logger = getLogger(__name__)
 
@@ -200,87 +201,32 @@ class CredentialViewSet(ReadOnlyModelViewSet):
         serializer = ExpandedCredentialSerializer(item)
         return Response(serializer.data)
 
-    @action(detail=True, url_path="verify", methods=["get"])
+    @action(
+        detail=True,
+        url_path="verify",
+        methods=["get", "post"],
+        permission_classes=(permissions.AllowAny,),
+    )
     def verify(self, request, pk=None):
-        item: Credential = self.get_object()
-        credential_type: CredentialType = item.credential_type
-
-        connection_response = requests.get(
-            f"{settings.AGENT_ADMIN_URL}/connections?alias={settings.AGENT_SELF_CONNECTION_ALIAS}",
-            headers=settings.ADMIN_REQUEST_HEADERS,
-        )
-        connection_response_dict = connection_response.json()
-        assert connection_response_dict["results"]
+        """
+        Start a self-verification of the credential, returning the job status
 
-        self_connection = connection_response_dict["results"][0]
-
-        response = requests.get(
-            f"{settings.AGENT_ADMIN_URL}/credential/{item.credential_id}",
-            headers=settings.ADMIN_REQUEST_HEADERS,
+        A verified result is reused until the credential is updated.
+        """
+        item: Credential = self.get_object()
+        job = start_verification(item)
+        return JsonResponse(
+            job.serialize(),
+            status=202 if job.status == VerificationJob.STATUS_PENDING else 200,
         )
-        credential = response.json()
 
-        proof_request = {
-            "version": "1.0",
-            "name": "self-verify",
-            "requested_predicates": {},
-            "requested_attributes": {},
-        }
-        request_body = {
-            "connection_id": self_connection["connection_id"],
-            "proof_request": proof_request,
-        }
-        restrictions = [{}]
-
-        for attr in credential_type.get_tagged_attributes():
-            claim_val = credential["attrs"][attr]
-            restrictions[0][f"attr::{attr}::value"] = claim_val
-
-        requested_attribute = {
-            "names": [attr for attr in credential["attrs"]],
-            "restrictions": restrictions,
-        }
-        proof_request["requested_attributes"]['self-verify-proof'] = requested_attribute
-
-        proof_request_response = requests.post(
-            f"{settings.AGENT_ADMIN_URL}/present-proof/send-request",
-            json=request_body,
-            headers=settings.ADMIN_REQUEST_HEADERS,
-        )
-        proof_request_response.raise_for_status()
-        proof_request_response = proof_request_response.json()
-        presentation_exchange_id = proof_request_response["presentation_exchange_id"]
-
-        # TODO: if the agent was not started with the --auto-verify-presentation flag, verification will need to be initiated
-        retries = 7
-        result = None
-        delay = 0.5
-        while retries > 0:
-            sleep(delay)
-            retries -= 1
-            delay = delay * 2
-            presentation_state_response = requests.get(
-                f"{settings.AGENT_ADMIN_URL}/present-proof/records/{presentation_exchange_id}",
-                headers=settings.ADMIN_REQUEST_HEADERS,
-            )
-            presentation_state = presentation_state_response.json()
-
-            if presentation_state["state"] == "verified":
-                result = {
-                    "success": True,
-                    "result": {
-                        "presentation_request": presentation_state[
-                            "presentation_request"
-                        ],
-                        "presentation": presentation_state["presentation"],
-                    },
-                }
-                break
-
-        if result is None:
-            result = {"success": False, "results": "Presentation request timed out."}
-
-        return JsonResponse(result)
+    @action(
+        detail=True, url_path=r"verify/(?P<job_id>\d+)", methods=["get"],
+    )
+    def verify_status(self, request, pk=None, job_id=None):
+        item: Credential = self.get_object()
+        job = get_object_or_404(VerificationJob, id=job_id, credential=item)
+        return JsonResponse(expire_job(job).serialize())
 
     @action(detail=True, url_path="latest", methods=["get"])
     def get_latest(self, request, pk=None):
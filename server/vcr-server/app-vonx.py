@@ -6,7 +6,6 @@ import os
 
 import django
 from django.conf import settings
-import requests
 from aiohttp import web
 
 from vcr_server.utils.boot import init_app, run_django, run_migration, run_reindex
@@ -35,25 +34,23 @@ if __name__ == "__main__":
             run_django(run_reindex)
 
     # Make agent connection to self to send self presentation requests later
-    response = requests.get(
-        f"{settings.AGENT_ADMIN_URL}/connections"
-        + f"?alias={settings.AGENT_SELF_CONNECTION_ALIAS}",
-        headers=settings.ADMIN_REQUEST_HEADERS,
+    from vcr_server.utils.agent_admin import agent_admin_client
+
+    agent_admin = agent_admin_client()
+    response = agent_admin.get(
+        "/connections", params={"alias": settings.AGENT_SELF_CONNECTION_ALIAS}
     )
     connections = response.json()
 
     # We only need to form a self connection once
     if not connections["results"]:
-        response = requests.post(
-            f"{settings.AGENT_ADMIN_URL}/connections/create-invitation"
-            + f"?alias={settings.AGENT_SELF_CONNECTION_ALIAS}",
-            headers=settings.ADMIN_REQUEST_HEADERS,
+        response = agent_admin.post(
+            "/connections/create-invitation",
+            params={"alias": settings.AGENT_SELF_CONNECTION_ALIAS},
         )
         response_body = response.json()
-        requests.post(
-            f"{settings.AGENT_ADMIN_URL}/connections/receive-invitation",
-            json=response_body["invitation"],
-            headers=settings.ADMIN_REQUEST_HEADERS,
+        agent_admin.post(
+            "/connections/receive-invitation", json=response_body["invitation"]
         )
 
     args = parser.parse_args()
@@ -10,27 +10,32 @@ usage() {
   Rebuilds the Haystack indexes for the project.
   ----------------------------------------------------------------------------------------
   Usage:
-    ${0} [ -h -x -s <SolrUrl/> -b <BatchSize/> ]
+    ${0} [ -h -x -g -s <SolrUrl/> -b <BatchSize/> ]
   
   Options:
     -h Prints the usage for the script
     -x Enable debug output
+    -g Rebuild into a shadow core and swap it with the live core once complete,
+       so that search remains available during the rebuild
     -s The URL to the Solr search engine instance
     -b The batch size to use when performing the indexing.  Defaults to ${SOLR_BATCH_SIZE}.
   
   Example:
     ${0} -s http://localhost:8983/solr/the_org_book  
+    ${0} -g -b 200
   ========================================================================================
 EOF
 exit
 }
 
-while getopts s:b:xh FLAG; do
+while getopts s:b:gxh FLAG; do
   case $FLAG in
     s ) export SOLR_URL=$OPTARG
       ;;
     b ) SOLR_BATCH_SIZE=$OPTARG
       ;;
+    g ) SHADOW_REBUILD=1
+      ;;
     x ) export DEBUG=1
       ;;
     h ) usage
@@ -45,4 +50,8 @@ done
 shift $((OPTIND-1))
 # ==============================================================================================================================
 
-${MANAGE_CMD} rebuild_index --noinput --batch-size=$SOLR_BATCH_SIZE
+if [ -z "${SHADOW_REBUILD}" ]; then
+  ${MANAGE_CMD} rebuild_index --noinput --batch-size=$SOLR_BATCH_SIZE
+else
+  ${MANAGE_CMD} shadow_rebuild_index --batch-size=$SOLR_BATCH_SIZE
+fi
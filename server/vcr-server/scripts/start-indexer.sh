@@ -0,0 +1,6 @@
+#!/bin/bash
+
+# Start the vcr-api as a search indexer node, processing the Solr queue.
+# Run the web nodes with SOLR_QUEUE_WORKER=false to leave indexing to these nodes.
+echo "Starting an instance of the vcr-api as a search indexer node ..."
+python manage.py run_indexer
@@ -11,6 +11,8 @@
 """
 import os
 
+from vcr_server.utils.solr_session import SolrSession
+
 engines = {
     "direct": "haystack.backends.simple_backend.SimpleEngine",
     "solr": "haystack.backends.solr_backend.SolrEngine",
@@ -40,6 +42,12 @@ def getConfig():
     if solrUrl:
         engine = engines.get(os.getenv("SOLR_ENGINE"), engines["solr"])
         config = {"ENGINE": engine, "URL": solrUrl}
+        if engine == engines["solr"]:
+            session = SolrSession(
+                pool_size=int(os.getenv("SOLR_POOL_SIZE", "10")),
+                compress=os.getenv("SOLR_GZIP_UPDATES", "false").lower() == "true",
+            )
+            config["KWARGS"] = {"session": session}
 
     return config
 
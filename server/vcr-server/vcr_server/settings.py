@@ -90,6 +90,46 @@ else:
 HAYSTACK_DOCUMENT_FIELD = "document"
 HAYSTACK_MAX_RESULTS = 200
 
+# Store pending search index updates in the solr_queue table, in the same
+# transaction as the indexed rows, so they survive a restart
+SOLR_QUEUE_DURABLE = parse_bool(os.getenv("SOLR_QUEUE_DURABLE", "True"))
+# maximum number of ids in one index update
+SOLR_QUEUE_BATCH_SIZE = int(os.getenv("SOLR_QUEUE_BATCH_SIZE", "500"))
+# maximum number of batches held by the in-memory queue, and what to do when
+# it is full: "block" (for up to SOLR_QUEUE_BLOCK_TIMEOUT seconds) or "shed"
+SOLR_QUEUE_MAX_SIZE = int(os.getenv("SOLR_QUEUE_MAX_SIZE", "10000"))
+SOLR_QUEUE_FULL_POLICY = os.getenv("SOLR_QUEUE_FULL_POLICY", "block")
+SOLR_QUEUE_BLOCK_TIMEOUT = float(os.getenv("SOLR_QUEUE_BLOCK_TIMEOUT", "30"))
+# failed updates are retried with exponential backoff (in seconds); an id
+# which fails on its own this many times is moved to the dead-letter list,
+# while updates failing because Solr is unavailable are retried until it is back
+SOLR_QUEUE_MAX_ATTEMPTS = int(os.getenv("SOLR_QUEUE_MAX_ATTEMPTS", "8"))
+SOLR_QUEUE_RETRY_BACKOFF = float(os.getenv("SOLR_QUEUE_RETRY_BACKOFF", "2"))
+SOLR_QUEUE_MAX_RETRY_DELAY = float(os.getenv("SOLR_QUEUE_MAX_RETRY_DELAY", "300"))
+# seconds between checks of the queue when not triggered by a local update
+SOLR_QUEUE_POLL_INTERVAL = float(os.getenv("SOLR_QUEUE_POLL_INTERVAL", "5"))
+# threads building search documents while the previous chunk of an index
+# update is posted to Solr, and the number of documents per post
+SOLR_INDEX_WORKERS = int(os.getenv("SOLR_INDEX_WORKERS", "2"))
+SOLR_INDEX_CHUNK_SIZE = int(os.getenv("SOLR_INDEX_CHUNK_SIZE", "100"))
+# Process the Solr queue in the web process; disable when indexing is
+# handled by `manage.py run_indexer`
+SOLR_QUEUE_WORKER = parse_bool(os.getenv("SOLR_QUEUE_WORKER", "True"))
+# Reindex only the rows updated since the stored watermark on startup, less
+# a margin (in seconds) for transactions which were still open at the time;
+# the whole index is rebuilt on startup only when requested
+SOLR_INDEX_WATERMARK_MARGIN = float(os.getenv("SOLR_INDEX_WATERMARK_MARGIN", "300"))
+SOLR_REBUILD_INDEX_ON_STARTUP = parse_bool(
+    os.getenv("SOLR_REBUILD_INDEX_ON_STARTUP", "False")
+)
+# Solr config set for the shadow core built by `manage.py shadow_rebuild_index`,
+# by default the shadow core uses the configuration of the live core
+SOLR_SHADOW_CONFIG_SET = os.getenv("SOLR_SHADOW_CONFIG_SET")
+# ids compared with the search index per query by the consistency check, and
+# the most ids checked by one request to the index/check endpoint
+SOLR_CHECK_CHUNK_SIZE = int(os.getenv("SOLR_CHECK_CHUNK_SIZE", "1000"))
+SOLR_CHECK_REQUEST_LIMIT = int(os.getenv("SOLR_CHECK_REQUEST_LIMIT", "100000"))
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -134,6 +174,16 @@ DATABASES = {"default": database.config()}
 
 OPTIMIZE_TABLE_ROW_COUNTS = parse_bool(os.getenv("OPTIMIZE_TABLE_ROW_COUNTS", "True"))
 
+# How often (in seconds) process-wide caches check for invalidation by other workers
+CACHE_GENERATION_CHECK_INTERVAL = float(
+    os.getenv("CACHE_GENERATION_CHECK_INTERVAL", "5")
+)
+
+# How often (in seconds) buffered credential type last issue dates are written
+LAST_ISSUE_DATE_FLUSH_INTERVAL = float(
+    os.getenv("LAST_ISSUE_DATE_FLUSH_INTERVAL", "5")
+)
+
 CONN_MAX_AGE = CREDS_BATCH_SIZE = int(os.getenv('CONN_MAX_AGE', '0'))
 if CONN_MAX_AGE < 0:
     CONN_MAX_AGE = None
@@ -361,6 +411,8 @@ HOOK_MAX_SUBSCRIPTION_ERRORS = os.environ.get("HOOK_MAX_SUBSCRIPTION_ERRORS", 10
 
 # This string is used to alias the agent's self connection for verification
 AGENT_SELF_CONNECTION_ALIAS = "credential-registry-self"
+# Seconds to wait for the agent to complete a credential self-verification
+CREDENTIAL_VERIFY_TIMEOUT = int(os.getenv("CREDENTIAL_VERIFY_TIMEOUT", "60"))
 
 AGENT_ADMIN_URL = os.environ.get("AGENT_ADMIN_URL")
 AGENT_ADMIN_API_KEY = os.environ.get("AGENT_ADMIN_API_KEY")
@@ -369,6 +421,31 @@ ADMIN_REQUEST_HEADERS = {}
 if AGENT_ADMIN_API_KEY is not None:
     ADMIN_REQUEST_HEADERS = {"x-api-key": AGENT_ADMIN_API_KEY}
 
+# Agent admin API client: timeouts (in seconds), retries of idempotent
+# requests and the size of the connection pool
+AGENT_ADMIN_CONNECT_TIMEOUT = float(os.getenv("AGENT_ADMIN_CONNECT_TIMEOUT", "5"))
+AGENT_ADMIN_TIMEOUT = float(os.getenv("AGENT_ADMIN_TIMEOUT", "30"))
+AGENT_ADMIN_RETRIES = int(os.getenv("AGENT_ADMIN_RETRIES", "3"))
+AGENT_ADMIN_RETRY_BACKOFF = float(os.getenv("AGENT_ADMIN_RETRY_BACKOFF", "0.5"))
+AGENT_ADMIN_POOL_SIZE = int(os.getenv("AGENT_ADMIN_POOL_SIZE", "20"))
+
+# Acknowledge credential webhooks immediately and store the credentials
+# using a pool of ingest workers
+ASYNC_CREDENTIAL_INGEST = parse_bool(os.getenv("ASYNC_CREDENTIAL_INGEST", "False"))
+# number of ingest lanes: credentials for the same topic are always
+# processed in order by the same lane
+CREDENTIAL_INGEST_WORKERS = int(os.getenv("CREDENTIAL_INGEST_WORKERS", "2"))
+CREDENTIAL_INGEST_BATCH_SIZE = int(os.getenv("CREDENTIAL_INGEST_BATCH_SIZE", "50"))
+# seconds between checks of the queue when not triggered by a webhook
+CREDENTIAL_INGEST_POLL_INTERVAL = float(
+    os.getenv("CREDENTIAL_INGEST_POLL_INTERVAL", "5")
+)
+# seconds before an abandoned message or failed agent notification is retried
+CREDENTIAL_INGEST_RETRY_DELAY = int(os.getenv("CREDENTIAL_INGEST_RETRY_DELAY", "300"))
+CREDENTIAL_INGEST_MAX_ATTEMPTS = int(os.getenv("CREDENTIAL_INGEST_MAX_ATTEMPTS", "5"))
+# retries (with jitter) of a credential transaction aborted by a deadlock
+INGEST_DEADLOCK_RETRIES = int(os.getenv("INGEST_DEADLOCK_RETRIES", "3"))
+INGEST_DEADLOCK_RETRY_DELAY = float(os.getenv("INGEST_DEADLOCK_RETRY_DELAY", "0.1"))
 
 # API routing middleware settings
 HTTP_HEADER_ROUTING_MIDDLEWARE_URL_FILTER = "/api"
@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from api.v2.utils import log_timing_method
+
+LOGGER = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+RETRY_STATUS_CODES = frozenset((502, 503, 504))
+
+
+class AgentAdminClient:
+    """
+    HTTP client for the agent admin API.
+
+    Requests share a session with a keep-alive connection pool and are bounded
+    by a timeout. Idempotent requests are retried with exponential backoff on
+    connection errors and gateway errors. Call timings are recorded per
+    endpoint in the /status stats, using the path template as the name.
+    """
+
+    def __init__(
+        self,
+        base_url: str = None,
+        headers: dict = None,
+        timeout: float = None,
+        connect_timeout: float = None,
+        retries: int = None,
+        retry_backoff: float = None,
+        pool_size: int = None,
+    ):
+        self.base_url = (base_url or settings.AGENT_ADMIN_URL or "").rstrip("/")
+        self.timeout = (
+            connect_timeout or settings.AGENT_ADMIN_CONNECT_TIMEOUT,
+            timeout or settings.AGENT_ADMIN_TIMEOUT,
+        )
+        self.retries = settings.AGENT_ADMIN_RETRIES if retries is None else retries
+        self.retry_backoff = (
+            settings.AGENT_ADMIN_RETRY_BACKOFF
+            if retry_backoff is None
+            else retry_backoff
+        )
+        pool_size = pool_size or settings.AGENT_ADMIN_POOL_SIZE
+        self.session = requests.Session()
+        self.session.headers.update(
+            settings.ADMIN_REQUEST_HEADERS if headers is None else headers
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, path: str, *path_args, **kwargs):
+        """
+        Send a request to the agent admin API
+
+        Args:
+            method: the HTTP method
+            path: the path template, formatted with `path_args`
+            kwargs: additional arguments for `requests.Session.request`
+
+        Returns:
+            requests.Response -- the response from the agent
+        """
+        method = method.upper()
+        url = self.base_url + path.format(*path_args)
+        kwargs.setdefault("timeout", self.timeout)
+        metric = "agent_admin.{} {}".format(method, path.split("?", 1)[0])
+        retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            start_time = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                log_timing_method(metric, start_time, time.perf_counter(), False)
+                if attempt >= retries:
+                    raise
+                LOGGER.warning("Agent admin request failed: %s %s: %s", method, url, e)
+            else:
+                success = response.status_code < 500
+                log_timing_method(metric, start_time, time.perf_counter(), success)
+                if attempt >= retries or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                LOGGER.warning(
+                    "Agent admin request failed: %s %s: status %d",
+                    method,
+                    url,
+                    response.status_code,
+                )
+            time.sleep(self.retry_backoff * 2 ** attempt)
+            attempt += 1
+
+    def get(self, path: str, *path_args, **kwargs):
+        return self.request("GET", path, *path_args, **kwargs)
+
+    def post(self, path: str, *path_args, **kwargs):
+        return self.request("POST", path, *path_args, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def agent_admin_client() -> AgentAdminClient:
+    """
+    Fetch the shared agent admin client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AgentAdminClient()
+    return _client
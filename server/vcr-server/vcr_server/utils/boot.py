@@ -44,12 +44,20 @@ def run_django(proc, *args) -> asyncio.Future:
 
 
 def run_reindex():
+    """
+    Index the rows updated since the last run, or rebuild the indexes when
+    SOLR_REBUILD_INDEX_ON_STARTUP is set
+    """
+    from django.conf import settings
     from django.core.management import call_command
 
-    batch_size = os.getenv("SOLR_BATCH_SIZE", 500)
-    call_command(
-        "update_index", "--max-retries=5", "--batch-size={}".format(batch_size)
-    )
+    args = ["--max-retries=5"]
+    if settings.SOLR_REBUILD_INDEX_ON_STARTUP:
+        args.append("--full")
+    batch_size = os.getenv("SOLR_BATCH_SIZE")
+    if batch_size:
+        args.append("--batch-size={}".format(batch_size))
+    call_command("incremental_update_index", *args)
 
 
 def run_migration():
@@ -67,6 +75,8 @@ async def add_server_headers(request, response):
 async def init_app(on_startup=None, on_cleanup=None):
     from aiohttp.web import Application
     from aiohttp_wsgi import WSGIHandler
+    from django.conf import settings
+    from agent_webhooks.utils.ingest import IngestQueue
     from vcr_server.utils.solrqueue import SolrQueue
 
     wsgi_handler = WSGIHandler(application)
@@ -75,7 +85,14 @@ async def init_app(on_startup=None, on_cleanup=None):
     app.router.add_route("*", "/{path_info:.*}", wsgi_handler)
 
     solrqueue = SolrQueue()
-    solrqueue.setup(app=app)
+    # the in-memory queue can only be processed by the web process
+    solrqueue.setup(
+        app=app, start=settings.SOLR_QUEUE_WORKER or not settings.SOLR_QUEUE_DURABLE
+    )
+
+    if settings.ASYNC_CREDENTIAL_INGEST:
+        ingestqueue = IngestQueue()
+        ingestqueue.setup(app=app)
 
     if on_startup:
         app.on_startup.append(on_startup)
@@ -0,0 +1,163 @@
+import logging
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_datetime
+from haystack.utils import get_model_ct
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _truncate_ms(value):
+    # Solr stores dates with millisecond precision
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+class IndexChecker:
+    """
+    Consistency check between the database and the search index.
+
+    The rows are compared in chunks of consecutive ids: each chunk fetches
+    the ids and update timestamps from the database, and the `django_id` and
+    `update_timestamp` fields of the same range of ids from Solr. Rows which
+    are missing from the index or were updated after they were indexed are
+    queued for an update, and documents without a row are queued for
+    removal, so repairing the index costs in proportion to the differences.
+    """
+
+    def __init__(self, index, backend, using: str = "default", chunk_size=None):
+        self.index = index
+        self.backend = backend
+        self.using = using
+        self.chunk_size = chunk_size or settings.SOLR_CHECK_CHUNK_SIZE
+        self.model_ct = get_model_ct(index.get_model())
+        self.updated_field = index.get_updated_field()
+
+    def rows(self):
+        return (
+            self.index.index_queryset(self.using)
+            .select_related(None)
+            .prefetch_related(None)
+        )
+
+    def id_range(self) -> tuple:
+        """
+        The lowest and highest ids of the indexed rows
+        """
+        bounds = self.rows().aggregate(min_id=Min("id"), max_id=Max("id"))
+        return bounds["min_id"], bounds["max_id"]
+
+    def check_chunk(self, start_id: int, end_id: int) -> dict:
+        """
+        Compare the rows with ids from `start_id` to `end_id` (inclusive)
+        with the search index
+
+        Returns:
+            dict -- the `missing`, `stale` and `extra` ids
+        """
+        rows = dict(
+            self.rows()
+            .filter(id__gte=start_id, id__lte=end_id)
+            .values_list("id", self.updated_field)
+        )
+        results = self.backend.conn.search(
+            "*:*",
+            fq=[
+                "django_ct:{}".format(self.model_ct),
+                "{{!terms f=django_id}}{}".format(
+                    ",".join(str(obj_id) for obj_id in range(start_id, end_id + 1))
+                ),
+            ],
+            fl="django_id,{}".format(self.updated_field),
+            rows=end_id - start_id + 1,
+        )
+        indexed = {
+            int(doc["django_id"]): doc.get(self.updated_field) for doc in results.docs
+        }
+        missing = sorted(set(rows) - set(indexed))
+        extra = sorted(set(indexed) - set(rows))
+        stale = []
+        for obj_id, indexed_value in indexed.items():
+            updated = rows.get(obj_id)
+            if updated is None:
+                continue
+            indexed_at = parse_datetime(indexed_value) if indexed_value else None
+            if indexed_at is None or indexed_at < _truncate_ms(updated):
+                stale.append(obj_id)
+        return {"missing": missing, "stale": sorted(stale), "extra": extra}
+
+    def remove_extra(self) -> int:
+        """
+        Remove the documents of rows which no longer exist or are no longer
+        indexed, paging through every document of the index with a cursor,
+        including documents outside of the id range of the rows
+
+        Returns:
+            int -- the number of documents removed
+        """
+        removed = 0
+        cursor = "*"
+        while True:
+            results = self.backend.conn.search(
+                "*:*",
+                fq="django_ct:{}".format(self.model_ct),
+                fl="id,django_id",
+                sort="id asc",
+                rows=self.chunk_size,
+                cursorMark=cursor,
+            )
+            docs = {int(doc["django_id"]): doc["id"] for doc in results.docs}
+            rows = set(self.rows().filter(id__in=docs).values_list("id", flat=True))
+            extra = [doc_id for obj_id, doc_id in docs.items() if obj_id not in rows]
+            if extra:
+                self.backend.conn.delete(id=extra, commit=False)
+                removed += len(extra)
+            if not results.docs or results.nextCursorMark == cursor:
+                break
+            cursor = results.nextCursorMark
+        if removed:
+            self.backend.conn.commit()
+        LOGGER.info("Removed %s extra %s documents", removed, self.model_ct)
+        return removed
+
+    def check(self, start_id=None, end_id=None, queue=None, log=None) -> dict:
+        """
+        Compare a range of ids with the search index, chunk by chunk,
+        queueing the differences if a queue is given
+
+        Returns:
+            dict -- the number of ids checked, missing, stale and extra
+        """
+        min_id, max_id = self.id_range()
+        start_id = min_id if start_id is None else start_id
+        end_id = max_id if end_id is None else end_id
+        totals = {"checked": 0, "missing": 0, "stale": 0, "extra": 0}
+        if start_id is None or end_id is None:
+            return totals
+        index_cls = type(self.index)
+        for chunk_start in range(start_id, end_id + 1, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size - 1, end_id)
+            diff = self.check_chunk(chunk_start, chunk_end)
+            totals["checked"] += chunk_end - chunk_start + 1
+            for name in ("missing", "stale", "extra"):
+                totals[name] += len(diff[name])
+            if queue is not None:
+                update_ids = diff["missing"] + diff["stale"]
+                if update_ids:
+                    queue.requeue(index_cls, self.using, update_ids)
+                if diff["extra"]:
+                    queue.requeue(index_cls, self.using, diff["extra"], delete=True)
+            if log and (diff["missing"] or diff["stale"] or diff["extra"]):
+                log(
+                    "Ids {} to {}: {} missing, {} stale, {} extra".format(
+                        chunk_start,
+                        chunk_end,
+                        len(diff["missing"]),
+                        len(diff["stale"]),
+                        len(diff["extra"]),
+                    )
+                )
+        LOGGER.info(
+            "Checked search index for ids %s to %s: %s", start_id, end_id, totals
+        )
+        return totals
@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import django.db
+from django.conf import settings
+from haystack.exceptions import SkipDocument
+
+from api.v2.utils import log_timing_method
+
+LOGGER = logging.getLogger(__name__)
+
+
+class IndexPipeline:
+    """
+    Pipelined search index updates.
+
+    The ids are split into chunks. Each chunk is fetched with `index_queryset`
+    and its documents are prepared on a pool of worker threads, while the
+    calling thread posts the chunks which are ready to Solr in order. Up to
+    `workers + 1` chunks are in flight at once, so the throughput of an update
+    is limited by the slowest stage rather than the sum of the three.
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = None):
+        self.workers = workers or settings.SOLR_INDEX_WORKERS
+        self.chunk_size = chunk_size or settings.SOLR_INDEX_CHUNK_SIZE
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="solr-index"
+                )
+            return self._executor.submit(fn, *args)
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor:
+            executor.shutdown()
+
+    def prepare(self, index_cls, using, ids) -> list:
+        """
+        Fetch a chunk of rows and prepare their search documents
+        """
+        django.db.close_old_connections()
+        start_time = time.perf_counter()
+        # the index holds the prepared data, so it can't be shared between threads
+        index = index_cls()
+        docs = []
+        for obj in index.index_queryset(using).filter(id__in=ids):
+            try:
+                docs.append(index.full_prepare(obj))
+            except SkipDocument:
+                LOGGER.debug("Indexing for object `%s` skipped", obj)
+        log_timing_method("solr_index.prepare", start_time, time.perf_counter(), True)
+        return docs
+
+    def post(self, index, backend, docs):
+        start_time = time.perf_counter()
+        backend.conn.add(docs, commit=False, boost=index.get_field_weights())
+        log_timing_method("solr_index.post", start_time, time.perf_counter(), True)
+
+    def update(self, index, backend, using, ids):
+        """
+        Update the search index for the given ids, committing once all
+        documents have been posted
+        """
+        ids = sorted(ids)
+        chunks = iter(
+            [
+                ids[start : start + self.chunk_size]
+                for start in range(0, len(ids), self.chunk_size)
+            ]
+        )
+        index_cls = type(index)
+        futures = deque()
+        posted = False
+        try:
+            for chunk in chunks:
+                futures.append(self._submit(self.prepare, index_cls, using, chunk))
+                if len(futures) > self.workers:
+                    break
+            while futures:
+                docs = futures.popleft().result()
+                chunk = next(chunks, None)
+                if chunk:
+                    futures.append(self._submit(self.prepare, index_cls, using, chunk))
+                if docs:
+                    self.post(index, backend, docs)
+                    posted = True
+        finally:
+            for future in futures:
+                future.cancel()
+        if posted:
+            backend.conn.commit()
+
+    def update_rows(
+        self,
+        index,
+        backend,
+        using,
+        rows,
+        commit_size: int,
+        log=None,
+        max_retries: int = 0,
+    ) -> int:
+        """
+        Update the search index for all the rows of a queryset, fetching
+        and committing `commit_size` ids at a time
+
+        A chunk which fails is retried up to `max_retries` times, with an
+        exponential backoff, before the error is raised.
+
+        Returns:
+            int -- the number of rows indexed
+        """
+        ids = (
+            rows.select_related(None)
+            .prefetch_related(None)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        last_id = None
+        indexed = 0
+        while True:
+            chunk = ids if last_id is None else ids.filter(id__gt=last_id)
+            chunk = list(chunk[:commit_size])
+            if not chunk:
+                break
+            retries = 0
+            while True:
+                try:
+                    self.update_chunk(index, backend, using, chunk)
+                    break
+                except Exception:
+                    retries += 1
+                    if retries > max_retries:
+                        raise
+                    LOGGER.exception(
+                        "Error indexing rows %s to %s, retry %d of %d",
+                        chunk[0],
+                        chunk[-1],
+                        retries,
+                        max_retries,
+                    )
+                    time.sleep(2 ** retries)
+            last_id = chunk[-1]
+            indexed += len(chunk)
+            if log:
+                log("Indexed {} rows".format(indexed))
+        return indexed
+
+    def update_chunk(self, index, backend, using, ids):
+        if hasattr(backend, "conn"):
+            self.update(index, backend, using, ids)
+        else:
+            backend.update(index, index.index_queryset(using).filter(id__in=ids))
@@ -0,0 +1,62 @@
+import logging
+
+import requests
+from pysolr import SolrError
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SolrCoreAdmin:
+    """
+    Client for the Solr CoreAdmin API, used to manage the cores of a
+    standalone Solr server.
+    """
+
+    def __init__(self, base_url: str, session: requests.Session = None, timeout=60):
+        self.url = base_url.rstrip("/") + "/admin/cores"
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    @staticmethod
+    def split_url(core_url: str) -> tuple:
+        """
+        Split a core URL into the base URL of the server and the core name
+        """
+        base_url, _, name = core_url.rstrip("/").rpartition("/")
+        return base_url, name
+
+    def _admin(self, action: str, **params) -> dict:
+        params.update(action=action, wt="json")
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        if response.status_code != 200:
+            raise SolrError(
+                "Core admin {} failed: {} {}".format(
+                    action, response.status_code, response.text
+                )
+            )
+        return response.json()
+
+    def exists(self, name: str) -> bool:
+        return bool(self._admin("STATUS", core=name)["status"].get(name))
+
+    def instance_dir(self, name: str) -> str:
+        """
+        The instance directory of a core, on the Solr server
+        """
+        return self._admin("STATUS", core=name)["status"][name]["instanceDir"]
+
+    def create(self, name: str, config_set: str):
+        """
+        Create a core using the `conf` directory of a config set, which may be
+        given as the path of another core's instance directory
+        """
+        LOGGER.info("Creating Solr core %s from config set %s", name, config_set)
+        self._admin("CREATE", name=name, instanceDir=name, configSet=config_set)
+
+    def swap(self, name: str, other: str):
+        LOGGER.info("Swapping Solr cores %s and %s", name, other)
+        self._admin("SWAP", core=name, other=other)
+
+    def unload(self, name: str):
+        LOGGER.info("Unloading Solr core %s", name)
+        self._admin("UNLOAD", core=name, deleteIndex="true", deleteDataDir="true")
@@ -0,0 +1,37 @@
+import gzip
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SolrSession(requests.Session):
+    """
+    HTTP session for Solr requests, with a keep-alive connection pool.
+
+    When `compress` is set, update request bodies larger than `min_size` bytes
+    are sent gzip-compressed. Solr must be configured to inflate compressed
+    requests (the GzipHandler `inflateBufferSize` in Jetty).
+    """
+
+    def __init__(
+        self, pool_size: int = 10, compress: bool = False, min_size: int = 1024
+    ):
+        super().__init__()
+        self.stream = False
+        self.compress = compress
+        self.min_size = min_size
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        if (
+            self.compress
+            and method.upper() == "POST"
+            and isinstance(data, bytes)
+            and len(data) >= self.min_size
+        ):
+            data = gzip.compress(data, compresslevel=5)
+            headers = dict(headers or {})
+            headers["Content-Encoding"] = "gzip"
+        return super().request(method, url, data=data, headers=headers, **kwargs)
@@ -1,22 +1,118 @@
+import heapq
+import itertools
 import logging
+import re
 import threading
+import time
+from collections import deque
+from datetime import timedelta
 from queue import Empty, Full, Queue
 
+import django.db
+import pysolr
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
 from haystack.utils import get_identifier
 
+from api.v2.models.SolrQueueItem import SolrQueueItem
 from api.v2.search.index import TxnAwareSearchIndex
+from api.v2.utils import log_timing_method
+from vcr_server.utils.indexer import IndexPipeline
 
 LOGGER = logging.getLogger(__name__)
 
+# pysolr reports connection failures and gateway errors as a SolrError
+SOLR_UNAVAILABLE = re.compile(r"^(Failed to connect|Connection to server .* timed out|Solr responded with an error \(HTTP 50[234]\))")
+
+
+def backend_unavailable(error: Exception) -> bool:
+    """
+    Whether an index update failed because Solr or the database could not be
+    reached, rather than because of the updated objects
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, django.db.OperationalError, django.db.InterfaceError)):
+        return True
+    return isinstance(error, pysolr.SolrError) and bool(SOLR_UNAVAILABLE.match(str(error)))
+
 
 class SolrQueue:
-    def __init__(self):
+    """
+    Queue of search index updates, processed by a worker thread.
+
+    When durable (the default, see `SOLR_QUEUE_DURABLE`) the updates are
+    stored in the `solr_queue` table. `TxnAwareSearchIndex` then enqueues them
+    in the same transaction as the indexed rows, and the worker claims them
+    with SKIP LOCKED and deletes them in the transaction which updates the
+    index, so pending updates survive a restart and are eventually indexed
+    once by whichever queue claims them. Otherwise the updates are held in
+    memory and queued when the transaction commits. The in-memory queue is
+    bounded by `SOLR_QUEUE_MAX_SIZE`: when full, adding either blocks for up to
+    `SOLR_QUEUE_BLOCK_TIMEOUT` seconds or sheds the update, depending on
+    `SOLR_QUEUE_FULL_POLICY`.
+
+    Each index update covers at most `SOLR_QUEUE_BATCH_SIZE` ids. When an update
+    fails because Solr is unavailable, the whole batch is retried with
+    exponential backoff until Solr is back, without counting an attempt.
+    When it fails otherwise, its ids are retried one at a time, so that a
+    poison id does not hold back the others, and an id which still fails on
+    its own after `SOLR_QUEUE_MAX_ATTEMPTS` is moved to the dead-letter list.
+    Dead durable items are queued again by `requeue_dead`.
+
+    Updates which only change the `status_fields` of an index are sent to Solr
+    as atomic updates of those fields, without rebuilding the documents.
+    """
+
+    POLICY_BLOCK = "block"
+    POLICY_SHED = "shed"
+
+    # the `delete` flag of in-memory queue entries
+    UPDATE = 0
+    DELETE = 1
+    STATUS = 2
+    METRICS = {UPDATE: "solr_queue.update", DELETE: "solr_queue.remove", STATUS: "solr_queue.status"}
+
+    def __init__(
+        self, durable: bool = None, batch_size: int = None, poll_interval: float = None
+    ):
         LOGGER.info("Initializing Solr queue ...")
-        self._queue = Queue()
+        self._queue = Queue(settings.SOLR_QUEUE_MAX_SIZE)
+        self._full_policy = settings.SOLR_QUEUE_FULL_POLICY
+        self._block_timeout = settings.SOLR_QUEUE_BLOCK_TIMEOUT
+        self._max_attempts = settings.SOLR_QUEUE_MAX_ATTEMPTS
+        self._retry_backoff = settings.SOLR_QUEUE_RETRY_BACKOFF
+        self._max_retry_delay = settings.SOLR_QUEUE_MAX_RETRY_DELAY
+        # in-memory retries, as (due time, sequence, entry)
+        self._retries = []
+        self._retry_seq = itertools.count()
+        self._dead_letter = deque(maxlen=1000)
+        # consecutive updates which failed because the backend was unavailable
+        self._outages = 0
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "indexed": 0,
+            "failed": 0,
+            "shed": 0,
+            "dead_letter": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+        }
         self._prev_queue = None
         self._stop = threading.Event()
         self._thread = None
         self._trigger = threading.Event()
+        self._durable = settings.SOLR_QUEUE_DURABLE if durable is None else durable
+        self._batch_size = batch_size or settings.SOLR_QUEUE_BATCH_SIZE
+        self._poll_interval = poll_interval or settings.SOLR_QUEUE_POLL_INTERVAL
+        self._pipeline = IndexPipeline()
+
+    @property
+    def transactional(self) -> bool:
+        """Whether items are enqueued within the current transaction"""
+        return self._durable
 
     def add(self, index_cls, using, instances):
         ids = [instance.id for instance in instances]
@@ -24,10 +120,10 @@ class SolrQueue:
         # The record ids are not indexed so they are not searchable.
         wallet_ids = [instance.credential_id for instance in instances]
         LOGGER.debug("Adding items to Solr queue for indexing; Class: %s, Using: %s, Instances: %s", index_cls, using, wallet_ids)
-        try:
-            self._queue.put((index_cls, using, ids, 0))
-        except Full:
-            LOGGER.warning("Can't add items to the Solr queue because it is full; %s", wallet_ids)
+        if self._durable:
+            self.enqueue(index_cls, using, ids, SolrQueueItem.ACTION_UPDATE)
+            return
+        self._put(index_cls, using, ids, self.UPDATE)
 
     def delete(self, index_cls, using, instances):
         ids = [get_identifier(instance) for instance in instances]
@@ -35,18 +131,86 @@ class SolrQueue:
         # The record ids are not indexed so they are not searchable.
         wallet_ids = [instance.credential_id for instance in instances]
         LOGGER.debug("Deleteing items from Solr queue/index; Class: %s, Using: %s, Instances: %s", index_cls, using, wallet_ids)
-        try:
-            self._queue.put((index_cls, using, ids, 1))
-        except Full:
-            LOGGER.warning("Can't delete items from the Solr queue because it is full; %s", wallet_ids)
+        if self._durable:
+            self.enqueue(
+                index_cls,
+                using,
+                [instance.id for instance in instances],
+                SolrQueueItem.ACTION_DELETE,
+            )
+            return
+        self._put(index_cls, using, ids, self.DELETE)
+
+    def requeue(self, index_cls, using, ids, delete=False):
+        """
+        Queue index updates or removals by id, for rows found to be out of sync with the index
+        """
+        LOGGER.info("Requeueing %d item(s) for the Solr index; Class: %s, Delete: %s", len(ids), index_cls, delete)
+        if self._durable:
+            action = SolrQueueItem.ACTION_DELETE if delete else SolrQueueItem.ACTION_UPDATE
+            self.enqueue(index_cls, using, ids, action)
+            return
+        if delete:
+            model = index_cls().get_model()
+            ids = ["{}.{}".format(model._meta.label_lower, obj_id) for obj_id in ids]
+        self._put(index_cls, using, ids, self.DELETE if delete else self.UPDATE)
+
+    def set_status(self, index_cls, using, instances):
+        """
+        Queue an atomic update of the status fields of indexed objects
+        """
+        ids = [instance.id for instance in instances]
+        LOGGER.debug("Adding status updates to Solr queue; Class: %s, Using: %s, Ids: %s", index_cls, using, ids)
+        if self._durable:
+            self.enqueue(index_cls, using, ids, SolrQueueItem.ACTION_STATUS)
+            return
+        transaction.on_commit(lambda: self._put(index_cls, using, ids, self.STATUS))
+
+    def _put(self, index_cls, using, ids, delete):
+        """
+        Add index updates to the in-memory queue, in batches of at most `batch_size` ids
+        """
+        for start in range(0, len(ids), self._batch_size):
+            chunk = ids[start : start + self._batch_size]
+            try:
+                if self._full_policy == self.POLICY_SHED:
+                    self._queue.put_nowait((index_cls, using, chunk, delete, 0))
+                else:
+                    self._queue.put((index_cls, using, chunk, delete, 0), timeout=self._block_timeout)
+            except Full:
+                LOGGER.warning("Shedding items because the Solr queue is full; %s", chunk)
+                self._count("shed", len(chunk))
+
+    def enqueue(self, index_cls, using, ids, action):
+        """
+        Store index updates in the durable queue, as part of the current transaction
+        """
+        index_path = "{}.{}".format(index_cls.__module__, index_cls.__name__)
+        SolrQueueItem.objects.bulk_create(
+            SolrQueueItem(
+                index=index_path,
+                using=using or "default",
+                object_id=object_id,
+                action=action,
+            )
+            for object_id in ids
+        )
+        transaction.on_commit(self.trigger)
 
-    def setup(self, app=None):
+    def setup(self, app=None, start: bool = True):
+        """
+        Wire the queue into `TxnAwareSearchIndex`, and into the app if given
+
+        If `start` is False the app does not run the worker thread, leaving
+        the durable queue to be processed by the `run_indexer` service.
+        """
         LOGGER.info("Setting up Solr queue ...")
         if app is not None:
             LOGGER.info("Wiring the Solr queue into the app; %s", app)
             app["solrqueue"] = self
-            app.on_startup.append(self.app_start)
-            app.on_cleanup.append(self.app_stop)
+            if start:
+                app.on_startup.append(self.app_start)
+                app.on_cleanup.append(self.app_stop)
         LOGGER.info("Wiring the Solr queue into the TxnAwareSearchIndex.")
         self._prev_queue = TxnAwareSearchIndex._backend_queue
         TxnAwareSearchIndex._backend_queue = self
@@ -76,12 +240,15 @@ class SolrQueue:
 
     def stop(self, join=True):
         LOGGER.info("Stoping Solr queue ...")
-        if not self._queue.empty():
+        if self._durable:
+            LOGGER.info("Pending Solr queue items will be indexed on restart")
+        elif not self._queue.empty():
             LOGGER.warning("The Solr queue is not empty, there are about %s items that will not be indexed", self._queue.qsize())
         self._stop.set()
         self._trigger.set()
         if join:
             self._thread.join()
+            self._pipeline.shutdown()
 
     def trigger(self):
         LOGGER.info("Triggering Solr queue ...")
@@ -89,43 +256,54 @@ class SolrQueue:
 
     def _run(self):
         LOGGER.info("Running Solr queue ...")
-        while True:
-            self._trigger.wait(5)
-            self._drain()
-            if self._stop.is_set():
-                LOGGER.info("Finished running Solr queue ...")
-                return
+        try:
+            while True:
+                self._trigger.wait(self._poll_interval)
+                self._trigger.clear()
+                self._drain()
+                if self._stop.is_set():
+                    LOGGER.info("Finished running Solr queue ...")
+                    return
+        finally:
+            if self._durable:
+                django.db.connection.close()
 
     def _drain(self):
+        if self._durable:
+            try:
+                while self.process_batch():
+                    pass
+            except Exception:
+                LOGGER.exception("An unexpected exception was encountered while processing the Solr queue.")
+            return
+
         # LOGGER.debug("Indexing Solr queue items ...")
+        for entry in self._due_retries():
+            self._index_entry(*entry)
+
         last_index = None
         last_using = None
         last_del = 0
         last_ids = set()
         while True:
             try:
-                index_cls, using, ids, delete = self._queue.get_nowait()
+                index_cls, using, ids, delete, attempts = self._queue.get_nowait()
                 LOGGER.debug("Pop items off the Solr queue for indexing; Class: %s, Using: %s, Delete: %s, Instances: %s", index_cls, using, delete, ids)
             except Empty:
                 # LOGGER.debug("Solr queue is empty ...")
                 index_cls = None
-            if last_index and last_index == index_cls and last_using == using and last_del == delete:
+            if (
+                last_index
+                and last_index == index_cls
+                and last_using == using
+                and last_del == delete
+                and len(last_ids) + len(ids) <= self._batch_size
+            ):
                 LOGGER.debug("Updating list of ids ...")
                 last_ids.update(ids)
             else:
                 if last_index:
-                    try:
-                        if last_del:
-                            self.remove(last_index, last_using, last_ids)
-                        else:
-                            self.update(last_index, last_using, last_ids)
-                    except:
-                        LOGGER.exception("An unexpected exception was encountered while processing items from the Solr queue.", exc_info=True)
-                        LOGGER.info("Requeueing items for later processing ...")
-                        try:
-                            self._queue.put( (last_index, last_using, last_ids, last_del) )
-                        except Full:
-                            LOGGER.warning("Can't requeue items to the Solr queue because it is full; %s", last_ids)
+                    self._index_entry(last_index, last_using, last_ids, last_del, 0)
 
                 if not index_cls:
                     # LOGGER.debug("Done indexing items from Solr queue ...")
@@ -136,20 +314,145 @@ class SolrQueue:
                 last_del = delete
                 last_ids = set(ids)
 
+    def _index_entry(self, index_cls, using, ids, delete, attempts):
+        """
+        Update the index for a batch of in-memory queue items, scheduling a retry on failure
+        """
+        try:
+            self._index_batch(index_cls, using, ids, delete)
+        except Exception as e:
+            LOGGER.exception("An unexpected exception was encountered while processing items from the Solr queue.")
+            if backend_unavailable(e):
+                # retry the whole batch once the backend is back
+                self._outages += 1
+                self._schedule_retry(self.retry_delay(self._outages), (index_cls, using, ids, delete, attempts))
+                return
+            for obj_id in ids:
+                attempts_made = attempts + 1
+                if len(ids) == 1 and attempts_made >= self._max_attempts:
+                    self._dead(index_cls, using, obj_id, delete, e)
+                    continue
+                self._schedule_retry(self.retry_delay(attempts_made), (index_cls, using, [obj_id], delete, attempts_made))
+        else:
+            self._outages = 0
+
+    def _schedule_retry(self, delay: float, entry: tuple):
+        with self._stats_lock:
+            heapq.heappush(self._retries, (time.monotonic() + delay, next(self._retry_seq), entry))
+
+    def _due_retries(self) -> list:
+        now = time.monotonic()
+        entries = []
+        with self._stats_lock:
+            while self._retries and self._retries[0][0] <= now:
+                entries.append(heapq.heappop(self._retries)[2])
+        return entries
+
+    def _dead(self, index_cls, using, obj_id, delete, error):
+        LOGGER.error("Giving up on indexing %s %s after %d attempts: %s", index_cls.__name__, obj_id, self._max_attempts, error)
+        self._count("dead_letter", 1)
+        with self._stats_lock:
+            self._dead_letter.append(
+                {"index": index_cls.__name__, "using": using, "id": obj_id, "delete": delete == self.DELETE, "error": str(error)}
+            )
+
+    def retry_delay(self, attempts: int) -> float:
+        """
+        Exponential backoff before retrying a failed update
+        """
+        return min(self._retry_backoff * 2 ** (attempts - 1), self._max_retry_delay)
+
+    def _index_batch(self, index_cls, using, ids, delete):
+        """
+        Update or remove the index for a set of ids, recording the batch statistics
+        """
+        start_time = time.perf_counter()
+        method = self.METRICS[delete]
+        try:
+            if delete == self.DELETE:
+                self.remove(index_cls, using, ids)
+            elif delete == self.STATUS:
+                self.update_status(index_cls, using, ids)
+            else:
+                self.update(index_cls, using, ids)
+        except Exception:
+            log_timing_method(method, start_time, time.perf_counter(), False)
+            self._count("failed", len(ids))
+            raise
+        log_timing_method(method, start_time, time.perf_counter(), True)
+        self._count("indexed", len(ids))
+        with self._stats_lock:
+            self._stats["last_batch_size"] = len(ids)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(ids))
+
+    def _count(self, name: str, count: int):
+        with self._stats_lock:
+            self._stats[name] += count
+
+    def stats(self) -> dict:
+        """
+        Queue depth and batch statistics, reported on the /status endpoint
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["retrying"] = len(self._retries)
+            stats["dead_letter_items"] = list(self._dead_letter)
+        stats["durable"] = self._durable
+        stats["batch_size_limit"] = self._batch_size
+        if self._durable:
+            pending = SolrQueueItem.objects.filter(dead=False)
+            stats["depth"] = pending.count()
+            stats["retrying"] = pending.filter(attempts__gt=0).count()
+            stats["dead_letter"] = SolrQueueItem.objects.filter(dead=True).count()
+            oldest = pending.aggregate(oldest=Min("create_timestamp"))["oldest"]
+            stats["oldest_pending_seconds"] = (
+                (timezone.now() - oldest).total_seconds() if oldest else 0
+            )
+        else:
+            stats["depth"] = self._queue.qsize()
+        return stats
+
     def update(self, index_cls, using, ids):
         LOGGER.debug("Updating the indexes for Solr queue items ...")
         index = index_cls()
         backend = index.get_backend(using)
         if backend is not None:
             LOGGER.info("Updating indexes for %d row(s) from Solr queue: %s", len(ids), ids)
-            rows = index.index_queryset(using).filter(id__in=ids)
             # Turn off silently_fail; throw an exception if there is an error so we can requeue the items being indexed.
             backend.silently_fail = False
-            backend.update(index, rows)
+            if hasattr(backend, "conn"):
+                # Solr backend: build documents while posting the previous chunk
+                self._pipeline.update(index, backend, using, ids)
+            else:
+                rows = index.index_queryset(using).filter(id__in=ids)
+                backend.update(index, rows)
             # LOGGER.debug("Index update complete.")
         else:
             LOGGER.error("Failed to get backend.  Unable to update the index for %d row(s) from the Solr queue: %s", len(ids), ids)
 
+    def update_status(self, index_cls, using, ids):
+        """
+        Send atomic updates of the status fields, falling back to a full
+        update when the index has no status fields or a document has not
+        been indexed yet
+        """
+        index = index_cls()
+        backend = index.get_backend(using)
+        if backend is None or not hasattr(backend, "conn") or not getattr(index, "status_fields", None):
+            self.update(index_cls, using, ids)
+            return
+        LOGGER.info("Updating index status for %d row(s) from Solr queue: %s", len(ids), ids)
+        docs = index.prepare_status(ids, using)
+        if not docs:
+            return
+        try:
+            # boost forces the XML format, which converts the field values
+            backend.conn.add(docs, boost={}, fieldUpdates={name: "set" for name in index.status_fields}, commit=True)
+        except pysolr.SolrError as e:
+            # a version conflict means that a document is missing from the index
+            LOGGER.info("Status update failed, updating the full documents instead: %s", e)
+            self.update(index_cls, using, ids)
+
     def remove(self, index_cls, using, ids):
         LOGGER.debug("Removing the indexes for Solr queue items ...")
         index = index_cls()
@@ -162,3 +465,110 @@ class SolrQueue:
             backend.conn.delete(id=ids)
         else:
             LOGGER.error("Failed to get backend.  Unable to remove the indexes for %d row(s) from the solr queue: %s", len(ids), ids)
+
+    def process_batch(self) -> bool:
+        """
+        Claim a batch of durable queue items and update the index
+
+        The items are deleted in the same transaction, once the index has been
+        updated. Items which could not be indexed are kept for a later attempt
+        after a backoff delay: while the backend is unavailable they stay
+        batched and no attempt is counted, otherwise they are then indexed one
+        at a time. Items which have failed `SOLR_QUEUE_MAX_ATTEMPTS` times on
+        their own are kept as dead letters.
+
+        Returns:
+            bool -- True if items were indexed without errors
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            items = list(
+                SolrQueueItem.objects.select_for_update(skip_locked=True)
+                .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now), dead=False)
+                .order_by("id")[: self._batch_size]
+            )
+            if not items:
+                return False
+
+            groups = {}
+            for item in items:
+                # retried items are indexed individually to isolate poison ids
+                key = (item.index, item.using, item.action, item.id if item.attempts else None)
+                groups.setdefault(key, []).append(item)
+
+            failed = False
+            unavailable = None
+            for (index_path, using, action, _retry), group in groups.items():
+                if unavailable is not None:
+                    # the other groups would fail the same way
+                    self._postpone_items(group, unavailable, now)
+                    continue
+                ids = {item.object_id for item in group}
+                try:
+                    # savepoint, so a database error does not abort the batch
+                    with transaction.atomic():
+                        index_cls = import_string(index_path)
+                        if action == SolrQueueItem.ACTION_DELETE:
+                            model = index_cls().get_model()
+                            self._index_batch(index_cls, using, ["{}.{}".format(model._meta.label_lower, obj_id) for obj_id in ids], self.DELETE)
+                        elif action == SolrQueueItem.ACTION_STATUS:
+                            self._index_batch(index_cls, using, ids, self.STATUS)
+                        else:
+                            self._index_batch(index_cls, using, ids, self.UPDATE)
+                except Exception as e:
+                    LOGGER.exception("An unexpected exception was encountered while processing items from the Solr queue.")
+                    failed = True
+                    if backend_unavailable(e):
+                        self._outages += 1
+                        unavailable = e
+                        self._postpone_items(group, e, now)
+                    else:
+                        self._retry_items(group, e, now)
+                else:
+                    SolrQueueItem.objects.filter(id__in=[item.id for item in group]).delete()
+            if unavailable is None:
+                self._outages = 0
+        return not failed
+
+    def _postpone_items(self, items, error, now):
+        """
+        Retry items after a backoff delay without counting an attempt, when the backend is unavailable
+        """
+        SolrQueueItem.objects.filter(id__in=[item.id for item in items]).update(
+            error=str(error),
+            retry_at=now + timedelta(seconds=self.retry_delay(self._outages)),
+            update_timestamp=now,
+        )
+
+    def _retry_items(self, items, error, now):
+        # the items in a group have all been attempted the same number of times
+        attempts = items[0].attempts + 1
+        # only an item which failed on its own is given up on
+        dead = len(items) == 1 and attempts >= self._max_attempts
+        if dead:
+            LOGGER.error("Giving up on indexing %d Solr queue item(s) after %d attempts: %s", len(items), attempts, error)
+            self._count("dead_letter", len(items))
+        SolrQueueItem.objects.filter(id__in=[item.id for item in items]).update(
+            attempts=attempts,
+            error=str(error),
+            dead=dead,
+            retry_at=now + timedelta(seconds=self.retry_delay(attempts)),
+            update_timestamp=now,
+        )
+
+    @staticmethod
+    def requeue_dead(index_path: str = None, using: str = None) -> int:
+        """
+        Queue the dead durable items again, with their attempts reset
+
+        Returns:
+            int -- the number of items requeued
+        """
+        items = SolrQueueItem.objects.filter(dead=True)
+        if index_path:
+            items = items.filter(index=index_path)
+        if using:
+            items = items.filter(using=using)
+        count = items.update(dead=False, attempts=0, retry_at=None, update_timestamp=timezone.now())
+        LOGGER.info("Requeued %d dead Solr queue item(s)", count)
+        return count
@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+
+from api.v2 import utils
+from vcr_server.utils.agent_admin import AgentAdminClient
+
+
+def _response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+@patch("vcr_server.utils.agent_admin.time.sleep", autospec=True)
+@patch("vcr_server.utils.agent_admin.requests.Session.request", autospec=True)
+class AgentAdminClient_TestCase(SimpleTestCase):
+    def _client(self):
+        return AgentAdminClient(
+            base_url="http://agent:8024/",
+            headers={"x-api-key": "key"},
+            timeout=10,
+            connect_timeout=2,
+            retries=2,
+            retry_backoff=0.5,
+        )
+
+    def test_get_retry(self, mock_request, mock_sleep):
+        mock_request.side_effect = [
+            requests.ConnectionError("refused"),
+            _response(503),
+            _response(200),
+        ]
+        client = self._client()
+        response = client.get("/credential/{}", "cred-1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 3)
+        args, kwargs = mock_request.call_args
+        self.assertEqual(args[1:], ("GET", "http://agent:8024/credential/cred-1"))
+        self.assertEqual(kwargs["timeout"], (2, 10))
+        self.assertEqual(client.session.headers["x-api-key"], "key")
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [0.5, 1.0])
+        self.assertIn("agent_admin.GET /credential/{}", utils.timings)
+
+    def test_post_not_retried(self, mock_request, mock_sleep):
+        mock_request.side_effect = requests.ConnectionError("refused")
+        client = self._client()
+        with self.assertRaises(requests.ConnectionError):
+            client.post("/present-proof/send-request", json={})
+        self.assertEqual(mock_request.call_count, 1)
+        mock_sleep.assert_not_called()
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, call
+
+from django.test import TestCase
+
+from api.v2.models.Credential import Credential
+from api.v2.search_indexes import CredentialIndex
+from api.v2.tests.fixtures import (
+    create_credential_type,
+    create_credentials,
+    create_topic,
+)
+from vcr_server.utils.index_check import IndexChecker
+
+
+def _solr_date(value):
+    return value.replace(tzinfo=None).isoformat() + "Z"
+
+
+class IndexChecker_TestCase(TestCase):
+    def setUp(self):
+        self.credentials = create_credentials(
+            create_topic(), create_credential_type(), 3
+        )
+        self.backend = MagicMock()
+        self.checker = IndexChecker(CredentialIndex(), self.backend, chunk_size=2)
+
+    def _index(self, *docs):
+        self.backend.conn.search.return_value.docs = [
+            {"django_id": str(obj_id), "update_timestamp": updated}
+            for obj_id, updated in docs
+        ]
+
+    def test_check_chunk(self):
+        current, stale, missing = self.credentials
+        extra_id = missing.id + 1
+        self._index(
+            (current.id, _solr_date(current.update_timestamp)),
+            (stale.id, _solr_date(stale.update_timestamp - timedelta(seconds=1))),
+            (extra_id, _solr_date(current.update_timestamp)),
+        )
+        diff = self.checker.check_chunk(current.id, extra_id)
+        self.assertEqual(
+            diff, {"missing": [missing.id], "stale": [stale.id], "extra": [extra_id]}
+        )
+
+        params = self.backend.conn.search.call_args[1]
+        self.assertEqual(
+            params["fq"][1],
+            "{{!terms f=django_id}}{}".format(
+                ",".join(str(obj_id) for obj_id in range(current.id, extra_id + 1))
+            ),
+        )
+        self.assertEqual(params["fl"], "django_id,update_timestamp")
+
+    def test_check_requeue(self):
+        self._index()
+        queue = MagicMock()
+        ids = [credential.id for credential in self.credentials]
+        totals = self.checker.check(queue=queue)
+        self.assertEqual(totals, {"checked": 3, "missing": 3, "stale": 0, "extra": 0})
+        # one Solr query and one update per chunk of ids
+        self.assertEqual(self.backend.conn.search.call_count, 2)
+        self.assertEqual(
+            queue.requeue.call_args_list,
+            [
+                call(CredentialIndex, "default", ids[:2]),
+                call(CredentialIndex, "default", ids[2:]),
+            ],
+        )
+
+    def test_check_in_sync(self):
+        credential = self.credentials[0]
+        self._index((credential.id, _solr_date(credential.update_timestamp)))
+        queue = MagicMock()
+        totals = self.checker.check(credential.id, credential.id, queue)
+        self.assertEqual(totals, {"checked": 1, "missing": 0, "stale": 0, "extra": 0})
+        queue.requeue.assert_not_called()
+
+    def test_remove_extra(self):
+        first, second, _third = self.credentials
+        deleted_id = self.credentials[-1].id + 1
+
+        def page(docs, cursor):
+            return MagicMock(
+                docs=[
+                    {
+                        "id": "api_v2.credential.{}".format(obj_id),
+                        "django_id": str(obj_id),
+                    }
+                    for obj_id in docs
+                ],
+                nextCursorMark=cursor,
+            )
+
+        self.backend.conn.search.side_effect = [
+            page([first.id, deleted_id], "A"),
+            page([second.id], "B"),
+            page([], "B"),
+        ]
+        self.assertEqual(self.checker.remove_extra(), 1)
+        self.backend.conn.delete.assert_called_once_with(
+            id=["api_v2.credential.{}".format(deleted_id)], commit=False
+        )
+        self.backend.conn.commit.assert_called_once_with()
+        self.assertEqual(
+            [
+                params[1]["cursorMark"]
+                for params in self.backend.conn.search.call_args_list
+            ],
+            ["*", "A", "B"],
+        )
@@ -0,0 +1,235 @@
+import gzip
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from api.v2.models.Credential import Credential
+from api.v2.models.IndexWatermark import IndexWatermark
+from api.v2.search_indexes import CredentialIndex
+from api.v2.tests.fixtures import (
+    create_credential_type,
+    create_credentials,
+    create_topic,
+)
+from vcr_server.utils.indexer import IndexPipeline
+from vcr_server.utils.solr_cores import SolrCoreAdmin
+from vcr_server.utils.solr_session import SolrSession
+
+
+class IndexPipeline_TestCase(SimpleTestCase):
+    def setUp(self):
+        self.pipeline = IndexPipeline(workers=2, chunk_size=2)
+        self.backend = MagicMock()
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+
+    @patch.object(IndexPipeline, "prepare", autospec=True)
+    def test_update(self, mock_prepare):
+        mock_prepare.side_effect = lambda _self, _index_cls, _using, ids: [
+            {"id": obj_id} for obj_id in ids if obj_id != 3
+        ]
+        self.pipeline.update(
+            CredentialIndex(), self.backend, "default", {5, 1, 4, 3, 2}
+        )
+
+        self.assertEqual(
+            [call[0][0] for call in self.backend.conn.add.call_args_list],
+            [[{"id": 1}, {"id": 2}], [{"id": 4}], [{"id": 5}]],
+        )
+        for call in self.backend.conn.add.call_args_list:
+            self.assertFalse(call[1]["commit"])
+        self.backend.conn.commit.assert_called_once_with()
+
+    @patch.object(IndexPipeline, "prepare", autospec=True)
+    def test_update_failure(self, mock_prepare):
+        def prepare(_self, _index_cls, _using, ids):
+            if 3 in ids:
+                raise Exception("Database unavailable")
+            return [{"id": obj_id} for obj_id in ids]
+
+        mock_prepare.side_effect = prepare
+        with self.assertRaises(Exception):
+            self.pipeline.update(CredentialIndex(), self.backend, "default", range(6))
+        self.backend.conn.add.assert_called_once_with(
+            [{"id": 0}, {"id": 1}],
+            commit=False,
+            boost=CredentialIndex().get_field_weights(),
+        )
+        self.backend.conn.commit.assert_not_called()
+
+
+@patch.object(IndexPipeline, "update", autospec=True)
+@patch.object(CredentialIndex, "get_backend", autospec=True)
+class IncrementalUpdateIndex_TestCase(TestCase):
+    def setUp(self):
+        self.ids = [
+            credential.id
+            for credential in create_credentials(
+                create_topic(), create_credential_type(), 3
+            )
+        ]
+
+    def _indexed_ids(self, mock_update):
+        return [obj_id for call in mock_update.call_args_list for obj_id in call[0][4]]
+
+    def test_watermark(self, mock_get_backend, mock_update):
+        call_command("incremental_update_index", stdout=MagicMock())
+        self.assertEqual(self._indexed_ids(mock_update), self.ids)
+        watermark = IndexWatermark.objects.get()
+        self.assertEqual(watermark.index, "api.v2.search_indexes.CredentialIndex")
+
+        # only rows updated since the watermark are indexed
+        mock_update.reset_mock()
+        now = timezone.now()
+        watermark.indexed_until = now
+        watermark.save()
+        Credential.objects.filter(id=self.ids[1]).update(
+            update_timestamp=now + timedelta(seconds=1)
+        )
+        call_command("incremental_update_index", stdout=MagicMock())
+        self.assertEqual(self._indexed_ids(mock_update), [self.ids[1]])
+        mock_get_backend.return_value.clear.assert_not_called()
+        # the watermark never moves back
+        self.assertEqual(IndexWatermark.objects.get().indexed_until, now)
+
+    def test_full(self, mock_get_backend, mock_update):
+        IndexWatermark.objects.create(
+            index="api.v2.search_indexes.CredentialIndex",
+            indexed_until=timezone.now() + timedelta(days=1),
+        )
+        call_command("incremental_update_index", "--full", stdout=MagicMock())
+        mock_get_backend.return_value.clear.assert_called_once_with(models=[Credential])
+        self.assertEqual(self._indexed_ids(mock_update), self.ids)
+        self.assertLess(IndexWatermark.objects.get().indexed_until, timezone.now())
+
+    @patch("vcr_server.utils.indexer.time.sleep")
+    def test_retry(self, mock_sleep, mock_get_backend, mock_update):
+        mock_update.side_effect = [Exception("Solr unavailable"), None]
+        call_command("incremental_update_index", "--max-retries=1", stdout=MagicMock())
+        self.assertEqual(mock_update.call_count, 2)
+        mock_sleep.assert_called_once_with(2)
+        self.assertTrue(IndexWatermark.objects.exists())
+
+        # the watermark stays put once the retries are used up
+        IndexWatermark.objects.all().delete()
+        mock_update.side_effect = Exception("Solr unavailable")
+        with self.assertRaises(Exception):
+            call_command(
+                "incremental_update_index", "--max-retries=1", stdout=MagicMock()
+            )
+        self.assertFalse(IndexWatermark.objects.exists())
+
+
+@patch.object(IndexPipeline, "update_rows", autospec=True, return_value=0)
+@patch("agent_webhooks.management.commands.shadow_rebuild_index.pysolr.Solr")
+@patch("agent_webhooks.management.commands.shadow_rebuild_index.SolrCoreAdmin")
+@patch("agent_webhooks.management.commands.shadow_rebuild_index.connections")
+class ShadowRebuildIndex_TestCase(TestCase):
+    def _setup(self, mock_connections, mock_admin, mock_solr, hits):
+        backend = MagicMock()
+        backend.conn.url = "http://solr:8983/solr/credential_registry"
+        connection = mock_connections.__getitem__.return_value
+        connection.get_backend.return_value = backend
+        connection.get_unified_index.return_value.get_indexes.return_value = {
+            Credential: CredentialIndex()
+        }
+        mock_admin.split_url = SolrCoreAdmin.split_url
+        mock_admin.return_value.exists.return_value = False
+        mock_admin.return_value.instance_dir.return_value = (
+            "/opt/solr/server/solr/credential_registry"
+        )
+        mock_solr.return_value.search.return_value.hits = hits
+        mock_solr.return_value.search.return_value.docs = []
+        backend.conn.search.return_value.docs = []
+        return backend
+
+    def test_swap(self, mock_connections, mock_admin, mock_solr, mock_update_rows):
+        backend = self._setup(mock_connections, mock_admin, mock_solr, 0)
+        call_command("shadow_rebuild_index", stdout=MagicMock())
+
+        admin = mock_admin.return_value
+        mock_admin.assert_called_once_with(
+            "http://solr:8983/solr", session=backend.conn.session
+        )
+        admin.instance_dir.assert_called_once_with("credential_registry")
+        admin.create.assert_called_once_with(
+            "credential_registry_shadow", "/opt/solr/server/solr/credential_registry"
+        )
+        mock_solr.return_value.delete.assert_called_once_with(q="*:*", commit=True)
+        admin.swap.assert_called_once_with(
+            "credential_registry", "credential_registry_shadow"
+        )
+        # full build and catch up in the shadow core, then catch up in the live core
+        backends = [call[0][2] for call in mock_update_rows.call_args_list]
+        self.assertEqual(len(backends), 3)
+        self.assertIs(backends[0].conn, mock_solr.return_value)
+        self.assertIs(backends[1].conn, mock_solr.return_value)
+        self.assertIs(backends[2], backend)
+        # both cores are swept for documents of deleted rows
+        for conn in (mock_solr.return_value, backend.conn):
+            self.assertIn("cursorMark", conn.search.call_args_list[0][1])
+        self.assertTrue(IndexWatermark.objects.exists())
+        admin.unload.assert_not_called()
+
+    def test_count_mismatch(
+        self, mock_connections, mock_admin, mock_solr, mock_update_rows
+    ):
+        self._setup(mock_connections, mock_admin, mock_solr, 5)
+        with self.assertRaises(CommandError):
+            call_command("shadow_rebuild_index", stdout=MagicMock())
+        mock_admin.return_value.swap.assert_not_called()
+        self.assertFalse(IndexWatermark.objects.exists())
+
+    def test_verify_created_until(
+        self, mock_connections, mock_admin, mock_solr, mock_update_rows
+    ):
+        self._setup(mock_connections, mock_admin, mock_solr, 0)
+        # a credential received after the catch up is not expected in the shadow core
+        credential = create_credentials(create_topic(), create_credential_type(), 1)[0]
+        Credential.objects.filter(id=credential.id).update(
+            create_timestamp=timezone.now() + timedelta(days=1)
+        )
+        call_command("shadow_rebuild_index", stdout=MagicMock())
+        mock_admin.return_value.swap.assert_called_once_with(
+            "credential_registry", "credential_registry_shadow"
+        )
+        fq = mock_solr.return_value.search.call_args[1]["fq"]
+        self.assertTrue(fq[1].startswith("create_timestamp:[* TO "))
+
+
+class SolrCoreAdmin_TestCase(SimpleTestCase):
+    def test_instance_dir(self):
+        session = MagicMock()
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {
+            "status": {"credential_registry": {"instanceDir": "/var/solr/core"}}
+        }
+        admin = SolrCoreAdmin("http://solr:8983/solr/", session=session)
+        self.assertEqual(admin.instance_dir("credential_registry"), "/var/solr/core")
+        session.get.assert_called_once_with(
+            "http://solr:8983/solr/admin/cores",
+            params={"core": "credential_registry", "action": "STATUS", "wt": "json"},
+            timeout=60,
+        )
+
+
+class SolrSession_TestCase(SimpleTestCase):
+    @patch.object(requests.Session, "request", autospec=True)
+    def test_compress(self, mock_request):
+        body = b"<add>" + b"<doc/>" * 500 + b"</add>"
+        session = SolrSession(compress=True)
+        session.request("post", "http://solr/update/", data=body, headers={"A": "1"})
+        (_session, method, url), kwargs = mock_request.call_args
+        self.assertEqual(kwargs["headers"], {"A": "1", "Content-Encoding": "gzip"})
+        self.assertEqual(gzip.decompress(kwargs["data"]), body)
+
+        session.request("post", "http://solr/update/", data=b"<commit/>")
+        self.assertEqual(mock_request.call_args[1]["data"], b"<commit/>")
+
+        SolrSession().request("post", "http://solr/update/", data=body)
+        self.assertEqual(mock_request.call_args[1]["data"], body)
@@ -0,0 +1,265 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+import pysolr
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from api.v2.models.Credential import Credential
+from api.v2.models.SolrQueueItem import SolrQueueItem
+from api.v2.search.index import TxnAwareSearchIndex
+from api.v2.search_indexes import CredentialIndex
+from vcr_server.utils.solrqueue import SolrQueue
+
+
+class SolrQueue_TestCase(TestCase):
+    def setUp(self):
+        self.queue = SolrQueue(durable=True)
+        self.queue.setup()
+
+    def tearDown(self):
+        TxnAwareSearchIndex._backend_queue = self.queue._prev_queue
+
+    def test_enqueue_in_transaction(self):
+        with transaction.atomic():
+            CredentialIndex().update_object(Credential(id=1, credential_id="1"))
+            CredentialIndex().remove_object(Credential(id=2, credential_id="2"))
+            self.assertEqual(
+                list(SolrQueueItem.objects.values_list("object_id", "action")),
+                [(1, SolrQueueItem.ACTION_UPDATE), (2, SolrQueueItem.ACTION_DELETE)],
+            )
+            transaction.set_rollback(True)
+        self.assertFalse(SolrQueueItem.objects.exists())
+
+    @patch.object(SolrQueue, "remove", autospec=True)
+    @patch.object(SolrQueue, "update", autospec=True)
+    def test_process_batch(self, mock_update, mock_remove):
+        index_cls = CredentialIndex
+        self.queue.add(index_cls, None, [Credential(id=idx) for idx in (1, 2, 1)])
+        self.queue.delete(index_cls, None, [Credential(id=3)])
+
+        self.assertTrue(self.queue.process_batch())
+        mock_update.assert_called_once_with(self.queue, index_cls, "default", {1, 2})
+        mock_remove.assert_called_once_with(
+            self.queue, index_cls, "default", ["api_v2.credential.3"]
+        )
+        self.assertFalse(SolrQueueItem.objects.exists())
+        self.assertFalse(self.queue.process_batch())
+
+    @patch.object(SolrQueue, "update_status", autospec=True)
+    def test_process_batch_status(self, mock_update_status):
+        self.queue.set_status(
+            CredentialIndex, None, [Credential(id=1), Credential(id=2)]
+        )
+        self.assertEqual(
+            list(SolrQueueItem.objects.values_list("action", flat=True)),
+            [SolrQueueItem.ACTION_STATUS] * 2,
+        )
+        self.assertTrue(self.queue.process_batch())
+        mock_update_status.assert_called_once_with(
+            self.queue, CredentialIndex, "default", {1, 2}
+        )
+
+    @patch.object(SolrQueue, "update", autospec=True)
+    @patch.object(CredentialIndex, "prepare_status", autospec=True)
+    @patch.object(CredentialIndex, "get_backend", autospec=True)
+    def test_update_status(self, mock_get_backend, mock_prepare_status, mock_update):
+        backend = mock_get_backend.return_value = MagicMock()
+        doc = {"id": "api_v2.credential.1", "_version_": 1, "latest": False}
+        mock_prepare_status.return_value = [doc]
+        self.queue.update_status(CredentialIndex, "default", {1})
+        backend.conn.add.assert_called_once_with(
+            [doc],
+            boost={},
+            fieldUpdates={
+                "latest": "set",
+                "revoked": "set",
+                "revoked_date": "set",
+                "update_timestamp": "set",
+            },
+            commit=True,
+        )
+        mock_update.assert_not_called()
+
+        # documents which have not been indexed need a full update
+        backend.conn.add.side_effect = pysolr.SolrError("version conflict")
+        self.queue.update_status(CredentialIndex, "default", {1})
+        mock_update.assert_called_once_with(self.queue, CredentialIndex, "default", {1})
+
+    @override_settings(SOLR_QUEUE_MAX_ATTEMPTS=2)
+    @patch.object(SolrQueue, "update", autospec=True)
+    def test_process_batch_failure(self, mock_update):
+        mock_update.side_effect = Exception("Invalid document")
+        queue = SolrQueue(durable=True)
+        queue.add(CredentialIndex, None, [Credential(id=1), Credential(id=2)])
+
+        self.assertFalse(queue.process_batch())
+        items = list(SolrQueueItem.objects.order_by("id"))
+        self.assertEqual([item.attempts for item in items], [1, 1])
+        self.assertEqual(items[0].error, "Invalid document")
+        self.assertIsNotNone(items[0].retry_at)
+        # not retried before the backoff delay
+        self.assertFalse(queue.process_batch())
+        self.assertEqual(mock_update.call_count, 1)
+
+        # then retried one at a time, and kept as dead letters
+        SolrQueueItem.objects.update(retry_at=None)
+        self.assertFalse(queue.process_batch())
+        self.assertEqual(mock_update.call_count, 3)
+        self.assertEqual(mock_update.call_args[0][3], {2})
+        self.assertEqual(SolrQueueItem.objects.filter(dead=True).count(), 2)
+        self.assertFalse(queue.process_batch())
+
+        stats = queue.stats()
+        self.assertEqual(stats["depth"], 0)
+        self.assertEqual(stats["dead_letter"], 2)
+
+        # dead letters can be queued again
+        out = StringIO()
+        call_command("requeue_dead_index_updates", stdout=out)
+        self.assertIn("Requeued 2", out.getvalue())
+        self.assertEqual(
+            list(SolrQueueItem.objects.values_list("dead", "attempts")),
+            [(False, 0), (False, 0)],
+        )
+
+    @override_settings(SOLR_QUEUE_MAX_ATTEMPTS=2)
+    @patch.object(SolrQueue, "remove", autospec=True)
+    @patch.object(SolrQueue, "update", autospec=True)
+    def test_process_batch_unavailable(self, mock_update, mock_remove):
+        mock_update.side_effect = pysolr.SolrError(
+            "Failed to connect to server at http://solr:8983/solr/core/update/"
+        )
+        queue = SolrQueue(durable=True)
+        queue.add(CredentialIndex, None, [Credential(id=1), Credential(id=2)])
+        queue.delete(CredentialIndex, None, [Credential(id=3)])
+
+        # the batch stays together and is never given up on
+        for _attempt in range(3):
+            self.assertFalse(queue.process_batch())
+            SolrQueueItem.objects.update(retry_at=None)
+        self.assertEqual(
+            [call[0][3] for call in mock_update.call_args_list], [{1, 2}] * 3
+        )
+        # the other groups are not attempted during the outage
+        mock_remove.assert_not_called()
+        self.assertEqual(
+            list(SolrQueueItem.objects.values_list("dead", "attempts")),
+            [(False, 0)] * 3,
+        )
+
+        mock_update.side_effect = None
+        self.assertTrue(queue.process_batch())
+        self.assertFalse(SolrQueueItem.objects.exists())
+
+
+class MemorySolrQueue_TestCase(TestCase):
+    def setUp(self):
+        self.queue = SolrQueue(durable=False, batch_size=2)
+
+    @patch.object(SolrQueue, "update", autospec=True)
+    def test_batch_size(self, mock_update):
+        self.queue.add(CredentialIndex, None, [Credential(id=idx) for idx in range(5)])
+        self.queue.add(CredentialIndex, None, [Credential(id=5)])
+        self.queue._drain()
+        self.assertEqual(
+            [call[0][3] for call in mock_update.call_args_list],
+            [{0, 1}, {2, 3}, {4, 5}],
+        )
+        self.assertEqual(self.queue.stats()["max_batch_size"], 2)
+
+    @patch.object(SolrQueue, "remove", autospec=True)
+    @patch.object(SolrQueue, "update", autospec=True)
+    def test_requeue(self, mock_update, mock_remove):
+        self.queue.requeue(CredentialIndex, "default", [1, 2])
+        self.queue.requeue(CredentialIndex, "default", [3], delete=True)
+        self.queue._drain()
+        mock_update.assert_called_once_with(
+            self.queue, CredentialIndex, "default", {1, 2}
+        )
+        mock_remove.assert_called_once_with(
+            self.queue, CredentialIndex, "default", {"api_v2.credential.3"}
+        )
+
+    @override_settings(SOLR_QUEUE_MAX_SIZE=1, SOLR_QUEUE_FULL_POLICY="shed")
+    def test_shed(self):
+        queue = SolrQueue(durable=False)
+        queue.add(CredentialIndex, None, [Credential(id=1)])
+        queue.add(CredentialIndex, None, [Credential(id=2)])
+        stats = queue.stats()
+        self.assertEqual(stats["depth"], 1)
+        self.assertEqual(stats["shed"], 1)
+
+    @override_settings(SOLR_QUEUE_MAX_ATTEMPTS=2, SOLR_QUEUE_RETRY_BACKOFF=0)
+    @patch.object(SolrQueue, "update", autospec=True)
+    def test_retry(self, mock_update):
+        queue = SolrQueue(durable=False)
+
+        def update(_queue, _index_cls, _using, ids):
+            if 2 in ids:
+                raise Exception("Invalid document")
+
+        mock_update.side_effect = update
+        queue.add(CredentialIndex, None, [Credential(id=1), Credential(id=2)])
+        queue._drain()
+        self.assertEqual(queue.stats()["retrying"], 2)
+
+        queue._drain()
+        self.assertEqual(
+            [call[0][3] for call in mock_update.call_args_list], [{1, 2}, [1], [2]],
+        )
+        stats = queue.stats()
+        self.assertEqual(stats["retrying"], 0)
+        self.assertEqual(stats["indexed"], 1)
+        self.assertEqual(stats["dead_letter"], 1)
+        self.assertEqual(stats["dead_letter_items"][0]["id"], 2)
+
+    @override_settings(SOLR_QUEUE_MAX_ATTEMPTS=2, SOLR_QUEUE_RETRY_BACKOFF=0)
+    @patch.object(SolrQueue, "update", autospec=True)
+    def test_retry_unavailable(self, mock_update):
+        queue = SolrQueue(durable=False)
+        mock_update.side_effect = pysolr.SolrError(
+            "Solr responded with an error (HTTP 503): Service Unavailable"
+        )
+        queue.add(CredentialIndex, None, [Credential(id=1), Credential(id=2)])
+        for _attempt in range(3):
+            queue._drain()
+        mock_update.side_effect = None
+        queue._drain()
+        self.assertEqual(
+            [call[0][3] for call in mock_update.call_args_list], [{1, 2}] * 4
+        )
+        stats = queue.stats()
+        self.assertEqual(stats["retrying"], 0)
+        self.assertEqual(stats["dead_letter"], 0)
+        self.assertEqual(stats["indexed"], 2)
+
+
+class _App(dict):
+    def __init__(self):
+        super().__init__()
+        self.on_startup = []
+        self.on_cleanup = []
+
+
+class SolrQueueSetup_TestCase(TestCase):
+    def tearDown(self):
+        TxnAwareSearchIndex._backend_queue = None
+
+    def test_setup_without_worker(self):
+        app = _App()
+        queue = SolrQueue(durable=True)
+        queue.setup(app=app, start=False)
+        self.assertIs(app["solrqueue"], queue)
+        self.assertIs(TxnAwareSearchIndex._backend_queue, queue)
+        self.assertEqual(app.on_startup, [])
+
+        queue.setup(app=app)
+        self.assertEqual(app.on_startup, [queue.app_start])
+
+    @override_settings(SOLR_QUEUE_DURABLE=False)
+    def test_run_indexer_requires_durable_queue(self):
+        with self.assertRaises(CommandError):
+            call_command("run_indexer")